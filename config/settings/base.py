@@ -70,6 +70,7 @@ DJANGO_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
     "django.contrib.admin",
+    "django.contrib.postgres",
     "django.forms",
     "django_filters",
 ]
@@ -83,6 +84,7 @@ THIRD_PARTY_APPS = [
 LOCAL_APPS = [
     "watchedmovies.users",
     "watchedmovies.movies",
+    "watchedmovies.jobs",
     # Your stuff: custom apps go here
 ]
 # https://docs.djangoproject.com/en/dev/ref/settings/#installed-apps
@@ -281,3 +283,85 @@ SPECTACULAR_SETTINGS = {
 CORS_ALLOWED_ORIGINS = [
     env("CORS_ALLOWED_ORIGIN", default="http://localhost:5173"),
 ]
+
+# TMDB
+# ------------------------------------------------------------------------------
+# Root of the TMDB API, point it at `manage.py run_tmdb_stub` to work without network.
+TMDB_BASE_URL = env("TMDB_BASE_URL", default="https://api.themoviedb.org/3")
+# Keep-alive connection pool shared by every thread of a worker process.
+TMDB_POOL_SIZE = env.int("TMDB_POOL_SIZE", default=10)
+# (connect, read) timeouts in seconds for each request to the TMDB API.
+TMDB_CONNECT_TIMEOUT = env.float("TMDB_CONNECT_TIMEOUT", default=3.05)
+TMDB_READ_TIMEOUT = env.float("TMDB_READ_TIMEOUT", default=10)
+# Retries with exponential backoff on 5xx responses and connection resets.
+TMDB_MAX_RETRIES = env.int("TMDB_MAX_RETRIES", default=3)
+TMDB_RETRY_BACKOFF = env.float("TMDB_RETRY_BACKOFF", default=0.3)
+# Movie details are kept in a per-process LRU in front of the shared cache. Past the TTL an entry
+# is still served for TMDB_DETAILS_STALE_TTL seconds while it is refreshed in the background.
+TMDB_CACHE_LRU_SIZE = env.int("TMDB_CACHE_LRU_SIZE", default=1024)
+TMDB_DETAILS_CACHE_TTL = env.int("TMDB_DETAILS_CACHE_TTL", default=60 * 60 * 24)
+TMDB_DETAILS_STALE_TTL = env.int("TMDB_DETAILS_STALE_TTL", default=60 * 60 * 24 * 7)
+# Movies that TMDB answers with a 404 are remembered for this long.
+TMDB_NEGATIVE_CACHE_TTL = env.int("TMDB_NEGATIVE_CACHE_TTL", default=60 * 60)
+# Concurrent identical TMDB requests wait up to this many seconds on the one already in flight.
+TMDB_SINGLE_FLIGHT_TIMEOUT = env.int("TMDB_SINGLE_FLIGHT_TIMEOUT", default=10)
+# Token bucket shared by every worker: requests per second and burst size. Backfill jobs only take a
+# token while more than TMDB_BACKFILL_RESERVE of the bucket is left, keeping room for live traffic.
+TMDB_RATE_LIMIT = env.float("TMDB_RATE_LIMIT", default=40)
+TMDB_RATE_LIMIT_BURST = env.int("TMDB_RATE_LIMIT_BURST", default=40)
+TMDB_BACKFILL_RESERVE = env.float("TMDB_BACKFILL_RESERVE", default=0.5)
+# Longest an interactive request waits for a slot, and how many times a 429 is retried.
+TMDB_RATE_LIMIT_MAX_WAIT = env.float("TMDB_RATE_LIMIT_MAX_WAIT", default=10)
+TMDB_RATE_LIMIT_RETRIES = env.int("TMDB_RATE_LIMIT_RETRIES", default=3)
+# Requests in flight at once when the async client fetches movies in batches.
+TMDB_ASYNC_CONCURRENCY = env.int("TMDB_ASYNC_CONCURRENCY", default=10)
+# The circuit to TMDB opens after this many consecutive failures or timeouts, requests then fail fast
+# and cached payloads are served until a probe succeeds, at most every TMDB_BREAKER_RESET_TIMEOUT seconds.
+TMDB_BREAKER_FAILURES = env.int("TMDB_BREAKER_FAILURES", default=5)
+TMDB_BREAKER_RESET_TIMEOUT = env.int("TMDB_BREAKER_RESET_TIMEOUT", default=30)
+# Payloads are kept this long past their stale window to be served while TMDB is down.
+TMDB_LAST_GOOD_TTL = env.int("TMDB_LAST_GOOD_TTL", default=60 * 60 * 24 * 30)
+# Pages of popular movies kept ready to send by the refresh_popular_movies command, which should run more often
+# than the snapshot expires. Pages beyond these are built on their first request, up to the last page of TMDB.
+TMDB_POPULAR_PAGES = env.int("TMDB_POPULAR_PAGES", default=5)
+TMDB_POPULAR_MAX_PAGE = 500
+TMDB_POPULAR_SNAPSHOT_TTL = env.int("TMDB_POPULAR_SNAPSHOT_TTL", default=60 * 60 * 6)
+TMDB_POPULAR_MAX_AGE = env.int("TMDB_POPULAR_MAX_AGE", default=60 * 5)
+# Search results are cached under the normalized query for a short time, then served stale while refreshed.
+# Requesting the first page of results prefetches the second one in the background.
+TMDB_SEARCH_CACHE_TTL = env.int("TMDB_SEARCH_CACHE_TTL", default=60 * 10)
+TMDB_SEARCH_STALE_TTL = env.int("TMDB_SEARCH_STALE_TTL", default=60 * 60)
+TMDB_SEARCH_PREFETCH = env.bool("TMDB_SEARCH_PREFETCH", default=True)
+# The first page of a search lists apart the movies users have logged that match, before TMDB is asked:
+# "remote" always asks TMDB, "background" returns the local matches at once, along with the TMDB results once they
+# have been fetched in the background, and "fallback" does the same unless fewer than TMDB_LOCAL_SEARCH_MIN_RESULTS
+# movies match locally, in which case it waits for TMDB.
+TMDB_SEARCH_POLICY = env("TMDB_SEARCH_POLICY", default="fallback")
+TMDB_LOCAL_SEARCH_MIN_RESULTS = env.int("TMDB_LOCAL_SEARCH_MIN_RESULTS", default=5)
+TMDB_LOCAL_SEARCH_LIMIT = env.int("TMDB_LOCAL_SEARCH_LIMIT", default=20)
+# Save new movies from the data sent by the client and fetch their TMDB details in the background after the
+# transaction commits, instead of calling TMDB while the transaction is open.
+TMDB_ENRICH_ASYNC = env.bool("TMDB_ENRICH_ASYNC", default=False)
+
+# JOBS
+# ------------------------------------------------------------------------------
+# Background jobs are stored in the database and run by the run_worker command. With JOBS_EAGER they run
+# in the process that queues them once its transaction commits, which needs no worker.
+JOBS_EAGER = env.bool("JOBS_EAGER", default=False)
+JOBS_CONCURRENCY = env.int("JOBS_CONCURRENCY", default=2)
+JOBS_POLL_INTERVAL = env.float("JOBS_POLL_INTERVAL", default=1.0)
+JOBS_MAX_ATTEMPTS = env.int("JOBS_MAX_ATTEMPTS", default=5)
+# Seconds before the first retry of a failed job, doubled on every following attempt.
+JOBS_RETRY_BACKOFF = env.int("JOBS_RETRY_BACKOFF", default=10)
+# Jobs running for longer are considered abandoned by a dead worker and queued again.
+JOBS_LOCK_TIMEOUT = env.int("JOBS_LOCK_TIMEOUT", default=60 * 10)
+# Days the jobs that succeeded or failed are kept, to be looked at in the admin, before workers delete them.
+JOBS_RETENTION_DAYS = env.int("JOBS_RETENTION_DAYS", default=7)
+
+# PROFILE CACHE
+# ------------------------------------------------------------------------------
+# Payloads of the stats, years and watched movies endpoints are cached per profile and data version, any write
+# to the views or plans of a profile invalidates them.
+PROFILE_CACHE_TTL = env.int("PROFILE_CACHE_TTL", default=60 * 60)
+# Concurrent requests for the same missing payload wait up to this many seconds on the one computing it.
+PROFILE_CACHE_SINGLE_FLIGHT_TIMEOUT = env.int("PROFILE_CACHE_SINGLE_FLIGHT_TIMEOUT", default=5)
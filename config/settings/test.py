@@ -35,3 +35,9 @@ TEMPLATES[0]["OPTIONS"]["debug"] = True  # type: ignore # noqa: F405
 MEDIA_URL = "http://media.testserver/"
 # Your stuff...
 # ------------------------------------------------------------------------------
+# Fail fast instead of retrying with backoff when a test reaches the TMDB API.
+TMDB_MAX_RETRIES = 0
+# Keep TMDB searches free of background requests, tests that need the prefetch enable it.
+TMDB_SEARCH_PREFETCH = False
+# Run background jobs inline, tests of the queue itself disable it.
+JOBS_EAGER = True
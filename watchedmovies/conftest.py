@@ -1,10 +1,13 @@
 import pytest
+from django.core.cache import cache
 from rest_framework.test import APIRequestFactory
 
 from watchedmovies.movies.models import WatchedMovie
 from watchedmovies.movies.tests.factories import WatchedMovieFactory
+from watchedmovies.services import tmdb_cache, tmdb_circuit_breaker, tmdb_rate_limit
 from watchedmovies.users.models import User
 from watchedmovies.users.tests.factories import UserFactory
+from watchedmovies.utils import metrics
 
 
 @pytest.fixture(autouse=True)
@@ -12,6 +15,18 @@ def media_storage(settings, tmpdir):
     settings.MEDIA_ROOT = tmpdir.strpath
 
 
+@pytest.fixture(autouse=True)
+def clear_caches():
+    metrics.reset()
+    cache.clear()
+    tmdb_cache.clear()
+    tmdb_rate_limit.reset()
+    tmdb_circuit_breaker.reset()
+    yield
+    cache.clear()
+    tmdb_cache.clear()
+
+
 @pytest.fixture
 def user(db) -> User:
     return UserFactory()
@@ -0,0 +1,10 @@
+from django.contrib import admin
+
+from watchedmovies.jobs.models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ["name", "status", "attempts", "run_at", "updated_at"]
+    list_filter = ["status", "name"]
+    search_fields = ["name", "dedup_key"]
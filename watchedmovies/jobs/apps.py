@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+from django.utils.translation import gettext_lazy as _
+
+
+class JobsConfig(AppConfig):
+    name = "watchedmovies.jobs"
+    verbose_name = _("Jobs")
+
+    def ready(self):
+        # Job handlers are declared in the jobs module of each app.
+        autodiscover_modules("jobs")
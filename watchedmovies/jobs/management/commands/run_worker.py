@@ -0,0 +1,83 @@
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from watchedmovies.jobs import services
+
+
+class Command(BaseCommand):
+    """
+    This command runs the background jobs queued in the database. Each worker thread claims the next due job
+    with SELECT ... FOR UPDATE SKIP LOCKED, so several threads and processes can share the queue.
+    """
+
+    help = """This command runs the background jobs queued
+    in the database."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=settings.JOBS_CONCURRENCY,
+            help="Number of jobs run at once, each in its own thread.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=settings.JOBS_POLL_INTERVAL,
+            help="Seconds to wait before looking for new jobs when the queue is empty.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Run the jobs that are due and exit instead of waiting for new ones.",
+        )
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        work = {"stop": stop, "poll_interval": options["poll_interval"], "once": options["once"]}
+        released = services.release_stale_jobs()
+
+        if released:
+            self.stdout.write(f"{released} jobs left running by a stopped worker were queued again.")
+
+        purged = services.purge_finished_jobs()
+
+        if purged:
+            self.stdout.write(
+                f"{purged} jobs finished more than {settings.JOBS_RETENTION_DAYS} days ago were deleted."
+            )
+
+        self.stdout.write(f"Running jobs with {options['concurrency']} threads.")
+
+        try:
+            if options["concurrency"] == 1:
+                services.work(**work)
+            else:
+                threads = [
+                    threading.Thread(target=self.work_in_thread, kwargs=work, name=f"job-worker-{number}")
+                    for number in range(options["concurrency"])
+                ]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    while thread.is_alive():
+                        thread.join(timeout=1)
+        except KeyboardInterrupt:
+            stop.set()
+            self.stdout.write("Stopping once the running jobs finish.")
+            for thread in threading.enumerate():
+                if thread.name.startswith("job-worker-"):
+                    thread.join()
+
+        for name, value in sorted(services.get_stats().items()):
+            self.stdout.write(f"{name}: {value}")
+        self.stdout.write(self.style.SUCCESS("The worker has stopped."))
+
+    def work_in_thread(self, **work) -> None:
+        try:
+            services.work(**work)
+        finally:
+            connection.close()
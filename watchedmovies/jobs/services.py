@@ -0,0 +1,193 @@
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from watchedmovies.utils import metrics
+
+from .models import Job
+
+PENDING_STATUSES = [Job.QUEUED, Job.RUNNING]
+# Seconds between two looks of a worker for the jobs left running by a worker that died.
+RELEASE_INTERVAL = 60
+
+_handlers: dict = {}
+
+
+def job(name: str):
+    """Register the decorated function as the handler of the jobs with the given name."""
+
+    def register(fn):
+        _handlers[name] = fn
+        return fn
+
+    return register
+
+
+def enqueue(
+    *, name: str, payload: dict = None, dedup_key: str = None, run_at=None, max_attempts: int = None
+) -> Job | None:
+    """
+    Queue a job, workers see it once the current transaction commits. A job sharing the dedup key of a job
+    still queued or running is not queued twice, the pending job is returned instead. With JOBS_EAGER nothing
+    is queued, the job runs in this process once the current transaction commits.
+    """
+    if name not in _handlers:
+        raise ValueError(f"No handler is registered for the job {name}.")
+
+    payload = payload or {}
+    metrics.incr(f"jobs.{name}.enqueued")
+
+    if settings.JOBS_EAGER:
+        # A failure is logged instead of breaking the caller, whose transaction has already committed.
+        transaction.on_commit(lambda: run_eager(name, payload), robust=True)
+        return None
+
+    if dedup_key:
+        pending = Job.objects.filter(dedup_key=dedup_key, status__in=PENDING_STATUSES).first()
+        if pending:
+            metrics.incr(f"jobs.{name}.deduplicated")
+            return pending
+
+    try:
+        with transaction.atomic():
+            return Job.objects.create(
+                name=name,
+                payload=payload,
+                dedup_key=dedup_key,
+                run_at=run_at or timezone.now(),
+                max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+            )
+    except IntegrityError:
+        # Another transaction queued the same job in the meantime.
+        metrics.incr(f"jobs.{name}.deduplicated")
+        return Job.objects.filter(dedup_key=dedup_key, status__in=PENDING_STATUSES).first()
+
+
+def run_eager(name: str, payload: dict) -> None:
+    """Run a job without queueing it, counting its outcome like a worker would."""
+    try:
+        _handlers[name](**payload)
+    except Exception:
+        metrics.incr(f"jobs.{name}.failed")
+        raise
+
+    metrics.incr(f"jobs.{name}.succeeded")
+
+
+def claim(*, limit: int = 1) -> list[Job]:
+    """
+    Lock the next jobs that are due and mark them as running. Rows locked by other workers are skipped, so
+    any number of workers can claim jobs concurrently without waiting for each other.
+    """
+    now = timezone.now()
+
+    with transaction.atomic():
+        jobs = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.QUEUED, run_at__lte=now)
+            .order_by("run_at")[:limit]
+        )
+        for claimed in jobs:
+            claimed.status = Job.RUNNING
+            claimed.attempts += 1
+            claimed.locked_at = now
+            claimed.updated_at = now
+        Job.objects.bulk_update(jobs, ["status", "attempts", "locked_at", "updated_at"])
+
+    return jobs
+
+
+def run(job: Job) -> None:
+    """Run a claimed job, a failed job is queued again with exponential backoff until it runs out of attempts."""
+    started = time.monotonic()
+
+    try:
+        handler = _handlers.get(job.name)
+        if handler is None:
+            raise LookupError(f"No handler is registered for the job {job.name}.")
+        handler(**job.payload)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = Job.QUEUED
+            job.run_at = timezone.now() + timedelta(seconds=settings.JOBS_RETRY_BACKOFF * 2 ** (job.attempts - 1))
+            event = "retried"
+        else:
+            job.status = Job.FAILED
+            event = "failed"
+    else:
+        job.status = Job.DONE
+        event = "succeeded"
+
+    job.locked_at = None
+    job.save(update_fields=["status", "run_at", "locked_at", "last_error", "updated_at"])
+
+    metrics.incr(f"jobs.{job.name}.{event}")
+    metrics.incr(f"jobs.{job.name}.duration_ms", int((time.monotonic() - started) * 1000))
+
+
+def release_stale_jobs() -> int:
+    """Queue again the jobs left running by a worker that died, once they have been locked for too long."""
+    stale = Job.objects.filter(
+        status=Job.RUNNING, locked_at__lt=timezone.now() - timedelta(seconds=settings.JOBS_LOCK_TIMEOUT)
+    )
+    stale.filter(attempts__gte=F("max_attempts")).update(status=Job.FAILED, locked_at=None)
+    released = stale.update(status=Job.QUEUED, locked_at=None)
+
+    if released:
+        metrics.incr("jobs.released", released)
+
+    return released
+
+
+def purge_finished_jobs() -> int:
+    """Delete the jobs that succeeded or failed more than JOBS_RETENTION_DAYS days ago."""
+    finished = Job.objects.filter(
+        status__in=[Job.DONE, Job.FAILED],
+        updated_at__lt=timezone.now() - timedelta(days=settings.JOBS_RETENTION_DAYS),
+    )
+    purged, _ = finished.delete()
+
+    if purged:
+        metrics.incr("jobs.purged", purged)
+
+    return purged
+
+
+def work(*, stop, poll_interval: float, once: bool = False) -> int:
+    """
+    Claim and run jobs one at a time until stop is set, or until no job is due when once is set. Every
+    RELEASE_INTERVAL seconds the jobs abandoned by dead workers are queued again and the old finished jobs
+    are deleted.
+    """
+    processed = 0
+    released_at = time.monotonic()
+
+    while not stop.is_set():
+        if time.monotonic() - released_at >= RELEASE_INTERVAL:
+            release_stale_jobs()
+            purge_finished_jobs()
+            released_at = time.monotonic()
+
+        jobs = claim(limit=1)
+
+        if not jobs:
+            if once:
+                break
+            stop.wait(poll_interval)
+            continue
+
+        run(jobs[0])
+        processed += 1
+
+    return processed
+
+
+def get_stats() -> dict:
+    """Return the counters of every job type."""
+    return {name.removeprefix("jobs."): value for name, value in metrics.snapshot("jobs.").items()}
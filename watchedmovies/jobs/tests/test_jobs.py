@@ -0,0 +1,164 @@
+import threading
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core import mail
+from django.core.management import call_command
+from django.utils import timezone
+
+from watchedmovies.jobs import services
+from watchedmovies.jobs.models import Job
+from watchedmovies.users.services import send_password_reset_email, user_create
+from watchedmovies.users.tests.factories import UserFactory
+
+calls = []
+
+
+@services.job("tests.record")
+def record_job(*, value):
+    calls.append(value)
+
+
+@services.job("tests.fail")
+def fail_job():
+    raise RuntimeError("Boom")
+
+
+@pytest.fixture(autouse=True)
+def queue(settings):
+    settings.JOBS_EAGER = False
+    calls.clear()
+
+
+def test_enqueue_deduplicates_pending_jobs(db):
+    first = services.enqueue(name="tests.record", payload={"value": 1}, dedup_key="record:1")
+    second = services.enqueue(name="tests.record", payload={"value": 1}, dedup_key="record:1")
+
+    assert first.pk == second.pk
+    assert Job.objects.count() == 1
+    assert services.get_stats()["tests.record.deduplicated"] == 1
+
+
+def test_enqueue_rejects_unknown_jobs(db):
+    with pytest.raises(ValueError):
+        services.enqueue(name="tests.unknown")
+
+
+def test_eager_jobs_run_once_the_transaction_commits(db, settings, django_capture_on_commit_callbacks):
+    settings.JOBS_EAGER = True
+
+    with django_capture_on_commit_callbacks(execute=True):
+        assert services.enqueue(name="tests.record", payload={"value": 1}) is None
+        assert calls == []
+
+    assert calls == [1]
+    assert not Job.objects.exists()
+
+
+def test_failed_eager_jobs_do_not_break_the_caller(db, settings, django_capture_on_commit_callbacks):
+    settings.JOBS_EAGER = True
+
+    with django_capture_on_commit_callbacks(execute=True):
+        services.enqueue(name="tests.fail")
+
+    assert services.get_stats()["tests.fail.failed"] == 1
+
+
+def test_claim_skips_jobs_that_are_not_due(db):
+    services.enqueue(name="tests.record", payload={"value": 1}, run_at=timezone.now() + timedelta(hours=1))
+    due = services.enqueue(name="tests.record", payload={"value": 2})
+
+    claimed = services.claim(limit=5)
+
+    assert [job.pk for job in claimed] == [due.pk]
+    due.refresh_from_db()
+    assert (due.status, due.attempts) == (Job.RUNNING, 1)
+    assert services.claim(limit=5) == []
+
+
+def test_failed_job_is_retried_with_backoff_until_it_runs_out_of_attempts(db, settings):
+    settings.JOBS_RETRY_BACKOFF = 10
+    job = services.enqueue(name="tests.fail", max_attempts=2)
+
+    services.run(services.claim()[0])
+    job.refresh_from_db()
+    assert job.status == Job.QUEUED
+    assert job.run_at > timezone.now() + timedelta(seconds=5)
+    assert "RuntimeError: Boom" in job.last_error
+
+    Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+    services.run(services.claim()[0])
+    job.refresh_from_db()
+    assert job.status == Job.FAILED
+    assert services.get_stats()["tests.fail.retried"] == 1
+    assert services.get_stats()["tests.fail.failed"] == 1
+
+
+def test_stale_running_jobs_are_released(db, settings):
+    job = services.enqueue(name="tests.record", payload={"value": 1})
+    services.claim()
+    Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(seconds=settings.JOBS_LOCK_TIMEOUT + 1))
+
+    assert services.release_stale_jobs() == 1
+    job.refresh_from_db()
+    assert job.status == Job.QUEUED
+
+
+def test_running_worker_releases_stale_jobs_periodically(db, settings, monkeypatch):
+    monkeypatch.setattr(services, "RELEASE_INTERVAL", 0)
+    job = services.enqueue(name="tests.record", payload={"value": 1})
+    services.claim()
+    Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(seconds=settings.JOBS_LOCK_TIMEOUT + 1))
+
+    assert services.work(stop=threading.Event(), poll_interval=0, once=True) == 1
+    assert calls == [1]
+    assert services.get_stats()["released"] == 1
+
+
+def test_old_finished_jobs_are_purged(db, settings):
+    jobs = [services.enqueue(name="tests.record", payload={"value": value}) for value in range(3)]
+    Job.objects.filter(pk__in=[jobs[0].pk, jobs[1].pk]).update(status=Job.DONE)
+    Job.objects.filter(pk=jobs[0].pk).update(
+        updated_at=timezone.now() - timedelta(days=settings.JOBS_RETENTION_DAYS + 1)
+    )
+
+    assert services.purge_finished_jobs() == 1
+    assert set(Job.objects.values_list("pk", flat=True)) == {jobs[1].pk, jobs[2].pk}
+
+
+def test_run_worker_runs_due_jobs_once(db):
+    for value in range(3):
+        services.enqueue(name="tests.record", payload={"value": value})
+
+    out = StringIO()
+    call_command("run_worker", "--concurrency", "1", "--once", stdout=out)
+
+    assert calls == [0, 1, 2]
+    assert Job.objects.filter(status=Job.DONE).count() == 3
+    assert "tests.record.succeeded: 3" in out.getvalue()
+
+
+def test_work_stops_when_asked(db):
+    stop = threading.Event()
+    stop.set()
+
+    assert services.work(stop=stop, poll_interval=0) == 0
+
+
+def test_emails_are_sent_by_the_worker(db):
+    user = UserFactory()
+    services.enqueue(name="users.send_email", payload={"user_id": user.pk, "kind": "password_reset"})
+    assert mail.outbox == []
+
+    services.work(stop=threading.Event(), poll_interval=0, once=True)
+
+    assert [message.to for message in mail.outbox] == [[user.email]]
+
+
+def test_email_jobs_do_not_store_tokens(db):
+    user_create(email="new@example.com", password="s3cret-Passw0rd")
+    send_password_reset_email(email="new@example.com")
+
+    assert [job.payload["kind"] for job in Job.objects.order_by("pk")] == ["verification", "password_reset"]
+    assert all(set(job.payload) == {"user_id", "kind"} for job in Job.objects.all())
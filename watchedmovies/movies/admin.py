@@ -1,10 +1,23 @@
 from django.contrib import admin
 
-from watchedmovies.movies.models import WatchedMovie
+from watchedmovies.movies.models import Genre, TMDBCatalogEntry, WatchedMovie
 
 
 @admin.register(WatchedMovie)
 class WatchedMovieAdmin(admin.ModelAdmin):
     list_display = ["title", "release_date", "original_language"]
-    list_filter = ["release_date", "original_language"]
+    list_filter = ["release_date", "original_language", "genres"]
     search_fields = ["title"]
+
+
+@admin.register(Genre)
+class GenreAdmin(admin.ModelAdmin):
+    list_display = ["id", "name"]
+    search_fields = ["name"]
+
+
+@admin.register(TMDBCatalogEntry)
+class TMDBCatalogEntryAdmin(admin.ModelAdmin):
+    list_display = ["id", "original_title", "popularity", "adult"]
+    list_filter = ["adult", "video"]
+    search_fields = ["=id", "title", "original_title"]
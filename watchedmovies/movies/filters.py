@@ -1,12 +1,47 @@
 import django_filters
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db.models.functions import Greatest
+from rest_framework import filters
+
+from watchedmovies.utils.postgres import has_extension
 
 from .models import ViewDetails, WatchedMovie
 
 
+class TrigramSearchFilter(filters.SearchFilter):
+    """
+    Search filter served by the trigram indexes of the search fields. Matches are found with icontains, which
+    the indexes on UPPER(field) serve, and annotated as search_rank with their best trigram similarity to the
+    search terms. Without pg_trgm the matches are found the same way, unindexed and without a rank.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        queryset = super().filter_queryset(request, queryset, view)
+        terms = " ".join(self.get_search_terms(request))
+
+        if not terms or not has_extension("pg_trgm"):
+            return queryset
+
+        similarities = [TrigramSimilarity(field, terms) for field in self.get_search_fields(view, request)]
+        rank = Greatest(*similarities) if len(similarities) > 1 else similarities[0]
+        return queryset.annotate(search_rank=rank)
+
+
+class SearchRankOrderingFilter(filters.OrderingFilter):
+    """Ordering filter that sorts searches by their rank, the most similar first, unless an ordering is asked."""
+
+    def get_ordering(self, request, queryset, view):
+        if not request.query_params.get(self.ordering_param) and "search_rank" in queryset.query.annotations:
+            return ["-search_rank", *self.get_default_ordering(view)]
+
+        return super().get_ordering(request, queryset, view)
+
+
 class WatchedMovieFilter(django_filters.FilterSet):
     """Filter for watched movies."""
 
     watched_date_year = django_filters.NumberFilter(method="filter_watched_date_year")
+    genre = django_filters.NumberFilter(field_name="genres")
 
     class Meta:
         model = WatchedMovie
@@ -14,18 +49,21 @@ class WatchedMovieFilter(django_filters.FilterSet):
 
     def filter_watched_date_year(self, queryset, name, value):
         """Filter watched movies by first watched date."""
-        return queryset.filter(view_details__watched_date__year=value, view_details__profile=self.request.user.profile)
+        views = ViewDetails.objects.filter(watched_date__year=value, profile=self.request.user.profile)
+        return queryset.filter(id__in=views.values("watched_movie_id"))
 
 
 class ViewDetailFilter(django_filters.FilterSet):
     """Filter for view details."""
 
     watched = django_filters.NumberFilter(field_name="watched_movie__id", lookup_expr="exact")
+    genre = django_filters.NumberFilter(field_name="watched_movie__genres")
 
     class Meta:
         model = ViewDetails
+        # Choice fields are matched by their stored keys, a substring match on them is never needed.
         fields = {
             "rating": ["exact", "gt", "lt"],
-            "language": ["icontains"],
-            "place": ["icontains"],
+            "language": ["exact", "in"],
+            "place": ["exact", "in"],
         }
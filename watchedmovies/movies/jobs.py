@@ -0,0 +1,9 @@
+from watchedmovies.jobs.services import job
+
+from .services import enrich_watched_movie
+
+
+@job("movies.enrich_watched_movie")
+def enrich_watched_movie_job(*, movie_id: int) -> None:
+    """Complete the runtime and details of a movie saved without them."""
+    enrich_watched_movie(movie_id=movie_id)
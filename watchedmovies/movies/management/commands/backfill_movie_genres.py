@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+
+from watchedmovies.movies.models import WatchedMovie
+from watchedmovies.movies.services import refresh_year_stats_for_movies, set_movie_genres
+
+
+class Command(BaseCommand):
+    """
+    This command fills the genres of the movies saved before genres had their own table, from the genres listed in
+    their details. Movies are processed in batches ordered by ID and the statistics of their viewers are rebuilt.
+    """
+
+    help = """This command fills the genres of the movies
+    from the genres listed in their details."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of movies updated together.",
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Also replace the genres of the movies that already have some.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        watched_movies = (
+            WatchedMovie.objects.filter(more_details__isnull=False).order_by("id").only("id", "more_details")
+        )
+
+        if not options["all"]:
+            watched_movies = watched_movies.filter(genres__isnull=True)
+
+        updated = 0
+        batch = []
+
+        for watched_movie in watched_movies.iterator(chunk_size=batch_size):
+            batch.append(watched_movie)
+            if len(batch) == batch_size:
+                updated += self.backfill_batch(batch)
+                batch = []
+
+        if batch:
+            updated += self.backfill_batch(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"The genres of {updated} movies have been filled."))
+
+    def backfill_batch(self, batch: list) -> int:
+        """Set the genres of a batch of movies and rebuild the statistics that count them."""
+        set_movie_genres(movies=batch)
+        refresh_year_stats_for_movies(movie_ids=[movie.pk for movie in batch])
+        return len(batch)
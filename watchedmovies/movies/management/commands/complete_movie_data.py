@@ -1,27 +1,142 @@
+import time
+
+from django.conf import settings
 from django.core.management.base import BaseCommand
+from django.db.models import Q
 
 from watchedmovies.movies.models import WatchedMovie
-from watchedmovies.movies.services import tmdb_api
+from watchedmovies.movies.services import (
+    get_counted_details,
+    get_sync_checkpoint,
+    get_year_stats_for_movies,
+    rebuild_year_stats_many,
+    save_sync_checkpoint,
+    set_movie_genres,
+)
+from watchedmovies.services import tmdb_async, tmdb_rate_limit
+
+CHECKPOINT_NAME = "complete_movie_data"
 
 
 class Command(BaseCommand):
     """
     This command completes the data of the movies. It makes a request to the TMDB API to get the details of each movie.
+    Movies are streamed in batches ordered by ID, the details of a batch are fetched concurrently and saved with a
+    single bulk update, and the last saved ID is stored as a checkpoint so an interrupted run can be resumed. The
+    yearly rollups counting views of movies whose runtime or genres changed are rebuilt once each at the end.
     """
 
     help = """This command completes the data of the movies. It makes
     a request to the TMDB API to get the details of each movie."""
 
-    def handle(self, *args, **kwargs):
-        watched_movies = WatchedMovie.objects.all()
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--only-missing",
+            action="store_true",
+            help="Only complete the movies without runtime or details.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=settings.TMDB_ASYNC_CONCURRENCY,
+            help="Number of requests to TMDB in flight at once.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Number of movies fetched and saved together.",
+        )
+        parser.add_argument(
+            "--since-id",
+            type=int,
+            default=None,
+            help="Only complete the movies with an ID greater than this one.",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Continue after the last movie saved by an interrupted run.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report the movies that would be completed without calling TMDB or saving.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        since_id = options["since_id"]
 
-        for watched_movie in watched_movies:
-            movie_details = tmdb_api.get_movie_details(watched_movie.pk)
-            watched_movie.runtime = movie_details.get("runtime")
-            watched_movie.more_details = movie_details
-            watched_movie.full_clean()
-            watched_movie.save()
+        if options["resume"]:
+            since_id = get_sync_checkpoint(name=CHECKPOINT_NAME).get("last_id", since_id)
+
+        watched_movies = WatchedMovie.objects.order_by("id").only("id", "runtime", "more_details")
+
+        if options["only_missing"]:
+            watched_movies = watched_movies.filter(Q(runtime__isnull=True) | Q(more_details__isnull=True))
+
+        if since_id is not None:
+            watched_movies = watched_movies.filter(id__gt=since_id)
 
+        if options["dry_run"]:
+            total = watched_movies.count()
+            self.stdout.write(f"{total} movies would be completed in {-(-total // batch_size)} batches.")
+            return
+
+        started = time.monotonic()
+        stats = {"processed": 0, "updated": 0, "failed": 0}
+        batch = []
+        self.year_stats = set()
+
+        try:
+            with tmdb_rate_limit.priority(tmdb_rate_limit.BACKFILL):
+                for watched_movie in watched_movies.iterator(chunk_size=batch_size):
+                    batch.append(watched_movie)
+                    if len(batch) == batch_size:
+                        self.complete_batch(batch, options["concurrency"], stats)
+                        batch = []
+
+                if batch:
+                    self.complete_batch(batch, options["concurrency"], stats)
+        finally:
+            # Also when the run stops halfway, the rollups of the movies completed so far are not left stale.
+            rebuild_year_stats_many(pairs=self.year_stats)
+
+        elapsed = time.monotonic() - started
+        throughput = stats["processed"] / elapsed if elapsed else 0
+        self.stdout.write(
+            f"Processed {stats['processed']} movies in {elapsed:.1f}s ({throughput:.1f} movies/s): "
+            f"{stats['updated']} updated, {stats['failed']} without details."
+        )
         self.stdout.write(
             self.style.SUCCESS("All movies have been updated successfully!"),
         )
+
+    def complete_batch(self, batch: list, concurrency: int, stats: dict) -> None:
+        """Fetch the details of a batch of movies, save them with one query and move the checkpoint forward."""
+        details = tmdb_async.fetch_movie_details_many([movie.pk for movie in batch], concurrency=concurrency)
+        updated = []
+        counted_changed = []
+
+        for watched_movie in batch:
+            movie_details = details.get(watched_movie.pk)
+            if not movie_details:
+                stats["failed"] += 1
+                continue
+
+            counted = get_counted_details(watched_movie)
+            watched_movie.runtime = movie_details.get("runtime")
+            watched_movie.more_details = movie_details
+            updated.append(watched_movie)
+            if get_counted_details(watched_movie) != counted:
+                counted_changed.append(watched_movie.pk)
+
+        WatchedMovie.objects.bulk_update(updated, ["runtime", "more_details"])
+        set_movie_genres(movies=updated)
+        self.year_stats |= get_year_stats_for_movies(movie_ids=counted_changed)
+        save_sync_checkpoint(name=CHECKPOINT_NAME, value={"last_id": batch[-1].pk})
+
+        stats["processed"] += len(batch)
+        stats["updated"] += len(updated)
+        self.stdout.write(f"Completed {stats['processed']} movies (last ID {batch[-1].pk}).")
@@ -0,0 +1,87 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from watchedmovies.movies.models import PlanToWatch, ViewDetails, WatchedMovie
+from watchedmovies.movies.services import refresh_movie_summary, refresh_year_stats_for_movies
+from watchedmovies.services import profile_cache
+
+
+class Command(BaseCommand):
+    """
+    This command merges the movies saved more than once, under different IDs, with the same original title and
+    release date. The views and plans to watch of the duplicates are moved to the movie that is kept, and the
+    duplicates are deleted. It is meant to be run once, new movies are keyed by their TMDB ID.
+    """
+
+    help = """This command merges the duplicated movies, those with the
+    same original title and release date, into a single movie."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report the duplicates without merging them.",
+        )
+
+    def handle(self, *args, **options):
+        groups = (
+            WatchedMovie.objects.values("original_title", "release_date")
+            .annotate(count=Count("id"))
+            .filter(count__gt=1)
+            .order_by("original_title", "release_date")
+        )
+        merged = 0
+
+        for group in groups:
+            movies = list(
+                WatchedMovie.objects.filter(
+                    original_title=group["original_title"], release_date=group["release_date"]
+                ).order_by("id")
+            )
+            kept = self.choose_movie_to_keep(movies)
+            duplicates = [movie for movie in movies if movie.pk != kept.pk]
+
+            self.stdout.write(
+                f"{kept.original_title} ({kept.release_date}): keeping {kept.pk}, "
+                f"merging {', '.join(str(movie.pk) for movie in duplicates)}."
+            )
+
+            if not options["dry_run"]:
+                self.merge(kept, duplicates)
+            merged += len(duplicates)
+
+        verb = "would be merged" if options["dry_run"] else "have been merged"
+        self.stdout.write(self.style.SUCCESS(f"{merged} duplicated movies {verb}."))
+
+    def choose_movie_to_keep(self, movies: list[WatchedMovie]) -> WatchedMovie:
+        """Prefer the movie whose ID is confirmed by its TMDB details, then any movie with details, then the oldest."""
+        for movie in movies:
+            if movie.more_details and movie.more_details.get("id") == movie.pk:
+                return movie
+
+        return next((movie for movie in movies if movie.more_details), movies[0])
+
+    @transaction.atomic
+    def merge(self, kept: WatchedMovie, duplicates: list[WatchedMovie]) -> None:
+        """Move the views and plans to watch of the duplicates to the kept movie and delete the duplicates."""
+        duplicate_ids = [movie.pk for movie in duplicates]
+
+        ViewDetails.objects.filter(watched_movie_id__in=duplicate_ids).update(watched_movie=kept)
+
+        # A profile can plan to watch a movie only once, plans already on the kept movie win.
+        for plan in PlanToWatch.objects.filter(movie_id__in=duplicate_ids).order_by("id"):
+            if PlanToWatch.objects.filter(movie=kept, profile_id=plan.profile_id).exists():
+                plan.delete()
+            else:
+                plan.movie = kept
+                plan.save(update_fields=["movie"])
+            profile_cache.bump_version(plan.profile_id)
+
+        WatchedMovie.objects.filter(id__in=duplicate_ids).delete()
+        refresh_year_stats_for_movies(movie_ids=[kept.pk])
+
+        for profile_id in (
+            ViewDetails.objects.filter(watched_movie=kept).values_list("profile_id", flat=True).distinct()
+        ):
+            refresh_movie_summary(profile_id=profile_id, movie_id=kept.pk)
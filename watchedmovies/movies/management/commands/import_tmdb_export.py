@@ -0,0 +1,99 @@
+import gzip
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from watchedmovies.movies.models import TMDBCatalogEntry
+
+UPDATE_FIELDS = ["title", "original_title", "popularity", "adult", "video", "updated_at"]
+
+
+class Command(BaseCommand):
+    """
+    This command imports a daily ID export of TMDB, a gzipped file with a JSON movie per line, into the local catalog.
+    The file is streamed line by line and each batch of movies is upserted with a single query, so exports of
+    any size are imported in constant memory.
+    """
+
+    help = """This command imports a daily movie ID export of TMDB
+    into the local catalog of movies."""
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Path of the export, gzipped or not, e.g. movie_ids_05_15_2024.json.gz.")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Number of movies upserted together.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        opener = gzip.open if path.endswith(".gz") else open
+        started = time.monotonic()
+        stats = {"imported": 0, "skipped": 0}
+        # Entries of the batch by ID: an upsert cannot touch the same row twice, the last line of a movie wins.
+        batch = {}
+
+        try:
+            with opener(path, "rt", encoding="utf-8") as export:
+                for line in export:
+                    entry = self.parse_line(line)
+                    if entry is None:
+                        if line.strip():
+                            stats["skipped"] += 1
+                        continue
+
+                    batch[entry.id] = entry
+                    if len(batch) == options["batch_size"]:
+                        self.upsert(list(batch.values()), stats, started)
+                        batch = {}
+        except (OSError, EOFError) as error:
+            raise CommandError(f"Could not read {path}: {error}")
+
+        if batch:
+            self.upsert(list(batch.values()), stats, started)
+
+        elapsed = time.monotonic() - started
+        throughput = stats["imported"] / elapsed if elapsed else 0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {stats['imported']} movies in {elapsed:.1f}s ({throughput:.0f} rows/s), "
+                f"{stats['skipped']} lines skipped."
+            )
+        )
+
+    def parse_line(self, line: str) -> TMDBCatalogEntry | None:
+        """Build a catalog entry from a line of the export, or None when the line is not a valid movie."""
+        try:
+            movie = json.loads(line)
+            movie_id = int(movie["id"])
+        except (ValueError, KeyError, TypeError):
+            return None
+
+        original_title = movie.get("original_title") or ""
+        return TMDBCatalogEntry(
+            id=movie_id,
+            title=movie.get("title") or original_title,
+            original_title=original_title,
+            popularity=movie.get("popularity") or 0,
+            adult=bool(movie.get("adult")),
+            video=bool(movie.get("video")),
+        )
+
+    def upsert(self, batch: list, stats: dict, started: float) -> None:
+        """Insert the new movies of a batch and update the existing ones with one query."""
+        now = timezone.now()
+        for entry in batch:
+            entry.updated_at = now
+
+        TMDBCatalogEntry.objects.bulk_create(
+            batch, update_conflicts=True, unique_fields=["id"], update_fields=UPDATE_FIELDS
+        )
+
+        stats["imported"] += len(batch)
+        elapsed = time.monotonic() - started
+        throughput = stats["imported"] / elapsed if elapsed else 0
+        self.stdout.write(f"Imported {stats['imported']} movies ({throughput:.0f} rows/s).")
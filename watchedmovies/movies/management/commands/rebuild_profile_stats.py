@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from watchedmovies.movies.services import rebuild_movie_summaries, rebuild_year_stats
+from watchedmovies.services import profile_cache
+from watchedmovies.users.models import Profile
+
+
+class Command(BaseCommand):
+    """
+    This command recomputes the yearly statistics rollups and the movie summaries of the profiles from their views.
+    They are kept up to date as views are logged, edited and deleted, it is meant to repair them or to fill them
+    after a bulk import.
+    """
+
+    help = """This command recomputes the yearly statistics and the
+    movie summaries of the profiles from their views."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--profile-id",
+            type=int,
+            default=None,
+            help="Only rebuild the statistics of this profile.",
+        )
+
+    def handle(self, *args, **options):
+        profiles = Profile.objects.order_by("id").values_list("id", flat=True)
+
+        if options["profile_id"] is not None:
+            profiles = profiles.filter(id=options["profile_id"])
+
+        rebuilt = 0
+        for profile_id in profiles.iterator():
+            rebuild_year_stats(profile_id=profile_id)
+            rebuild_movie_summaries(profile_id=profile_id)
+            profile_cache.bump_version(profile_id)
+            rebuilt += 1
+
+        self.stdout.write(self.style.SUCCESS(f"The statistics of {rebuilt} profiles have been rebuilt."))
@@ -0,0 +1,165 @@
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from watchedmovies.movies.models import WatchedMovie
+from watchedmovies.movies.services import (
+    get_counted_details,
+    get_sync_checkpoint,
+    get_year_stats_for_movies,
+    rebuild_year_stats_many,
+    save_sync_checkpoint,
+    set_movie_genres,
+)
+from watchedmovies.services import tmdb_api, tmdb_async, tmdb_rate_limit
+
+CHECKPOINT_NAME = "refresh_changed_movies"
+# TMDB does not accept a changes window longer than this.
+MAX_WINDOW_DAYS = 14
+
+
+class Command(BaseCommand):
+    """
+    This command refreshes the details of the movies that changed on TMDB since the last run.
+    It reads the movie changes feed, keeps the IDs stored in WatchedMovie and refetches only those in
+    batches. The end of the window is stored as a high-water mark for the next run, along with the IDs of the
+    movies whose details could not be fetched, which the next run retries first. The yearly rollups counting
+    views of movies whose runtime or genres changed are rebuilt once each at the end of the run.
+    """
+
+    help = """This command refreshes the details of the movies that
+    changed on TMDB since the last run."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--start-date",
+            type=date.fromisoformat,
+            default=None,
+            help="First day of the changes window, defaults to the high-water mark or yesterday.",
+        )
+        parser.add_argument(
+            "--end-date",
+            type=date.fromisoformat,
+            default=None,
+            help="Last day of the changes window, defaults to today.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=settings.TMDB_ASYNC_CONCURRENCY,
+            help="Number of requests to TMDB in flight at once.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Number of movies fetched and saved together.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report the changed movies without refreshing them or moving the high-water mark.",
+        )
+
+    def handle(self, *args, **options):
+        end_date = options["end_date"] or date.today()
+        start_date = options["start_date"]
+
+        checkpoint = get_sync_checkpoint(name=CHECKPOINT_NAME)
+        if start_date is None:
+            last_end_date = checkpoint.get("last_end_date")
+            start_date = date.fromisoformat(last_end_date) if last_end_date else end_date - timedelta(days=1)
+
+        started = time.monotonic()
+        stats = {"changed": 0, "ours": 0, "updated": 0, "failed": 0}
+        failed_ids = set()
+        self.year_stats = set()
+
+        try:
+            with tmdb_rate_limit.priority(tmdb_rate_limit.BACKFILL):
+                if not options["dry_run"]:
+                    failed_ids = self.refresh(checkpoint.get("failed_ids", []), options, stats)
+
+                window_start = start_date
+                while window_start <= end_date:
+                    window_end = min(window_start + timedelta(days=MAX_WINDOW_DAYS - 1), end_date)
+                    changed_ids = self.get_our_changed_ids(window_start, window_end, stats)
+
+                    if not options["dry_run"]:
+                        failed_ids |= self.refresh(changed_ids, options, stats)
+                        save_sync_checkpoint(
+                            name=CHECKPOINT_NAME,
+                            value={"last_end_date": window_end.isoformat(), "failed_ids": sorted(failed_ids)},
+                        )
+
+                    window_start = window_end + timedelta(days=1)
+        finally:
+            # Also when the run stops halfway, the rollups of the movies refreshed so far are not left stale.
+            rebuild_year_stats_many(pairs=self.year_stats)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f"{stats['changed']} movies changed on TMDB between {start_date} and {end_date}, {stats['ours']} of "
+            f"them are ours: {stats['updated']} refreshed, {stats['failed']} without details in {elapsed:.1f}s."
+        )
+
+    def get_our_changed_ids(self, start_date: date, end_date: date, stats: dict) -> list:
+        """Walk every page of the changes feed and keep the IDs of the movies we store."""
+        our_ids = set()
+        page = 1
+        total_pages = 1
+
+        while page <= total_pages:
+            changes = tmdb_api.get_movie_changes(start_date, end_date, page)
+            ids = [change["id"] for change in changes.get("results", [])]
+            our_ids.update(WatchedMovie.objects.filter(id__in=ids).values_list("id", flat=True))
+            stats["changed"] += len(ids)
+            total_pages = changes.get("total_pages", 1)
+            page += 1
+
+        stats["ours"] += len(our_ids)
+        return sorted(our_ids)
+
+    def refresh(self, ids: list, options: dict, stats: dict) -> set:
+        """Refresh the given movies in batches and return the IDs of those whose details could not be fetched."""
+        failed_ids = set()
+        for i in range(0, len(ids), options["batch_size"]):
+            batch = ids[i : i + options["batch_size"]]
+            failed_ids |= self.refresh_batch(batch, options["concurrency"], stats)
+        return failed_ids
+
+    def refresh_batch(self, ids: list, concurrency: int, stats: dict) -> set:
+        """
+        Refetch the details of a batch of movies, bypassing the cache, and save them with one query.
+        Return the IDs of the movies whose details could not be fetched, other than those TMDB does not know.
+        """
+        details = tmdb_async.fetch_movie_details_many(ids, concurrency=concurrency, use_cache=False)
+        movies = WatchedMovie.objects.filter(id__in=ids).only("id", "runtime", "more_details")
+        updated = []
+        failed_ids = set()
+
+        counted_changed = []
+
+        for watched_movie in movies:
+            movie_details = details.get(watched_movie.pk)
+            if not movie_details:
+                stats["failed"] += 1
+                # A movie removed from TMDB would fail the same way on every run, only outages are retried.
+                if not tmdb_api.is_movie_not_found(watched_movie.pk):
+                    failed_ids.add(watched_movie.pk)
+                continue
+
+            counted = get_counted_details(watched_movie)
+            watched_movie.runtime = movie_details.get("runtime")
+            watched_movie.more_details = movie_details
+            updated.append(watched_movie)
+            if get_counted_details(watched_movie) != counted:
+                counted_changed.append(watched_movie.pk)
+
+        WatchedMovie.objects.bulk_update(updated, ["runtime", "more_details"])
+        set_movie_genres(movies=updated)
+        self.year_stats |= get_year_stats_for_movies(movie_ids=counted_changed)
+        stats["updated"] += len(updated)
+        return failed_ids
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from watchedmovies.movies.services import build_popular_movies_snapshot
+
+
+class Command(BaseCommand):
+    """
+    This command refreshes the snapshot of the popular movies served by the popular movies endpoint.
+    Each page is fetched from TMDB, serialized once and cached as ready-to-send JSON with its ETag, so the
+    endpoint never calls TMDB. It is meant to run periodically, e.g. every hour from cron.
+    """
+
+    help = """This command refreshes the cached pages of popular movies
+    served by the popular movies endpoint."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--pages",
+            type=int,
+            default=settings.TMDB_POPULAR_PAGES,
+            help="Number of pages of popular movies to refresh.",
+        )
+
+    def handle(self, *args, **options):
+        refreshed = 0
+
+        for page in range(1, options["pages"] + 1):
+            if build_popular_movies_snapshot(page=page) is None:
+                self.stdout.write(self.style.WARNING(f"Page {page} of popular movies could not be fetched."))
+                continue
+            refreshed += 1
+
+        self.stdout.write(self.style.SUCCESS(f"{refreshed} pages of popular movies have been refreshed."))
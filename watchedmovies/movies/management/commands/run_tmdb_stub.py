@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+
+from watchedmovies.services.tmdb_stub import FIXTURES_DIR, TMDBStubServer
+
+
+class Command(BaseCommand):
+    """
+    This command runs a local stand-in for the TMDB API and its image CDN, so benchmarks and load tests
+    of the TMDB and collage paths are reproducible without network. Point TMDB_BASE_URL at
+    http://<host>:<port>/3 and TMDB_SECURE_BASE_URL at http://<host>:<port>/t/p/ to use it.
+    """
+
+    help = """This command runs a local stand-in for the TMDB API
+    with recorded fixtures and injectable latency and errors."""
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on.")
+        parser.add_argument("--port", type=int, default=8001, help="Port to listen on.")
+        parser.add_argument("--fixtures", default=str(FIXTURES_DIR), help="Directory of recorded fixtures.")
+        parser.add_argument("--latency", type=float, default=0, help="Milliseconds added to every response.")
+        parser.add_argument("--jitter", type=float, default=0, help="Random extra milliseconds, up to this value.")
+        parser.add_argument("--error-rate", type=float, default=0, help="Fraction of requests answered with a 500.")
+        parser.add_argument("--throttle-rate", type=float, default=0, help="Fraction of requests answered with a 429.")
+        parser.add_argument("--seed", type=int, default=None, help="Seed of the injected latency and errors.")
+        parser.add_argument(
+            "--record",
+            metavar="URL",
+            default=None,
+            help="Record the requests without a fixture from this API, e.g. https://api.themoviedb.org/3.",
+        )
+
+    def handle(self, *args, **options):
+        server = TMDBStubServer(
+            (options["host"], options["port"]),
+            fixtures_dir=options["fixtures"],
+            latency=options["latency"] / 1000,
+            jitter=options["jitter"] / 1000,
+            error_rate=options["error_rate"],
+            throttle_rate=options["throttle_rate"],
+            record_from=options["record"],
+            seed=options["seed"],
+            verbose=options["verbosity"] > 1,
+        )
+        self.stdout.write(self.style.SUCCESS(f"TMDB stand-in listening on {server.url}/3"))
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f"Served {server.get_stats()}")
@@ -0,0 +1,27 @@
+# Generated by Django 5.1 on 2026-10-18 16:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0014_viewdetails_is_favorite"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SyncCheckpoint",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("name", models.CharField(max_length=100, unique=True)),
+                ("value", models.JSONField(default=dict)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Sync Checkpoint",
+                "verbose_name_plural": "Sync Checkpoints",
+                "ordering": ["name"],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1 on 2026-10-18 16:26
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0015_synccheckpoint"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="watchedmovie",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.search.CombinedSearchVector(
+                    django.contrib.postgres.search.CombinedSearchVector(
+                        django.contrib.postgres.search.SearchVector("title", config="simple", weight="A"),
+                        "||",
+                        django.contrib.postgres.search.SearchVector("original_title", config="simple", weight="A"),
+                        django.contrib.postgres.search.SearchConfig("simple"),
+                    ),
+                    "||",
+                    django.contrib.postgres.search.SearchVector("overview", config="simple", weight="C"),
+                    django.contrib.postgres.search.SearchConfig("simple"),
+                ),
+                name="watchedmovie_search_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1 on 2026-10-18 16:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0016_watchedmovie_search_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TMDBCatalogEntry",
+            fields=[
+                ("id", models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ("title", models.CharField(blank=True, max_length=510)),
+                ("original_title", models.CharField(blank=True, max_length=510)),
+                ("popularity", models.FloatField(default=0)),
+                ("adult", models.BooleanField(default=False)),
+                ("video", models.BooleanField(default=False)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "TMDB Catalog Entry",
+                "verbose_name_plural": "TMDB Catalog",
+                "ordering": ["id"],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.1 on 2026-10-18 16:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0017_tmdbcatalogentry"),
+        ("users", "0003_user_email_verified"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProfileYearStats",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("year", models.PositiveIntegerField()),
+                ("total", models.PositiveIntegerField(default=0)),
+                ("runtime_minutes", models.PositiveIntegerField(default=0)),
+                ("rating_sum", models.PositiveIntegerField(default=0)),
+                ("rating_count", models.PositiveIntegerField(default=0)),
+                ("counters", models.JSONField(default=dict)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "profile",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="year_stats", to="users.profile"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Profile Year Stats",
+                "verbose_name_plural": "Profile Year Stats",
+                "ordering": ["profile", "year"],
+                "unique_together": {("profile", "year")},
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0018_profileyearstats"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Genre",
+            fields=[
+                ("id", models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ("name", models.CharField(max_length=100)),
+            ],
+            options={
+                "ordering": ["name"],
+            },
+        ),
+        migrations.AddField(
+            model_name="watchedmovie",
+            name="genres",
+            field=models.ManyToManyField(blank=True, related_name="movies", to="movies.genre"),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.1 on 2026-10-18 16:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0019_genre"),
+        ("users", "0003_user_email_verified"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProfileMovieSummary",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("total_views", models.PositiveIntegerField(default=0)),
+                ("avg_rating", models.FloatField(blank=True, null=True)),
+                ("first_watched_date", models.DateField(blank=True, null=True)),
+                ("last_watched_date", models.DateField(blank=True, null=True)),
+                ("is_favorite", models.BooleanField(default=False)),
+                (
+                    "movie",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="summaries", to="movies.watchedmovie"
+                    ),
+                ),
+                (
+                    "profile",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="movie_summaries", to="users.profile"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Profile Movie Summary",
+                "verbose_name_plural": "Profile Movie Summaries",
+                "ordering": ["profile", "-last_watched_date"],
+                "indexes": [models.Index(fields=["profile", "-last_watched_date"], name="summary_profile_last_idx")],
+                "unique_together": {("profile", "movie")},
+            },
+        ),
+        migrations.RunSQL(
+            """
+            INSERT INTO movies_profilemoviesummary
+                (profile_id, movie_id, total_views, avg_rating, first_watched_date, last_watched_date, is_favorite)
+            SELECT profile_id, watched_movie_id, COUNT(*), AVG(rating), MIN(watched_date), MAX(watched_date),
+                BOOL_OR(is_favorite)
+            FROM movies_viewdetails
+            GROUP BY profile_id, watched_movie_id
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 5.1 on 2026-10-18 16:52
+
+import django.db.models.deletion
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # The indexes are built without locking the tables against writes, which cannot run in a transaction.
+    atomic = False
+
+    dependencies = [
+        ("movies", "0020_profilemoviesummary"),
+        ("users", "0003_user_email_verified"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="plantowatch",
+            index=models.Index(fields=["profile", "-added_at"], name="plantowatch_profile_added_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="viewdetails",
+            index=models.Index(fields=["profile", "watched_date"], name="viewdetails_profile_date_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="viewdetails",
+            index=models.Index(fields=["profile", "watched_movie"], name="viewdetails_profile_movie_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="watchedmovie",
+            index=models.Index(fields=["original_title", "release_date"], name="watchedmovie_title_release_idx"),
+        ),
+        # The single column indexes of the profiles are dropped once the composite indexes replace them. Only the
+        # indexes are dropped, without locking the tables, the foreign key constraints are left alone.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name="plantowatch",
+                    name="profile",
+                    field=models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="plan_to_watch",
+                        to="users.profile",
+                    ),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(
+                    "DROP INDEX CONCURRENTLY IF EXISTS movies_plantowatch_profile_id_41847940",
+                    'CREATE INDEX CONCURRENTLY IF NOT EXISTS movies_plantowatch_profile_id_41847940 ON movies_plantowatch ("profile_id")',
+                ),
+            ],
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name="profilemoviesummary",
+                    name="profile",
+                    field=models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="movie_summaries",
+                        to="users.profile",
+                    ),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(
+                    "DROP INDEX CONCURRENTLY IF EXISTS movies_profilemoviesummary_profile_id_74c548d9",
+                    'CREATE INDEX CONCURRENTLY IF NOT EXISTS movies_profilemoviesummary_profile_id_74c548d9 ON movies_profilemoviesummary ("profile_id")',
+                ),
+            ],
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name="viewdetails",
+                    name="profile",
+                    field=models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="view_details",
+                        to="users.profile",
+                    ),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(
+                    "DROP INDEX CONCURRENTLY IF EXISTS movies_viewdetails_profile_id_92e1aa58",
+                    'CREATE INDEX CONCURRENTLY IF NOT EXISTS movies_viewdetails_profile_id_92e1aa58 ON movies_viewdetails ("profile_id")',
+                ),
+            ],
+        ),
+    ]
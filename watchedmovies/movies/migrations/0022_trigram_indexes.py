@@ -0,0 +1,61 @@
+# Generated by Django 5.1 on 2026-10-18 17:01
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# Trigram indexes behind icontains, which PostgreSQL runs as UPPER(field) LIKE UPPER('%term%'), by column.
+TRIGRAM_INDEXES = {
+    "watchedmovie_title_trgm_idx": "title",
+    "watchedmovie_otitle_trgm_idx": "original_title",
+}
+
+
+def has_trigram(schema_editor, *, installed: bool) -> bool:
+    """Return whether pg_trgm is installed in the database, or available to be installed."""
+    catalog = "pg_extension WHERE extname" if installed else "pg_available_extensions WHERE name"
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"SELECT 1 FROM {catalog} = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+class TrigramExtensionIfAvailable(TrigramExtension):
+    """Install pg_trgm, unless the server does not ship it, in which case searches run without its indexes."""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if has_trigram(schema_editor, installed=False):
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """
+    Build the trigram indexes when pg_trgm is installed, without locking the table against writes. They are
+    left out of the migration state, which cannot depend on the extension being there.
+    """
+    if not has_trigram(schema_editor, installed=True):
+        return
+
+    table = schema_editor.quote_name(apps.get_model("movies", "WatchedMovie")._meta.db_table)
+    for name, column in TRIGRAM_INDEXES.items():
+        schema_editor.execute(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {schema_editor.quote_name(name)} ON {table} "
+            f"USING gin (UPPER({schema_editor.quote_name(column)}) gin_trgm_ops)"
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    for name in TRIGRAM_INDEXES:
+        schema_editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {schema_editor.quote_name(name)}")
+
+
+class Migration(migrations.Migration):
+    # The indexes are built without locking the table against writes, which cannot run in a transaction.
+    atomic = False
+
+    dependencies = [
+        ("movies", "0021_hot_lookup_indexes"),
+    ]
+
+    operations = [
+        TrigramExtensionIfAvailable(),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes, atomic=False),
+    ]
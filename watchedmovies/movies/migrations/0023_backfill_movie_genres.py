@@ -0,0 +1,53 @@
+from django.db import migrations
+
+BATCH_SIZE = 500
+
+
+def fill_genres(Genre, Through, movies) -> None:
+    """Link a batch of movies to the genres listed in their details, as services.set_movie_genres does."""
+    genres = {}
+    links = []
+    for movie in movies:
+        for genre in movie.more_details.get("genres") or []:
+            genres[genre["id"]] = Genre(id=genre["id"], name=genre["name"])
+            links.append(Through(watchedmovie_id=movie.id, genre_id=genre["id"]))
+
+    Genre.objects.bulk_create(genres.values(), update_conflicts=True, unique_fields=["id"], update_fields=["name"])
+    Through.objects.bulk_create(links, ignore_conflicts=True)
+
+
+def backfill_movie_genres(apps, schema_editor):
+    """
+    Fill the genres of the movies saved before genres had their own table from their details, so the yearly
+    rollups built by the next migration count them.
+    """
+    Genre = apps.get_model("movies", "Genre")
+    WatchedMovie = apps.get_model("movies", "WatchedMovie")
+    Through = WatchedMovie.genres.through
+
+    movies = (
+        WatchedMovie.objects.filter(more_details__isnull=False, genres__isnull=True)
+        .order_by("id")
+        .only("id", "more_details")
+    )
+
+    batch = []
+    for movie in movies.iterator(chunk_size=BATCH_SIZE):
+        batch.append(movie)
+        if len(batch) == BATCH_SIZE:
+            fill_genres(Genre, Through, batch)
+            batch = []
+
+    if batch:
+        fill_genres(Genre, Through, batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0022_trigram_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_movie_genres, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,75 @@
+from django.db import migrations
+from django.db.models import Count
+
+# Year of the rollup counting the views without a watched date.
+UNDATED = 0
+
+
+def count_view(stats, view_detail) -> None:
+    """Add a view to a yearly rollup, counted as services.count_view does."""
+    movie = view_detail.watched_movie
+    watched_date = view_detail.watched_date
+
+    def bump(name, key):
+        if key is None or key == "":
+            return
+        counter = stats.counters.setdefault(name, {})
+        counter[str(key)] = counter.get(str(key), 0) + 1
+
+    stats.total += 1
+    stats.runtime_minutes += movie.runtime or 0
+
+    if view_detail.rating is not None:
+        stats.rating_sum += view_detail.rating
+        stats.rating_count += 1
+
+    bump("movies", movie.id)
+    bump("titles", movie.title)
+    bump("ratings", view_detail.rating)
+    bump("languages", view_detail.language)
+    bump("places", view_detail.place)
+
+    if watched_date:
+        bump("months", watched_date.month)
+        bump("weekdays", watched_date.isoweekday() % 7 + 1)
+
+
+def backfill_year_stats(apps, schema_editor):
+    """
+    Build the yearly rollups of every profile from its views, replacing the rows written since the table was
+    created, which only count the views logged after it.
+    """
+    ProfileYearStats = apps.get_model("movies", "ProfileYearStats")
+    ViewDetails = apps.get_model("movies", "ViewDetails")
+
+    ProfileYearStats.objects.all().delete()
+
+    rows = {}
+    views = ViewDetails.objects.select_related("watched_movie").defer("watched_movie__more_details")
+    for view_detail in views.iterator(chunk_size=2000):
+        key = (view_detail.profile_id, view_detail.watched_date.year if view_detail.watched_date else UNDATED)
+        if key not in rows:
+            rows[key] = ProfileYearStats(profile_id=key[0], year=key[1], counters={})
+        count_view(rows[key], view_detail)
+
+    genre_counts = (
+        ViewDetails.objects.filter(watched_movie__genres__isnull=False)
+        .values_list("profile_id", "watched_date__year", "watched_movie__genres__name")
+        .annotate(count=Count("id"))
+        .order_by()
+    )
+    for profile_id, year, genre, count in genre_counts:
+        rows[(profile_id, year or UNDATED)].counters.setdefault("genres", {})[genre] = count
+
+    ProfileYearStats.objects.bulk_create(rows.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0023_backfill_movie_genres"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_year_stats, migrations.RunPython.noop),
+    ]
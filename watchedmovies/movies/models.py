@@ -1,5 +1,27 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
 from django.db import models
 
+# Full-text document of a movie, the search index and the queries must use the same expression.
+SEARCH_VECTOR = (
+    SearchVector("title", weight="A", config="simple")
+    + SearchVector("original_title", weight="A", config="simple")
+    + SearchVector("overview", weight="C", config="simple")
+)
+
+
+class Genre(models.Model):
+    """Model that represents a TMDB movie genre, keyed by its TMDB ID."""
+
+    id = models.PositiveIntegerField(primary_key=True)
+    name = models.CharField(max_length=100)
+
+    class Meta:
+        ordering = ["name"]
+
+    def __str__(self):
+        return self.name
+
 
 class WatchedMovie(models.Model):
     """Model that represents a watched movie."""
@@ -19,11 +41,20 @@ class WatchedMovie(models.Model):
     vote_count = models.PositiveIntegerField()
     runtime = models.PositiveIntegerField(null=True, blank=True)
     more_details = models.JSONField(blank=True, null=True)
+    # Extracted from more_details by services.set_movie_genres, to group and filter by genre in SQL.
+    genres = models.ManyToManyField(Genre, related_name="movies", blank=True)
 
     class Meta:
         verbose_name = "Movie"
         verbose_name_plural = "Movies"
         ordering = ["id"]
+        indexes = [
+            GinIndex(SEARCH_VECTOR, name="watchedmovie_search_idx"),
+            # Duplicates lookup of dedupe_watched_movies.
+            models.Index(fields=["original_title", "release_date"], name="watchedmovie_title_release_idx"),
+            # The trigram indexes on UPPER(title) and UPPER(original_title) are created by migration 0022 only
+            # where pg_trgm is available, so they are kept out of the model state.
+        ]
 
     def __str__(self):
         return self.title
@@ -56,7 +87,8 @@ class ViewDetails(models.Model):
     ]
 
     watched_movie = models.ForeignKey(WatchedMovie, on_delete=models.CASCADE, related_name="view_details")
-    profile = models.ForeignKey("users.Profile", on_delete=models.CASCADE, related_name="view_details")
+    # Indexed as the first column of the composite indexes below.
+    profile = models.ForeignKey("users.Profile", on_delete=models.CASCADE, related_name="view_details", db_index=False)
     watched_at = models.DateTimeField(auto_now_add=True)
     rating = models.PositiveIntegerField(null=True, blank=True)
     comment = models.TextField(blank=True)
@@ -69,6 +101,12 @@ class ViewDetails(models.Model):
         verbose_name = "View Details"
         verbose_name_plural = "View Details"
         ordering = ["watched_date"]
+        indexes = [
+            # Views of a profile by date: lists, streaks and the stats of a year.
+            models.Index(fields=["profile", "watched_date"], name="viewdetails_profile_date_idx"),
+            # Views of a movie by a profile: movie summaries and deletions.
+            models.Index(fields=["profile", "watched_movie"], name="viewdetails_profile_movie_idx"),
+        ]
 
     def __str__(self):
         return f"{self.profile.user.name} watched {self.watched_movie.title}"
@@ -78,7 +116,10 @@ class PlanToWatch(models.Model):
     """Model that represents a movie that the user plans to watch."""
 
     movie = models.ForeignKey(WatchedMovie, on_delete=models.CASCADE, related_name="plan_to_watch")
-    profile = models.ForeignKey("users.Profile", on_delete=models.CASCADE, related_name="plan_to_watch")
+    # Indexed as the first column of plantowatch_profile_added_idx.
+    profile = models.ForeignKey(
+        "users.Profile", on_delete=models.CASCADE, related_name="plan_to_watch", db_index=False
+    )
     added_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -86,6 +127,100 @@ class PlanToWatch(models.Model):
         verbose_name_plural = "Plans to Watch"
         ordering = ["-added_at"]
         unique_together = ["movie", "profile"]
+        indexes = [models.Index(fields=["profile", "-added_at"], name="plantowatch_profile_added_idx")]
 
     def __str__(self):
         return f"{self.profile.user.name} plans to watch {self.movie.title}"
+
+
+class SyncCheckpoint(models.Model):
+    """Model that stores the progress of a long running sync with TMDB so it can be resumed."""
+
+    name = models.CharField(max_length=100, unique=True)
+    value = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Sync Checkpoint"
+        verbose_name_plural = "Sync Checkpoints"
+        ordering = ["name"]
+
+    def __str__(self):
+        return self.name
+
+
+class TMDBCatalogEntry(models.Model):
+    """Model that represents a movie of the daily ID export of TMDB, imported by the import_tmdb_export command."""
+
+    id = models.PositiveIntegerField(primary_key=True)
+    title = models.CharField(max_length=510, blank=True)
+    original_title = models.CharField(max_length=510, blank=True)
+    popularity = models.FloatField(default=0)
+    adult = models.BooleanField(default=False)
+    video = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "TMDB Catalog Entry"
+        verbose_name_plural = "TMDB Catalog"
+        ordering = ["id"]
+
+    def __str__(self):
+        return self.title or self.original_title
+
+
+class ProfileYearStats(models.Model):
+    """
+    Model that holds the statistics of the views of a profile in a year, kept up to date as views are created,
+    updated and deleted so that the stats and the wrapped are read without scanning the views.
+    """
+
+    # Year of the views without a watched date.
+    UNDATED = 0
+
+    profile = models.ForeignKey("users.Profile", on_delete=models.CASCADE, related_name="year_stats")
+    year = models.PositiveIntegerField()
+    total = models.PositiveIntegerField(default=0)
+    runtime_minutes = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    # Number of views by movie, title, genre, rating, language, place, month and weekday.
+    counters = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Profile Year Stats"
+        verbose_name_plural = "Profile Year Stats"
+        ordering = ["profile", "year"]
+        unique_together = ["profile", "year"]
+
+    def __str__(self):
+        return f"{self.profile} in {self.year}"
+
+
+class ProfileMovieSummary(models.Model):
+    """
+    Model that summarizes the views of a movie by a profile, kept up to date as views are created, updated and
+    deleted so that the watched movies list is read and ordered from an index instead of aggregating the views.
+    """
+
+    # Indexed as the first column of summary_profile_last_idx.
+    profile = models.ForeignKey(
+        "users.Profile", on_delete=models.CASCADE, related_name="movie_summaries", db_index=False
+    )
+    movie = models.ForeignKey(WatchedMovie, on_delete=models.CASCADE, related_name="summaries")
+    total_views = models.PositiveIntegerField(default=0)
+    avg_rating = models.FloatField(null=True, blank=True)
+    first_watched_date = models.DateField(null=True, blank=True)
+    last_watched_date = models.DateField(null=True, blank=True)
+    is_favorite = models.BooleanField(default=False)
+
+    class Meta:
+        verbose_name = "Profile Movie Summary"
+        verbose_name_plural = "Profile Movie Summaries"
+        ordering = ["profile", "-last_watched_date"]
+        unique_together = ["profile", "movie"]
+        indexes = [models.Index(fields=["profile", "-last_watched_date"], name="summary_profile_last_idx")]
+
+    def __str__(self):
+        return f"{self.profile} - {self.movie}"
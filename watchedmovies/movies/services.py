@@ -1,16 +1,33 @@
 import calendar as cal
+import hashlib
 import math
 from datetime import date, timedelta
 
-from django.db import transaction
-from django.db.models import Avg, Count, Sum
-from django.db.models.functions import ExtractMonth, ExtractWeekDay, ExtractYear
+from django.conf import settings
+from django.contrib.postgres.aggregates import BoolOr
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Avg, Count, Max, Min
 from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
 
-from watchedmovies.services import tmdb_api
+from watchedmovies.jobs.services import enqueue
+from watchedmovies.services import profile_cache, tmdb_api
 from watchedmovies.users.models import Profile
-
-from .models import PlanToWatch, ViewDetails, WatchedMovie
+from watchedmovies.utils import metrics
+
+from .models import (
+    SEARCH_VECTOR,
+    Genre,
+    PlanToWatch,
+    ProfileMovieSummary,
+    ProfileYearStats,
+    SyncCheckpoint,
+    ViewDetails,
+    WatchedMovie,
+)
+from .serializers import ListTMDBMovieSerializer
 from .utils import create_wrapped_poster, generate_collage
 
 
@@ -41,9 +58,79 @@ def create_view_detail(
     )
     view_detail.full_clean()
     view_detail.save()
+    update_year_stats(view_detail=view_detail, sign=1)
+    refresh_movie_summary(profile_id=profile.id, movie_id=watched_movie.id)
+    return view_detail
+
+
+@transaction.atomic
+def update_view_detail(*, view_detail: ViewDetails, **data) -> ViewDetails:
+    """Update a view detail with the given data, moving it between yearly rollups if its date changes."""
+    update_year_stats(view_detail=view_detail, sign=-1)
+    for key, value in data.items():
+        setattr(view_detail, key, value)
+    view_detail.full_clean()
+    view_detail.save()
+    update_year_stats(view_detail=view_detail, sign=1)
+    refresh_movie_summary(profile_id=view_detail.profile_id, movie_id=view_detail.watched_movie_id)
     return view_detail
 
 
+@transaction.atomic
+def delete_view_detail(*, view_detail: ViewDetails) -> None:
+    """Delete a view detail and remove it from its yearly rollup and its movie summary."""
+    update_year_stats(view_detail=view_detail, sign=-1)
+    view_detail.delete()
+    refresh_movie_summary(profile_id=view_detail.profile_id, movie_id=view_detail.watched_movie_id)
+
+
+def get_movie_summary_aggregates() -> dict:
+    """Return the aggregates of the views of a movie by a profile stored in ProfileMovieSummary."""
+    return {
+        "total_views": Count("id"),
+        "avg_rating": Avg("rating"),
+        "first_watched_date": Min("watched_date"),
+        "last_watched_date": Max("watched_date"),
+        "is_favorite": BoolOr("is_favorite", default=False),
+    }
+
+
+def refresh_movie_summary(*, profile_id: int, movie_id: int) -> None:
+    """Recompute the summary of the views of a movie by a profile, deleting it when there are none left."""
+    summary = ViewDetails.objects.filter(profile_id=profile_id, watched_movie_id=movie_id).aggregate(
+        **get_movie_summary_aggregates()
+    )
+
+    if not summary["total_views"]:
+        ProfileMovieSummary.objects.filter(profile_id=profile_id, movie_id=movie_id).delete()
+        return
+
+    ProfileMovieSummary.objects.update_or_create(profile_id=profile_id, movie_id=movie_id, defaults=summary)
+
+
+@transaction.atomic
+def rebuild_movie_summaries(*, profile_id: int) -> list[ProfileMovieSummary]:
+    """Recompute the summaries of all the movies watched by a profile."""
+    ProfileMovieSummary.objects.filter(profile_id=profile_id).delete()
+    rows = (
+        ViewDetails.objects.filter(profile_id=profile_id)
+        .values("watched_movie_id")
+        .annotate(**get_movie_summary_aggregates())
+        .order_by()
+    )
+
+    return ProfileMovieSummary.objects.bulk_create(
+        [
+            ProfileMovieSummary(
+                profile_id=profile_id,
+                movie_id=row.pop("watched_movie_id"),
+                **row,
+            )
+            for row in rows
+        ]
+    )
+
+
 def delete_from_plan_to_watch(*, movie_id: int, profile: any) -> None:
     """Delete a movie from the plan to watch list."""
     plan = PlanToWatch.objects.filter(movie__id=movie_id, profile=profile).first()
@@ -51,7 +138,13 @@ def delete_from_plan_to_watch(*, movie_id: int, profile: any) -> None:
     if not plan:
         return None
 
+    delete_plan_to_watch(plan=plan)
+
+
+def delete_plan_to_watch(*, plan: PlanToWatch) -> None:
+    """Delete a plan to watch."""
     plan.delete()
+    profile_cache.bump_version(plan.profile_id)
 
 
 @transaction.atomic
@@ -72,6 +165,7 @@ def create_plan_to_watch(*, movie: dict, profile: any) -> PlanToWatch:
     )
     plan_to_watch.full_clean()
     plan_to_watch.save()
+    profile_cache.bump_version(profile.id)
     return plan_to_watch
 
 
@@ -84,38 +178,115 @@ def retrieve_plan_to_watch_by_movie_id(*, movie_id: int, profile: any) -> PlanTo
 
 
 def get_or_create_watched_movie(*, watched_movie: dict) -> WatchedMovie:
-    """Get or create a watched movie with the given data."""
-    original_title = watched_movie.get("original_title")
-    title = watched_movie.get("title")
-    release_date = watched_movie.get("release_date")
-
-    movie_exists = None
+    """
+    Get the movie with the TMDB ID of the given data, which is its primary key, or create it. Movies are
+    created with an upsert, so concurrent requests for a new movie neither fail nor duplicate it.
+    """
+    movie = WatchedMovie.objects.filter(id=watched_movie.get("id")).first()
 
-    if original_title:
-        movie_exists = WatchedMovie.objects.filter(original_title=original_title, release_date=release_date).first()
+    if movie:
+        return movie
 
-    if not movie_exists and title:
-        movie_exists = WatchedMovie.objects.filter(title=title, release_date=release_date).first()
+    movie = WatchedMovie(**watched_movie)
+    update_fields = list(watched_movie.keys() - {"id"})
 
-    if movie_exists:
-        return movie_exists
+    if not settings.TMDB_ENRICH_ASYNC:
+        movie_details = tmdb_api.get_movie_details(watched_movie.get("id"))
 
-    movie = WatchedMovie(**watched_movie)
-    movie_details = tmdb_api.get_movie_details(watched_movie.get("id"))
+        if movie_details:
+            movie.runtime = movie_details.get("runtime")
+            movie.more_details = movie_details
+            update_fields += ["runtime", "more_details"]
 
-    if movie_details:
-        movie.runtime = movie_details.get("runtime")
-        movie.more_details = movie_details
+    # The ID was just looked up, and a movie created meanwhile is handled by the upsert.
+    movie.full_clean(validate_unique=False)
+    upsert_watched_movies(movies=[movie], update_fields=update_fields)
+    set_movie_genres(movies=[movie])
 
-    movie.full_clean()
-    movie.save()
+    if settings.TMDB_ENRICH_ASYNC:
+        enrich_watched_movie_later(movie_id=movie.id)
 
     return movie
 
 
+def upsert_watched_movies(*, movies: list[WatchedMovie], update_fields: list[str]) -> list[WatchedMovie]:
+    """Insert movies with one INSERT ... ON CONFLICT statement, updating the given fields of those that exist."""
+    return WatchedMovie.objects.bulk_create(
+        movies, update_conflicts=True, unique_fields=["id"], update_fields=update_fields
+    )
+
+
+def enrich_watched_movie(*, movie_id: int) -> None:
+    """
+    Complete the runtime and details of a movie from TMDB. TMDBUnavailable is raised when TMDB cannot be
+    reached, so the job is retried, while a movie TMDB does not know is left as it is.
+    """
+    movie_details = tmdb_api.get_movie_details(movie_id)
+
+    if not movie_details:
+        if tmdb_api.is_movie_not_found(movie_id):
+            # Asking again would get the same 404, the job is done.
+            metrics.incr("movies.enrich.not_found")
+            return
+        raise tmdb_api.TMDBUnavailable(f"The details of the movie {movie_id} could not be fetched.")
+
+    WatchedMovie.objects.filter(id=movie_id).update(runtime=movie_details.get("runtime"), more_details=movie_details)
+    set_movie_genres(movies=[WatchedMovie(id=movie_id, more_details=movie_details)])
+    refresh_year_stats_for_movies(movie_ids=[movie_id])
+
+
+def set_movie_genres(*, movies: list[WatchedMovie]) -> None:
+    """
+    Replace the genres of movies with those listed in their details, creating the genres not seen before.
+    Movies without details keep their genres.
+    """
+    movies = [movie for movie in movies if movie.more_details]
+
+    if not movies:
+        return
+
+    genres = {}
+    links = []
+    for movie in movies:
+        for genre in movie.more_details.get("genres") or []:
+            genres[genre["id"]] = Genre(id=genre["id"], name=genre["name"])
+            links.append(WatchedMovie.genres.through(watchedmovie_id=movie.id, genre_id=genre["id"]))
+
+    with transaction.atomic():
+        Genre.objects.bulk_create(genres.values(), update_conflicts=True, unique_fields=["id"], update_fields=["name"])
+        WatchedMovie.genres.through.objects.filter(watchedmovie_id__in=[movie.id for movie in movies]).delete()
+        WatchedMovie.genres.through.objects.bulk_create(links, ignore_conflicts=True)
+
+
+def enrich_watched_movie_later(*, movie_id: int) -> None:
+    """
+    Queue the enrichment of a movie, workers pick it up once the current transaction commits so no transaction
+    is held open during the request to TMDB.
+    """
+    enqueue(
+        name="movies.enrich_watched_movie",
+        payload={"movie_id": movie_id},
+        dedup_key=f"movies.enrich_watched_movie:{movie_id}",
+    )
+
+
+def get_sync_checkpoint(*, name: str) -> dict:
+    """Return the value stored by the last run of a sync, or an empty dict."""
+    checkpoint = SyncCheckpoint.objects.filter(name=name).first()
+    return checkpoint.value if checkpoint else {}
+
+
+def save_sync_checkpoint(*, name: str, value: dict) -> SyncCheckpoint:
+    """Store the progress of a sync so the next run can continue from it."""
+    checkpoint, _ = SyncCheckpoint.objects.update_or_create(name=name, defaults={"value": value})
+    return checkpoint
+
+
+@transaction.atomic
 def destroy_view_detail(*, watched_movie: WatchedMovie, profile) -> None:
     """Delete the view details of the given watched movie."""
-    ViewDetails.objects.filter(watched_movie=watched_movie, profile=profile).delete()
+    for view_detail in ViewDetails.objects.filter(watched_movie=watched_movie, profile=profile):
+        delete_view_detail(view_detail=view_detail)
 
 
 def create_collage(
@@ -145,75 +316,21 @@ def get_watched_register_years(*, profile: Profile) -> dict:
 def create_wrapped(*, profile: Profile, year: int) -> dict:
     """Get statistics from watched movies."""
 
-    year = year if year else date.today().year
-
-    total_watched_movies = ViewDetails.objects.filter(
-        profile=profile,
-        watched_date__year=year,
-    ).count()
-
-    total_minutes_watched = ViewDetails.objects.filter(profile=profile, watched_date__year=year).aggregate(
-        total_hours=Sum("watched_movie__runtime")
-    )["total_hours"]
-
-    total_hours_watched = math.ceil(total_minutes_watched / 60) if total_minutes_watched else 0
-
-    favorite_movie = (
-        ViewDetails.objects.filter(profile=profile, watched_date__year=year)
-        .values("watched_movie__title")
-        .annotate(watched_times=Count("watched_movie__title"))
-        .order_by("-watched_times")[:1]
-    )
-
-    # Filtrar los detalles de las películas y contar las veces que aparece cada género.
-    watched_movies_details = ViewDetails.objects.filter(
-        profile=profile,
-        watched_date__year=year,
-    ).values("watched_movie__more_details")
-    genres = {}
-    for movie in watched_movies_details:
-        for genre in movie["watched_movie__more_details"]["genres"]:
-            genre_name = genre["name"]
-            if genre_name in genres:
-                genres[genre_name]["count"] += 1
-            else:
-                genres[genre_name] = {"name": genre_name, "count": 1}
-
-    favorite_genre = max(genres.values(), key=lambda x: x["count"])["name"] if genres else 0
-
-    # Obtener las fechas de visualización
-    watched_dates = ViewDetails.objects.filter(profile=profile, watched_date__year=year).values_list(
-        "watched_date", flat=True
-    )
-
-    # Asegurarse de que las fechas estén ordenadas
-    watched_dates = sorted(watched_dates)
+    year = int(year) if year else date.today().year
+    stats = merge_year_stats([row for row in get_year_stats(profile=profile) if row.year == year])
+    counters = stats.counters
 
-    # Inicializar las variables para contar la racha más larga
-    max_streak = 0
-    current_streak = 1  # Iniciar la racha con el primer día
-
-    # Recorrer las fechas para calcular las rachas
-    for i in range(1, len(watched_dates)):
-        # Si la fecha actual es un día consecutivo al anterior
-        if watched_dates[i] - watched_dates[i - 1] == timedelta(days=1):
-            current_streak += 1
-        else:
-            # Si no es consecutivo, reiniciar la racha
-            max_streak = max(max_streak, current_streak)
-            current_streak = 1
-
-    # Asegurarse de considerar la última racha
-    max_streak = max(max_streak, current_streak)
-
-    favorite_movie_title = favorite_movie[0]["watched_movie__title"] if favorite_movie else ""
+    total_hours_watched = math.ceil(stats.runtime_minutes / 60) if stats.runtime_minutes else 0
+    favorite_movie_title = max(counters["titles"].items(), key=lambda x: x[1])[0] if counters["titles"] else ""
+    favorite_genre = max(counters["genres"].items(), key=lambda x: x[1])[0] if counters["genres"] else 0
+    max_streak = get_watching_streaks(profile_id=profile.id, year=year)["longest"]["days"]
 
     wrapped_data = {
         "favorite_movie": {
             "text": "Pelicula favorita: ",
             "value": favorite_movie_title,
         },
-        "total_watched_movies": {"text": "Total peliculas: ", "value": total_watched_movies},
+        "total_watched_movies": {"text": "Total peliculas: ", "value": stats.total},
         "total_hours_watched": {"text": "Horas vistas: ", "value": total_hours_watched},
         "favorite_genre": {"text": "Genero favorito: ", "value": favorite_genre},
         "max_streak": {"text": "Racha más larga: ", "value": max_streak},
@@ -222,74 +339,64 @@ def create_wrapped(*, profile: Profile, year: int) -> dict:
     return create_wrapped_poster(wrapped_data)
 
 
-def get_stats(*, profile: Profile, year: int = None) -> dict:
-    """Return JSON statistics for the user's watched movies."""
-    if year:
-        year = int(year)
-        base_qs = ViewDetails.objects.filter(profile=profile, watched_date__year=year)
-    else:
-        year = None
-        base_qs = ViewDetails.objects.filter(profile=profile)
-    all_qs = ViewDetails.objects.filter(profile=profile)
+def get_stats(*, profile: Profile, year: int = None, today: date = None) -> dict:
+    """
+    Return JSON statistics for the user's watched movies, read from the yearly rollups of the profile. The
+    current streak is the one going on at today, which defaults to the current date.
+    """
+    year = int(year) if year else None
+    rows = get_year_stats(profile=profile)
+    stats = merge_year_stats([row for row in rows if year is None or row.year == year])
+    counters = stats.counters
 
     # Totals
-    total_watched = base_qs.count()
-    total_unique_movies = base_qs.values("watched_movie").distinct().count()
+    total_watched = stats.total
+    total_unique_movies = len(counters["movies"])
     rewatch_count = total_watched - total_unique_movies
-    total_runtime_minutes = base_qs.aggregate(total=Sum("watched_movie__runtime"))["total"] or 0
-
-    avg_raw = base_qs.aggregate(avg=Avg("rating"))["avg"]
-    average_rating = round(float(avg_raw), 1) if avg_raw else None
+    total_runtime_minutes = stats.runtime_minutes
+    average_rating = round(stats.rating_sum / stats.rating_count, 1) if stats.rating_count else None
 
     # Top 5 most-rewatched movies
-    favorite_movie_qs = base_qs.values("watched_movie__title").annotate(count=Count("id")).order_by("-count")[:5]
-    favorite_movie = [{"title": m["watched_movie__title"], "count": m["count"]} for m in favorite_movie_qs]
-
-    # Genres from more_details JSON
-    genres: dict = {}
-    for row in base_qs.values("watched_movie__more_details"):
-        details = row.get("watched_movie__more_details") or {}
-        for genre in details.get("genres", []):
-            name = genre.get("name")
-            if name:
-                genres[name] = genres.get(name, 0) + 1
-
-    genres_list = sorted([{"name": n, "count": c} for n, c in genres.items()], key=lambda x: x["count"], reverse=True)
+    favorite_movie = [
+        {"title": title, "count": count}
+        for title, count in sorted(counters["titles"].items(), key=lambda x: x[1], reverse=True)[:5]
+    ]
+
+    genres_list = sorted(
+        [{"name": n, "count": c} for n, c in counters["genres"].items()], key=lambda x: x["count"], reverse=True
+    )
     favorite_genre = genres_list[0]["name"] if genres_list else None
 
     # By language
     language_labels = dict(ViewDetails.LANGUAGE_CHOICES)
-    by_language = [
-        {"key": row["language"], "label": language_labels.get(row["language"], row["language"]), "count": row["count"]}
-        for row in base_qs.values("language").annotate(count=Count("id")).order_by("-count")
-        if row["language"]
-    ]
+    by_language = sorted(
+        [
+            {"key": key, "label": language_labels.get(key, key), "count": count}
+            for key, count in counters["languages"].items()
+        ],
+        key=lambda x: x["count"],
+        reverse=True,
+    )
 
     # By place
     place_labels = dict(ViewDetails.PLACE_CHOICES)
-    by_place = [
-        {"key": row["place"], "label": place_labels.get(row["place"], row["place"]), "count": row["count"]}
-        for row in base_qs.values("place").annotate(count=Count("id")).order_by("-count")
-        if row["place"]
-    ]
+    by_place = sorted(
+        [
+            {"key": key, "label": place_labels.get(key, key), "count": count}
+            for key, count in counters["places"].items()
+        ],
+        key=lambda x: x["count"],
+        reverse=True,
+    )
 
     # By rating — always 1-10, fill missing with 0
-    rating_counts = {
-        row["rating"]: row["count"]
-        for row in base_qs.values("rating").annotate(count=Count("id"))
-        if row["rating"] is not None
-    }
-    by_rating = [{"rating": r, "count": rating_counts.get(r, 0)} for r in range(1, 11)]
+    by_rating = [{"rating": r, "count": counters["ratings"].get(str(r), 0)} for r in range(1, 11)]
 
     # By month — always 12 entries
-    month_counts = {
-        row["month"]: row["count"]
-        for row in base_qs.filter(watched_date__isnull=False)
-        .annotate(month=ExtractMonth("watched_date"))
-        .values("month")
-        .annotate(count=Count("id"))
-    }
-    by_month = [{"month": cal.month_abbr[m], "month_number": m, "count": month_counts.get(m, 0)} for m in range(1, 13)]
+    by_month = [
+        {"month": cal.month_abbr[m], "month_number": m, "count": counters["months"].get(str(m), 0)}
+        for m in range(1, 13)
+    ]
     most_active_month_entry = max(by_month, key=lambda x: x["count"]) if any(x["count"] for x in by_month) else None
     most_active_month = (
         most_active_month_entry["month"] if most_active_month_entry and most_active_month_entry["count"] > 0 else None
@@ -297,56 +404,23 @@ def get_stats(*, profile: Profile, year: int = None) -> dict:
 
     # By day of week — Django ExtractWeekDay: 1=Sunday … 7=Saturday
     dow_names = {1: "Sunday", 2: "Monday", 3: "Tuesday", 4: "Wednesday", 5: "Thursday", 6: "Friday", 7: "Saturday"}
-    dow_counts = {
-        row["dow"]: row["count"]
-        for row in base_qs.filter(watched_date__isnull=False)
-        .annotate(dow=ExtractWeekDay("watched_date"))
-        .values("dow")
-        .annotate(count=Count("id"))
-    }
-    by_day_of_week = [{"day": dow_names[d], "day_number": d, "count": dow_counts.get(d, 0)} for d in range(1, 8)]
+    by_day_of_week = [
+        {"day": dow_names[d], "day_number": d, "count": counters["weekdays"].get(str(d), 0)} for d in range(1, 8)
+    ]
 
     # By year — all-time, no year filter, includes avg_rating
     by_year = [
         {
-            "year": row["year"],
-            "count": row["count"],
-            "avg_rating": round(float(row["avg_rating"]), 1) if row["avg_rating"] else None,
+            "year": row.year,
+            "count": row.total,
+            "avg_rating": round(row.rating_sum / row.rating_count, 1) if row.rating_count else None,
         }
-        for row in all_qs.filter(watched_date__isnull=False)
-        .annotate(year=ExtractYear("watched_date"))
-        .values("year")
-        .annotate(count=Count("id"), avg_rating=Avg("rating"))
-        .order_by("year")
+        for row in sorted(rows, key=lambda row: row.year)
+        if row.year != ProfileYearStats.UNDATED
     ]
 
-    # Streak — deduplicate same-day entries
-    raw_dates = list(base_qs.filter(watched_date__isnull=False).values_list("watched_date", flat=True))
-    unique_dates = sorted(set(raw_dates))
-
-    max_streak = 0
-    max_start = None
-    max_end = None
-
-    if unique_dates:
-        cur_streak = 1
-        cur_start = unique_dates[0]
-
-        for i in range(1, len(unique_dates)):
-            if unique_dates[i] - unique_dates[i - 1] == timedelta(days=1):
-                cur_streak += 1
-            else:
-                if cur_streak > max_streak:
-                    max_streak = cur_streak
-                    max_start = cur_start
-                    max_end = unique_dates[i - 1]
-                cur_streak = 1
-                cur_start = unique_dates[i]
-
-        if cur_streak > max_streak:
-            max_streak = cur_streak
-            max_start = cur_start
-            max_end = unique_dates[-1]
+    # Streaks — same-day entries count once
+    streaks = get_watching_streaks(profile_id=profile.id, year=year, today=today)
 
     return {
         "year": year,
@@ -358,11 +432,8 @@ def get_stats(*, profile: Profile, year: int = None) -> dict:
         "favorite_movie": favorite_movie,
         "favorite_genre": favorite_genre,
         "most_active_month": most_active_month,
-        "max_streak": {
-            "days": max_streak,
-            "start_date": max_start.isoformat() if max_start else None,
-            "end_date": max_end.isoformat() if max_end else None,
-        },
+        "max_streak": serialize_streak(streaks["longest"]),
+        "current_streak": serialize_streak(streaks["current"]),
         "genres": genres_list,
         "by_language": by_language,
         "by_place": by_place,
@@ -371,3 +442,301 @@ def get_stats(*, profile: Profile, year: int = None) -> dict:
         "by_day_of_week": by_day_of_week,
         "by_year": by_year,
     }
+
+
+STREAKS_SQL = """
+    WITH days AS (
+        SELECT DISTINCT watched_date AS day
+        FROM {table}
+        WHERE profile_id = %(profile_id)s AND watched_date BETWEEN %(start)s AND %(end)s
+    ),
+    islands AS (
+        -- Consecutive days minus their position in the sequence give the same date, one per run.
+        SELECT day, day - (ROW_NUMBER() OVER (ORDER BY day))::integer AS island
+        FROM days
+    ),
+    streaks AS (
+        SELECT COUNT(*) AS days, MIN(day) AS start_date, MAX(day) AS end_date
+        FROM islands
+        GROUP BY island
+    )
+    (SELECT 'longest', days, start_date, end_date FROM streaks ORDER BY days DESC, start_date LIMIT 1)
+    UNION ALL
+    (SELECT 'current', days, start_date, end_date FROM streaks WHERE end_date >= %(since)s LIMIT 1)
+"""
+
+
+def get_watching_streaks(*, profile_id: int, year: int = None, today: date = None) -> dict:
+    """
+    Return the longest run of consecutive days with views of a profile, in a year or all-time, and the run
+    that goes on today or that ended yesterday. Both are computed in the database with window functions over
+    the distinct watched dates, the dates themselves are never loaded.
+    """
+    today = today or date.today()
+    empty = {"days": 0, "start_date": None, "end_date": None}
+    streaks = {"longest": empty, "current": empty}
+    params = {
+        "profile_id": profile_id,
+        "start": date(year, 1, 1) if year else date.min,
+        "end": date(year, 12, 31) if year else date.max,
+        "since": today - timedelta(days=1),
+    }
+
+    with connection.cursor() as cursor:
+        cursor.execute(STREAKS_SQL.format(table=ViewDetails._meta.db_table), params)
+        for kind, days, start_date, end_date in cursor.fetchall():
+            streaks[kind] = {"days": days, "start_date": start_date, "end_date": end_date}
+
+    return streaks
+
+
+def serialize_streak(streak: dict) -> dict:
+    return {
+        "days": streak["days"],
+        "start_date": streak["start_date"].isoformat() if streak["start_date"] else None,
+        "end_date": streak["end_date"].isoformat() if streak["end_date"] else None,
+    }
+
+
+COUNTER_NAMES = ["movies", "titles", "genres", "ratings", "languages", "places", "months", "weekdays"]
+
+
+def get_year_stats(*, profile: Profile) -> list[ProfileYearStats]:
+    """Return the yearly rollups of a profile."""
+    return list(ProfileYearStats.objects.filter(profile=profile))
+
+
+def merge_year_stats(rows: list[ProfileYearStats]) -> ProfileYearStats:
+    """Add up yearly rollups into a single unsaved one."""
+    merged = ProfileYearStats(counters={name: {} for name in COUNTER_NAMES})
+
+    for row in rows:
+        merged.total += row.total
+        merged.runtime_minutes += row.runtime_minutes
+        merged.rating_sum += row.rating_sum
+        merged.rating_count += row.rating_count
+        for name, counter in row.counters.items():
+            merged_counter = merged.counters.setdefault(name, {})
+            for key, count in counter.items():
+                merged_counter[key] = merged_counter.get(key, 0) + count
+
+    return merged
+
+
+def count_view(stats: ProfileYearStats, view_detail: ViewDetails, sign: int = 1, genres: list[str] = ()) -> None:
+    """Add a view of a movie with the given genre names to a yearly rollup, or remove it with a negative sign."""
+    movie = view_detail.watched_movie
+    watched_date = view_detail.watched_date
+
+    def bump(name, key):
+        if key is None or key == "":
+            return
+        counter = stats.counters.setdefault(name, {})
+        key = str(key)
+        counter[key] = counter.get(key, 0) + sign
+        if counter[key] <= 0:
+            del counter[key]
+
+    stats.total += sign
+    stats.runtime_minutes += sign * (movie.runtime or 0)
+
+    if view_detail.rating is not None:
+        stats.rating_sum += sign * view_detail.rating
+        stats.rating_count += sign
+
+    bump("movies", movie.id)
+    bump("titles", movie.title)
+    for genre in genres:
+        bump("genres", genre)
+    bump("ratings", view_detail.rating)
+    bump("languages", view_detail.language)
+    bump("places", view_detail.place)
+
+    if watched_date:
+        bump("months", watched_date.month)
+        # Same numbering as Django's week_day, 1=Sunday … 7=Saturday.
+        bump("weekdays", watched_date.isoweekday() % 7 + 1)
+
+
+def get_view_year(view_detail: ViewDetails) -> int:
+    return view_detail.watched_date.year if view_detail.watched_date else ProfileYearStats.UNDATED
+
+
+def update_year_stats(*, view_detail: ViewDetails, sign: int) -> None:
+    """Add a view to the rollup of its profile and year, or remove it, locking the rollup row until commit."""
+    with transaction.atomic():
+        stats, _ = ProfileYearStats.objects.select_for_update().get_or_create(
+            profile_id=view_detail.profile_id, year=get_view_year(view_detail)
+        )
+        genres = list(view_detail.watched_movie.genres.values_list("name", flat=True))
+        count_view(stats, view_detail, sign, genres)
+
+        if stats.total > 0:
+            stats.save()
+        else:
+            stats.delete()
+
+    profile_cache.bump_version(view_detail.profile_id)
+
+
+@transaction.atomic
+def rebuild_year_stats(*, profile_id: int, year: int = None) -> list[ProfileYearStats]:
+    """
+    Recompute the rollups of a profile, or of one of its years, from its views. The genres are counted with a
+    single GROUP BY over the genres of the watched movies, the details of the movies are not loaded.
+    """
+    stats_qs = ProfileYearStats.objects.filter(profile_id=profile_id)
+    views = ViewDetails.objects.filter(profile_id=profile_id)
+
+    if year == ProfileYearStats.UNDATED:
+        views = views.filter(watched_date__isnull=True)
+    elif year is not None:
+        views = views.filter(watched_date__year=year)
+
+    if year is not None:
+        stats_qs = stats_qs.filter(year=year)
+    stats_qs.delete()
+
+    rows = {}
+    for view_detail in (
+        views.select_related("watched_movie").defer("watched_movie__more_details").iterator(chunk_size=2000)
+    ):
+        view_year = get_view_year(view_detail)
+        if view_year not in rows:
+            rows[view_year] = ProfileYearStats(profile_id=profile_id, year=view_year, counters={})
+        count_view(rows[view_year], view_detail)
+
+    genre_counts = (
+        views.filter(watched_movie__genres__isnull=False)
+        .values_list("watched_date__year", "watched_movie__genres__name")
+        .annotate(count=Count("id"))
+        .order_by()
+    )
+    for view_year, genre, count in genre_counts:
+        rows[view_year or ProfileYearStats.UNDATED].counters.setdefault("genres", {})[genre] = count
+
+    return ProfileYearStats.objects.bulk_create(rows.values())
+
+
+def get_counted_details(movie: WatchedMovie) -> tuple:
+    """Return the runtime and genre IDs of a movie, the details from TMDB its views are counted by in the rollups."""
+    genres = (movie.more_details or {}).get("genres") or []
+    return movie.runtime, sorted(genre["id"] for genre in genres)
+
+
+def get_year_stats_for_movies(*, movie_ids: list[int]) -> set[tuple[int, int]]:
+    """Return the profile and year of the rollups that count views of the given movies."""
+    pairs = (
+        ViewDetails.objects.filter(watched_movie_id__in=movie_ids)
+        .values_list("profile_id", "watched_date__year")
+        .distinct()
+    )
+    return {(profile_id, year or ProfileYearStats.UNDATED) for profile_id, year in pairs}
+
+
+def rebuild_year_stats_many(*, pairs: set[tuple[int, int]]) -> None:
+    """Rebuild the rollups of the given profiles and years."""
+    for profile_id, year in pairs:
+        rebuild_year_stats(profile_id=profile_id, year=year)
+        profile_cache.bump_version(profile_id)
+
+
+def refresh_year_stats_for_movies(*, movie_ids: list[int]) -> None:
+    """Rebuild the rollups that count views of movies whose runtime, title or genres changed."""
+    rebuild_year_stats_many(pairs=get_year_stats_for_movies(movie_ids=movie_ids))
+
+
+def get_popular_movies_snapshot_key(*, page: int) -> str:
+    return f"popular-movies:v1:page:{page}"
+
+
+def build_popular_movies_snapshot(*, page: int) -> dict | None:
+    """Fetch a page of popular movies, serialize it once and cache the JSON body with its ETag."""
+    popular_movies = tmdb_api.get_popular_movies(page)
+
+    if not popular_movies["results"]:
+        return None
+
+    serialized = ListTMDBMovieSerializer(data=popular_movies["results"], many=True)
+    serialized.is_valid(raise_exception=True)
+    body = JSONRenderer().render(serialized.data)
+    snapshot = {"body": body, "etag": f'"{hashlib.sha1(body).hexdigest()}"'}
+    cache.set(get_popular_movies_snapshot_key(page=page), snapshot, timeout=settings.TMDB_POPULAR_SNAPSHOT_TTL)
+
+    return snapshot
+
+
+def get_popular_movies_snapshot(*, page: int = 1) -> dict | None:
+    """
+    Return the cached snapshot of a page of popular movies, or None when the page has not been refreshed by
+    the refresh_popular_movies command. TMDB is never called here.
+    """
+    if not 1 <= page <= settings.TMDB_POPULAR_MAX_PAGE:
+        raise ValidationError({"page": f"Page must be between 1 and {settings.TMDB_POPULAR_MAX_PAGE}."})
+
+    return cache.get(get_popular_movies_snapshot_key(page=page))
+
+
+def search_local_movies(*, query: str, limit: int) -> list[dict]:
+    """Search the movies logged by users with the full-text index, every word of the query matching as a prefix."""
+    words = ["".join(char for char in word if char.isalnum()) for word in tmdb_api.normalize_query(query).split()]
+    terms = " & ".join(f"{word}:*" for word in words if word)
+
+    if not terms:
+        return []
+
+    search_query = SearchQuery(terms, search_type="raw", config="simple")
+    movies = (
+        WatchedMovie.objects.alias(document=SEARCH_VECTOR)
+        .filter(document=search_query)
+        .annotate(rank=SearchRank(SEARCH_VECTOR, search_query))
+        .order_by("-rank", "-popularity")[:limit]
+    )
+
+    return [
+        {
+            "id": movie.id,
+            "adult": movie.adult,
+            "backdrop_path": movie.backdrop_path or None,
+            "genre_ids": movie.genre_ids if isinstance(movie.genre_ids, list) else None,
+            "original_language": movie.original_language,
+            "original_title": movie.original_title,
+            "overview": movie.overview,
+            "popularity": movie.popularity,
+            "poster_path": movie.poster_path or None,
+            "release_date": movie.release_date.isoformat() if movie.release_date else "",
+            "title": movie.title,
+            "video": movie.video,
+            "vote_average": movie.vote_average,
+            "vote_count": movie.vote_count,
+        }
+        for movie in movies
+    ]
+
+
+def search_movies(*, query: str, page: int = 1) -> dict:
+    """
+    Search movies following TMDB_SEARCH_POLICY. The first page also lists, under "local", the movies users
+    have logged that match. The results, page and totals of TMDB are returned untouched, so paging through
+    them never skips or repeats a movie. On the first page TMDB is asked when there are too few local matches,
+    otherwise its results are read from the cache, and fetched in the background when they are not there
+    yet. TMDB results that are not at hand are answered as an empty page.
+    """
+    policy = settings.TMDB_SEARCH_POLICY
+
+    if policy == "remote" or page != 1:
+        return {**tmdb_api.search_movies(query, page), "local": []}
+
+    local = search_local_movies(query=query, limit=settings.TMDB_LOCAL_SEARCH_LIMIT)
+
+    if policy == "fallback" and len(local) < settings.TMDB_LOCAL_SEARCH_MIN_RESULTS:
+        remote = tmdb_api.search_movies(query, page)
+    else:
+        remote = tmdb_api.get_cached_search_movies(query, page)
+
+    if remote is None:
+        metrics.incr("search.local")
+        return {**tmdb_api.EMPTY_SEARCH_RESULTS, "results": [], "local": local}
+
+    metrics.incr("search.merged")
+    return {**remote, "local": local}
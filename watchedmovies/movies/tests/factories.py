@@ -3,6 +3,7 @@ from factory import Faker
 from factory.django import DjangoModelFactory
 
 from watchedmovies.movies.models import ViewDetails
+from watchedmovies.movies.services import rebuild_year_stats, refresh_movie_summary, set_movie_genres
 from watchedmovies.users.tests.factories import ProfileFactory
 
 
@@ -25,6 +26,11 @@ class WatchedMovieFactory(DjangoModelFactory):
         model = "movies.WatchedMovie"
         django_get_or_create = ["title"]
 
+    @factory.post_generation
+    def genres(obj, create, extracted, **kwargs):
+        if create:
+            set_movie_genres(movies=[obj])
+
 
 class ViewDetailFactory(DjangoModelFactory):
     watched_movie = factory.SubFactory(WatchedMovieFactory)
@@ -37,3 +43,13 @@ class ViewDetailFactory(DjangoModelFactory):
     class Meta:
         model = "movies.ViewDetails"
         django_get_or_create = ["watched_movie", "profile"]
+
+    @factory.post_generation
+    def summary(obj, create, extracted, **kwargs):
+        if create:
+            refresh_movie_summary(profile_id=obj.profile_id, movie_id=obj.watched_movie_id)
+
+    @factory.post_generation
+    def year_stats(obj, create, extracted, **kwargs):
+        if create:
+            rebuild_year_stats(profile_id=obj.profile_id)
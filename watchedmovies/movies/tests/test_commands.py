@@ -0,0 +1,269 @@
+import gzip
+import json
+from datetime import date
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from watchedmovies.services import tmdb_cache
+from watchedmovies.users.tests.factories import ProfileFactory
+
+from ..models import PlanToWatch, ProfileYearStats, TMDBCatalogEntry, WatchedMovie
+from ..services import get_popular_movies_snapshot, get_sync_checkpoint, rebuild_year_stats, save_sync_checkpoint
+from .factories import ViewDetailFactory, WatchedMovieFactory
+
+
+def fake_details_many(ids, concurrency=None, use_cache=True):
+    return {movie_id: {"id": movie_id, "runtime": 90} for movie_id in ids}
+
+
+@patch("watchedmovies.services.tmdb_async.fetch_movie_details_many", side_effect=fake_details_many)
+def test_complete_movie_data_updates_in_batches(mock_fetch, db):
+    movies = [WatchedMovieFactory() for _ in range(5)]
+
+    out = StringIO()
+    call_command("complete_movie_data", "--batch-size", "2", stdout=out)
+
+    assert mock_fetch.call_count == 3
+    assert WatchedMovie.objects.filter(runtime=90).count() == 5
+    assert get_sync_checkpoint(name="complete_movie_data") == {"last_id": max(m.id for m in movies)}
+    assert "Processed 5 movies" in out.getvalue()
+
+
+@patch("watchedmovies.services.tmdb_async.fetch_movie_details_many")
+def test_complete_movie_data_skips_movies_without_details(mock_fetch, db):
+    movie = WatchedMovieFactory()
+    mock_fetch.return_value = {movie.id: None}
+
+    out = StringIO()
+    call_command("complete_movie_data", stdout=out)
+
+    movie.refresh_from_db()
+    assert movie.runtime is None
+    assert "1 without details" in out.getvalue()
+
+
+@patch("watchedmovies.services.tmdb_async.fetch_movie_details_many", side_effect=fake_details_many)
+def test_complete_movie_data_only_missing_and_resume(mock_fetch, db):
+    first, second, third = sorted([WatchedMovieFactory() for _ in range(3)], key=lambda movie: movie.id)
+    WatchedMovie.objects.filter(id=third.id).update(runtime=120, more_details={"id": third.id})
+    save_sync_checkpoint(name="complete_movie_data", value={"last_id": first.id})
+
+    call_command("complete_movie_data", "--only-missing", "--resume", stdout=StringIO())
+
+    assert mock_fetch.call_args.args[0] == [second.id]
+
+
+@patch("watchedmovies.movies.management.commands.complete_movie_data.rebuild_year_stats_many")
+@patch("watchedmovies.services.tmdb_async.fetch_movie_details_many", side_effect=fake_details_many)
+def test_complete_movie_data_rebuilds_each_rollup_of_changed_movies_once(mock_fetch, mock_rebuild, db):
+    profile = ProfileFactory()
+    changed = [WatchedMovieFactory(runtime=None) for _ in range(2)]
+    unchanged = WatchedMovieFactory(runtime=90, more_details={"id": 0})
+    for movie in [*changed, unchanged]:
+        ViewDetailFactory(profile=profile, watched_movie=movie, watched_date=date(2024, 1, 1))
+    ViewDetailFactory(watched_movie=unchanged, watched_date=date(2023, 1, 1))
+
+    call_command("complete_movie_data", "--batch-size", "1", stdout=StringIO())
+
+    mock_rebuild.assert_called_once_with(pairs={(profile.id, 2024)})
+
+
+@patch("watchedmovies.services.tmdb_async.fetch_movie_details_many")
+def test_complete_movie_data_dry_run(mock_fetch, db):
+    WatchedMovieFactory()
+
+    out = StringIO()
+    call_command("complete_movie_data", "--dry-run", stdout=out)
+
+    mock_fetch.assert_not_called()
+    assert "1 movies would be completed in 1 batches" in out.getvalue()
+
+
+@patch("watchedmovies.services.tmdb_async.fetch_movie_details_many", side_effect=fake_details_many)
+@patch("watchedmovies.services.tmdb_api.get_movie_changes")
+def test_refresh_changed_movies_only_refreshes_our_movies(mock_changes, mock_fetch, db):
+    ours = WatchedMovieFactory()
+    other_id = ours.id + 1000
+    mock_changes.side_effect = [
+        {"results": [{"id": other_id}], "page": 1, "total_pages": 2},
+        {"results": [{"id": ours.id}], "page": 2, "total_pages": 2},
+    ]
+
+    out = StringIO()
+    call_command("refresh_changed_movies", "--start-date", "2024-01-01", "--end-date", "2024-01-03", stdout=out)
+
+    ours.refresh_from_db()
+    assert ours.runtime == 90
+    assert mock_fetch.call_args.args[0] == [ours.id]
+    assert mock_fetch.call_args.kwargs["use_cache"] is False
+    assert get_sync_checkpoint(name="refresh_changed_movies") == {"last_end_date": "2024-01-03", "failed_ids": []}
+    assert "2 movies changed" in out.getvalue()
+
+
+@patch("watchedmovies.services.tmdb_async.fetch_movie_details_many", side_effect=fake_details_many)
+@patch("watchedmovies.services.tmdb_api.get_movie_changes")
+def test_refresh_changed_movies_splits_long_windows(mock_changes, mock_fetch, db):
+    mock_changes.return_value = {"results": [], "page": 1, "total_pages": 1}
+    save_sync_checkpoint(name="refresh_changed_movies", value={"last_end_date": "2024-01-01"})
+
+    call_command("refresh_changed_movies", "--end-date", "2024-01-20", stdout=StringIO())
+
+    windows = [(call.args[0].isoformat(), call.args[1].isoformat()) for call in mock_changes.call_args_list]
+    assert windows == [("2024-01-01", "2024-01-14"), ("2024-01-15", "2024-01-20")]
+    mock_fetch.assert_not_called()
+
+
+@patch("watchedmovies.services.tmdb_async.fetch_movie_details_many")
+@patch("watchedmovies.services.tmdb_api.get_movie_changes")
+def test_refresh_changed_movies_retries_failed_movies_on_the_next_run(mock_changes, mock_fetch, db):
+    movie = WatchedMovieFactory()
+    mock_changes.return_value = {"results": [{"id": movie.id}], "page": 1, "total_pages": 1}
+    mock_fetch.return_value = {movie.id: None}
+
+    call_command("refresh_changed_movies", "--start-date", "2024-01-01", "--end-date", "2024-01-01", stdout=StringIO())
+
+    assert get_sync_checkpoint(name="refresh_changed_movies")["failed_ids"] == [movie.id]
+
+    mock_changes.return_value = {"results": [], "page": 1, "total_pages": 1}
+    mock_fetch.side_effect = fake_details_many
+    call_command("refresh_changed_movies", "--end-date", "2024-01-02", stdout=StringIO())
+
+    movie.refresh_from_db()
+    assert movie.runtime == 90
+    assert get_sync_checkpoint(name="refresh_changed_movies") == {"last_end_date": "2024-01-02", "failed_ids": []}
+
+
+@patch("watchedmovies.services.tmdb_async.fetch_movie_details_many")
+@patch("watchedmovies.services.tmdb_api.get_movie_changes")
+def test_refresh_changed_movies_does_not_retry_movies_removed_from_tmdb(mock_changes, mock_fetch, db):
+    removed, unreachable = WatchedMovieFactory(), WatchedMovieFactory()
+    mock_changes.return_value = {"results": [{"id": removed.id}, {"id": unreachable.id}], "total_pages": 1}
+
+    def fetch(ids, concurrency=None, use_cache=True):
+        tmdb_cache.store(f"movie:{removed.id}", tmdb_cache.NOT_FOUND, ttl=60, negative_ttl=60)
+        return {movie_id: None for movie_id in ids}
+
+    mock_fetch.side_effect = fetch
+
+    call_command("refresh_changed_movies", "--start-date", "2024-01-01", "--end-date", "2024-01-01", stdout=StringIO())
+
+    assert get_sync_checkpoint(name="refresh_changed_movies")["failed_ids"] == [unreachable.id]
+
+
+@patch("watchedmovies.services.tmdb_api.get_popular_movies")
+def test_refresh_popular_movies_stores_a_snapshot_per_page(mock_get, db):
+    mock_get.side_effect = lambda page: {"results": [{"id": page}]} if page < 3 else {"results": []}
+
+    out = StringIO()
+    call_command("refresh_popular_movies", "--pages", "3", stdout=out)
+
+    assert json.loads(get_popular_movies_snapshot(page=2)["body"])[0]["id"] == 2
+    assert mock_get.call_count == 3
+    assert "Page 3 of popular movies could not be fetched." in out.getvalue()
+    assert "2 pages of popular movies have been refreshed." in out.getvalue()
+
+
+def write_export(path, lines):
+    with gzip.open(path, "wt", encoding="utf-8") as export:
+        export.write("\n".join(lines) + "\n")
+    return str(path)
+
+
+def test_import_tmdb_export_streams_and_upserts_the_catalog(db, tmp_path):
+    TMDBCatalogEntry.objects.create(id=2, original_title="Old title", popularity=1)
+    lines = [
+        json.dumps(
+            {"adult": False, "id": movie_id, "original_title": f"Movie {movie_id}", "popularity": movie_id / 10}
+        )
+        for movie_id in range(1, 6)
+    ]
+    path = write_export(tmp_path / "movie_ids_05_15_2024.json.gz", lines + ["not json", '{"title": "no id"}'])
+
+    out = StringIO()
+    call_command("import_tmdb_export", path, "--batch-size", "2", stdout=out)
+
+    assert TMDBCatalogEntry.objects.count() == 5
+    updated = TMDBCatalogEntry.objects.get(id=2)
+    assert (updated.title, updated.original_title, updated.popularity) == ("Movie 2", "Movie 2", 0.2)
+    assert "Imported 5 movies" in out.getvalue()
+    assert "2 lines skipped" in out.getvalue()
+    assert "rows/s" in out.getvalue()
+
+
+def test_import_tmdb_export_keeps_the_last_line_of_a_movie_listed_twice(db, tmp_path):
+    lines = [json.dumps({"id": 1, "original_title": title}) for title in ["First", "Second"]]
+    path = write_export(tmp_path / "movie_ids.json.gz", lines)
+
+    call_command("import_tmdb_export", path, stdout=StringIO())
+
+    assert TMDBCatalogEntry.objects.get(id=1).original_title == "Second"
+
+
+def test_import_tmdb_export_reports_unreadable_files(db, tmp_path):
+    with pytest.raises(CommandError):
+        call_command("import_tmdb_export", str(tmp_path / "missing.json.gz"), stdout=StringIO())
+
+
+def test_dedupe_watched_movies_merges_views_and_plans(db):
+    kept = WatchedMovieFactory(id=550, title="Fight Club", original_title="Fight Club", more_details={"id": 550})
+    duplicate = WatchedMovieFactory(id=9550, title="Fight Club (1999)", original_title="Fight Club")
+    duplicate.release_date = kept.release_date
+    duplicate.save()
+    other = WatchedMovieFactory(title="Alien", original_title="Alien")
+    profile, other_profile = ProfileFactory(), ProfileFactory()
+    view = ViewDetailFactory(watched_movie=duplicate, profile=profile)
+    PlanToWatch.objects.create(movie=kept, profile=profile)
+    PlanToWatch.objects.create(movie=duplicate, profile=profile)
+    moved_plan = PlanToWatch.objects.create(movie=duplicate, profile=other_profile)
+
+    out = StringIO()
+    call_command("dedupe_watched_movies", stdout=out)
+
+    assert set(WatchedMovie.objects.values_list("id", flat=True)) == {kept.id, other.id}
+    view.refresh_from_db()
+    moved_plan.refresh_from_db()
+    assert view.watched_movie_id == moved_plan.movie_id == kept.id
+    assert PlanToWatch.objects.filter(movie=kept).count() == 2
+    assert "1 duplicated movies have been merged." in out.getvalue()
+
+
+def test_dedupe_watched_movies_dry_run_changes_nothing(db):
+    movie = WatchedMovieFactory(title="Alien", original_title="Alien")
+    WatchedMovieFactory(title="Alien (1979)", original_title="Alien", release_date=movie.release_date)
+
+    out = StringIO()
+    call_command("dedupe_watched_movies", "--dry-run", stdout=out)
+
+    assert WatchedMovie.objects.count() == 2
+    assert "1 duplicated movies would be merged." in out.getvalue()
+
+
+def test_rebuild_profile_stats_recomputes_the_rollups(db):
+    profile = ProfileFactory()
+    ViewDetailFactory(profile=profile, watched_date=date(2024, 1, 1))
+    ViewDetailFactory(profile=profile, watched_date=None)
+    ProfileYearStats.objects.create(profile=profile, year=2020, total=5)
+
+    out = StringIO()
+    call_command("rebuild_profile_stats", "--profile-id", str(profile.id), stdout=out)
+
+    assert sorted(profile.year_stats.values_list("year", "total")) == [(ProfileYearStats.UNDATED, 1), (2024, 1)]
+    assert "1 profiles" in out.getvalue()
+
+
+def test_backfill_movie_genres_fills_movies_without_genres(db):
+    profile = ProfileFactory()
+    movie = WatchedMovieFactory()
+    WatchedMovie.objects.filter(id=movie.id).update(more_details={"genres": [{"id": 18, "name": "Drama"}]})
+    ViewDetailFactory(profile=profile, watched_movie=movie, watched_date=date(2024, 1, 1))
+    rebuild_year_stats(profile_id=profile.id)
+
+    out = StringIO()
+    call_command("backfill_movie_genres", stdout=out)
+
+    assert list(movie.genres.values_list("name", flat=True)) == ["Drama"]
+    assert profile.year_stats.get(year=2024).counters["genres"] == {"Drama": 1}
+    assert "1 movies" in out.getvalue()
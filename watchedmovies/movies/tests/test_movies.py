@@ -1,9 +1,32 @@
+import importlib
+from datetime import date
 from unittest.mock import patch
 
-from watchedmovies.movies.services import get_or_create_watched_movie
+import pytest
+from django.apps import apps as django_apps
+from rest_framework.request import Request
+
+from watchedmovies.jobs.models import Job
+from watchedmovies.jobs.services import claim, run
+from watchedmovies.movies.services import (
+    create_view_detail,
+    create_wrapped,
+    enrich_watched_movie,
+    enrich_watched_movie_later,
+    get_or_create_watched_movie,
+    get_stats,
+    get_watching_streaks,
+    rebuild_year_stats,
+    set_movie_genres,
+    update_view_detail,
+    upsert_watched_movies,
+)
+from watchedmovies.services import tmdb_cache
 from watchedmovies.users.tests.factories import ProfileFactory
+from watchedmovies.utils.postgres import has_extension
 
-from ..models import ViewDetails, WatchedMovie
+from ..filters import SearchRankOrderingFilter, TrigramSearchFilter
+from ..models import Genre, ProfileMovieSummary, ProfileYearStats, ViewDetails, WatchedMovie
 from ..views import ViewDetailViewSet, WatchedMovieViewSet
 from .factories import ViewDetailFactory, WatchedMovieFactory
 
@@ -122,6 +145,71 @@ def test_list_watched_movies_filter_by_watched_date_year(db, user, api_rf):
     assert response.data["count"] == 2
 
 
+def test_list_watched_movies_filter_by_genre(db, user, api_rf):
+    profile = ProfileFactory(user=user)
+    drama = WatchedMovieFactory(more_details={"genres": [{"id": 18, "name": "Drama"}]})
+    horror = WatchedMovieFactory(more_details={"genres": [{"id": 27, "name": "Horror"}]})
+    ViewDetailFactory(profile=profile, watched_movie=drama)
+    ViewDetailFactory(profile=profile, watched_movie=horror)
+
+    request = api_rf.get(FAKE, {"genre": 27})
+    request.user = user
+    response = WatchedMovieViewSet.as_view({"get": "list"})(request)
+
+    assert response.status_code == 200
+    assert response.data["count"] == 1
+    assert response.data["results"][0]["id"] == horror.id
+
+
+def test_search_watched_movies_by_title(db, user, api_rf):
+    profile = ProfileFactory(user=user)
+    alien = WatchedMovieFactory(title="Alien", original_title="Alien")
+    ViewDetailFactory(profile=profile, watched_movie=alien)
+    ViewDetailFactory(profile=profile, watched_movie=WatchedMovieFactory(title="Brazil", original_title="Brazil"))
+
+    request = api_rf.get(FAKE, {"search": "ALI"})
+    request.user = user
+    response = WatchedMovieViewSet.as_view({"get": "list"})(request)
+
+    assert [movie["id"] for movie in response.data["results"]] == [alien.id]
+
+
+def test_search_watched_movies_is_ranked_by_trigram_similarity(db, user, rf):
+    profile = ProfileFactory(user=user)
+    request = Request(rf.get(FAKE, {"search": "alien"}))
+    request.user = user
+    view = WatchedMovieViewSet(request=request, format_kwarg=None, action="list")
+
+    with patch("watchedmovies.movies.filters.has_extension", return_value=True):
+        queryset = TrigramSearchFilter().filter_queryset(view.request, view.get_queryset(), view)
+
+    assert "search_rank" in queryset.query.annotations
+    assert SearchRankOrderingFilter().get_ordering(view.request, queryset, view) == [
+        "-search_rank",
+        "-first_watched_date",
+    ]
+
+    if not has_extension("pg_trgm"):
+        pytest.skip("pg_trgm is not installed in the test database.")
+
+    ViewDetailFactory(profile=profile, watched_movie=WatchedMovieFactory(title="Aliens", original_title="Aliens"))
+    ViewDetailFactory(profile=profile, watched_movie=WatchedMovieFactory(title="Alien", original_title="Alien"))
+    assert [movie.title for movie in queryset.order_by("-search_rank")] == ["Alien", "Aliens"]
+
+
+def test_filter_view_details_by_language_keys(db, user, api_rf):
+    profile = ProfileFactory(user=user)
+    ViewDetailFactory(profile=profile, language="en")
+    ViewDetailFactory(profile=profile, language="es")
+    ViewDetailFactory(profile=profile, language="fr")
+
+    request = api_rf.get(FAKE, {"language__in": "en,es"})
+    request.user = user
+    response = ViewDetailViewSet.as_view({"get": "list"})(request)
+
+    assert response.data["count"] == 2
+
+
 def test_retrieve_watched_movie(db, user, api_rf):
     profile = ProfileFactory(user=user)
     watched_movie = WatchedMovieFactory()
@@ -250,3 +338,297 @@ def test_get_or_create_no_duplicate_when_second_call_has_only_title(mock_details
 
     assert WatchedMovie.objects.count() == 1
     assert found.title == BASE_MOVIE_DATA["title"]
+
+
+@patch("watchedmovies.movies.services.tmdb_api.get_movie_details")
+def test_get_or_create_queues_the_enrichment_in_async_mode(mock_details, db, settings):
+    settings.TMDB_ENRICH_ASYNC = True
+    settings.JOBS_EAGER = False
+
+    movie = get_or_create_watched_movie(watched_movie=BASE_MOVIE_DATA)
+
+    mock_details.assert_not_called()
+    assert WatchedMovie.objects.get(id=movie.id).more_details is None
+    assert Job.objects.get(name="movies.enrich_watched_movie").payload == {"movie_id": movie.id}
+
+
+@patch("watchedmovies.movies.services.tmdb_api.get_movie_details")
+def test_enrich_watched_movie_completes_runtime_and_details(mock_details, db):
+    movie = WatchedMovieFactory()
+    mock_details.return_value = {"id": movie.id, "runtime": 121, "genres": [{"id": 18, "name": "Drama"}]}
+
+    enrich_watched_movie(movie_id=movie.id)
+
+    movie.refresh_from_db()
+    assert movie.runtime == 121
+    assert movie.more_details["genres"] == [{"id": 18, "name": "Drama"}]
+    assert list(movie.genres.values_list("name", flat=True)) == ["Drama"]
+
+
+@patch("watchedmovies.movies.services.tmdb_api.get_movie_details", return_value=None)
+def test_enrichment_job_is_retried_when_details_cannot_be_fetched(mock_details, db, settings):
+    settings.JOBS_EAGER = False
+    movie = WatchedMovieFactory()
+    enrich_watched_movie_later(movie_id=movie.id)
+
+    run(claim()[0])
+
+    job = Job.objects.get(name="movies.enrich_watched_movie")
+    assert job.status == Job.QUEUED
+    assert "TMDBUnavailable" in job.last_error
+
+
+@patch("watchedmovies.services.tmdb_api.fetch_movie_details", return_value=tmdb_cache.NOT_FOUND)
+def test_enrichment_job_is_done_when_tmdb_does_not_know_the_movie(mock_fetch, db, settings):
+    settings.JOBS_EAGER = False
+    movie = WatchedMovieFactory(runtime=None)
+    enrich_watched_movie_later(movie_id=movie.id)
+
+    run(claim()[0])
+
+    assert Job.objects.get(name="movies.enrich_watched_movie").status == Job.DONE
+    movie.refresh_from_db()
+    assert movie.runtime is None
+
+
+def test_get_stats_tolerates_movies_not_enriched_yet(db):
+    profile = ProfileFactory()
+    enriched = WatchedMovieFactory(runtime=100, more_details={"genres": [{"id": 18, "name": "Drama"}]})
+    pending = WatchedMovieFactory(runtime=None, more_details=None)
+    for movie in [enriched, pending]:
+        ViewDetailFactory(profile=profile, watched_movie=movie, watched_date=date(2024, 3, 1))
+
+    stats = get_stats(profile=profile, year=2024)
+    with patch("watchedmovies.movies.services.create_wrapped_poster") as mock_poster:
+        create_wrapped(profile=profile, year=2024)
+
+    assert stats["total_watched"] == 2
+    assert stats["total_runtime_minutes"] == 100
+    assert stats["favorite_genre"] == "Drama"
+    assert mock_poster.call_args.args[0]["favorite_genre"]["value"] == "Drama"
+
+
+@patch("watchedmovies.movies.services.tmdb_api.get_movie_details", return_value={"id": 99, "runtime": 110})
+def test_get_or_create_upserts_a_movie_created_concurrently(mock_details, db):
+    movie = WatchedMovie(**BASE_MOVIE_DATA)
+    upsert_watched_movies(movies=[movie], update_fields=["title"])
+    WatchedMovie.objects.filter(id=99).update(title="Stale Title")
+
+    with patch("watchedmovies.movies.services.WatchedMovie.objects.filter") as mock_filter:
+        mock_filter.return_value.first.return_value = None
+        created = get_or_create_watched_movie(watched_movie=BASE_MOVIE_DATA)
+
+    assert created.id == 99
+    saved = WatchedMovie.objects.get(id=99)
+    assert (saved.title, saved.runtime) == (BASE_MOVIE_DATA["title"], 110)
+    assert WatchedMovie.objects.count() == 1
+
+
+def test_get_stats_reads_the_yearly_rollups_and_the_streaks_in_two_queries(db, django_assert_num_queries):
+    profile = ProfileFactory()
+    drama = {"genres": [{"id": 18, "name": "Drama"}]}
+    fight_club = WatchedMovieFactory(title="Fight Club", runtime=139, more_details=drama)
+    alien = WatchedMovieFactory(title="Alien", runtime=117, more_details={"genres": [{"id": 27, "name": "Horror"}]})
+    views = [
+        (fight_club, 8, "en", "home", date(2024, 3, 1)),
+        (fight_club, 10, "en", "cinema", date(2024, 3, 2)),
+        (alien, 6, "es", "home", date(2024, 7, 3)),
+        (alien, None, "", "", date(2023, 1, 1)),
+    ]
+    for movie, rating, language, place, watched_date in views:
+        ViewDetails.objects.create(
+            profile=profile,
+            watched_movie=movie,
+            rating=rating,
+            language=language,
+            place=place,
+            watched_date=watched_date,
+        )
+
+    rebuild_year_stats(profile_id=profile.id)
+
+    with django_assert_num_queries(2):
+        stats = get_stats(profile=profile, year=2024)
+
+    assert stats["total_watched"] == 3
+    assert stats["total_unique_movies"] == 2
+    assert stats["rewatch_count"] == 1
+    assert stats["total_runtime_minutes"] == 139 * 2 + 117
+    assert stats["average_rating"] == 8.0
+    assert stats["favorite_movie"] == [{"title": "Fight Club", "count": 2}, {"title": "Alien", "count": 1}]
+    assert stats["genres"] == [{"name": "Drama", "count": 2}, {"name": "Horror", "count": 1}]
+    assert stats["most_active_month"] == "Mar"
+    assert stats["by_language"] == [
+        {"key": "en", "label": "English", "count": 2},
+        {"key": "es", "label": "Spanish", "count": 1},
+    ]
+    assert stats["by_place"] == [
+        {"key": "home", "label": "Home", "count": 2},
+        {"key": "cinema", "label": "Movie Theater", "count": 1},
+    ]
+    assert [row["count"] for row in stats["by_rating"]] == [0, 0, 0, 0, 0, 1, 0, 1, 0, 1]
+    assert stats["by_day_of_week"][5] == {"day": "Friday", "day_number": 6, "count": 1}
+    assert stats["max_streak"] == {"days": 2, "start_date": "2024-03-01", "end_date": "2024-03-02"}
+    assert stats["by_year"] == [
+        {"year": 2023, "count": 1, "avg_rating": None},
+        {"year": 2024, "count": 3, "avg_rating": 8.0},
+    ]
+
+
+def test_year_stats_follow_created_updated_and_deleted_views(db, user, api_rf):
+    profile = ProfileFactory(user=user)
+    movie = WatchedMovieFactory(runtime=100, more_details={"genres": [{"id": 18, "name": "Drama"}]})
+    data = {"watched_movie": {"id": movie.id}, "profile": profile, "rating": 7, "language": "en", "place": "home"}
+
+    first = create_view_detail(**data, watched_date=date(2024, 3, 1))
+    second = create_view_detail(**data, watched_date=date(2024, 3, 2))
+    update_view_detail(view_detail=second, watched_date=date(2023, 5, 1), rating=9)
+
+    request = api_rf.patch(FAKE, {"place": "cinema"}, format="json")
+    request.user = user
+    ViewDetailViewSet.as_view({"patch": "partial_update"})(request, pk=first.id)
+
+    def snapshot():
+        return {
+            row.year: (row.total, row.runtime_minutes, row.rating_sum, row.counters)
+            for row in profile.year_stats.all()
+        }
+
+    incremental = snapshot()
+    rebuild_year_stats(profile_id=profile.id)
+    assert snapshot() == incremental
+    assert incremental[2023][:3] == (1, 100, 9)
+    assert incremental[2024][3]["places"] == {"cinema": 1}
+
+    request = api_rf.delete(FAKE)
+    request.user = user
+    ViewDetailViewSet.as_view({"delete": "destroy"})(request, pk=first.id)
+
+    assert list(profile.year_stats.values_list("year", flat=True)) == [2023]
+
+
+def test_migration_backfills_the_rollups_of_views_logged_before_them(db):
+    profile = ProfileFactory()
+    drama = WatchedMovieFactory(runtime=100, more_details={"genres": [{"id": 18, "name": "Drama"}]})
+    ViewDetails.objects.bulk_create(
+        ViewDetails(profile=profile, watched_movie=movie, watched_date=date(2024, 1, day), rating=4)
+        for day, movie in enumerate([drama, WatchedMovieFactory(), WatchedMovieFactory()], start=1)
+    )
+    create_view_detail(watched_movie={"id": drama.id}, profile=profile, watched_date=date(2024, 2, 1))
+    assert get_stats(profile=profile)["total_watched"] == 1
+
+    backfill = importlib.import_module("watchedmovies.movies.migrations.0024_backfill_profileyearstats")
+    backfill.backfill_year_stats(django_apps, None)
+
+    stats = get_stats(profile=profile, year=2024)
+    assert stats["total_watched"] == 4
+    assert stats["favorite_genre"] == "Drama"
+    assert [(row.year, row.counters) for row in ProfileYearStats.objects.filter(profile=profile)] == [
+        (row.year, row.counters) for row in rebuild_year_stats(profile_id=profile.id)
+    ]
+
+
+def test_migration_fills_the_genres_of_movies_saved_before_them(db):
+    drama = WatchedMovieFactory(more_details={"genres": [{"id": 18, "name": "Drama"}, {"id": 27, "name": "Horror"}]})
+    without_details = WatchedMovieFactory(more_details=None)
+    drama.genres.clear()
+    Genre.objects.all().delete()
+
+    backfill = importlib.import_module("watchedmovies.movies.migrations.0023_backfill_movie_genres")
+    backfill.backfill_movie_genres(django_apps, None)
+
+    assert sorted(drama.genres.values_list("name", flat=True)) == ["Drama", "Horror"]
+    assert not without_details.genres.exists()
+
+
+@patch("watchedmovies.movies.services.tmdb_api.get_movie_details", return_value={"runtime": 120, "genres": []})
+def test_enrich_watched_movie_refreshes_the_year_stats(mock_details, db):
+    profile = ProfileFactory()
+    movie = WatchedMovieFactory(runtime=None, more_details=None)
+    ViewDetailFactory(profile=profile, watched_movie=movie, watched_date=date(2024, 1, 1))
+    rebuild_year_stats(profile_id=profile.id)
+
+    enrich_watched_movie(movie_id=movie.id)
+
+    assert get_stats(profile=profile, year=2024)["total_runtime_minutes"] == 120
+
+
+def test_set_movie_genres_replaces_the_genres_from_the_details(db):
+    movie = WatchedMovieFactory(more_details={"genres": [{"id": 18, "name": "Drama"}, {"id": 27, "name": "Horror"}]})
+    assert sorted(movie.genres.values_list("id", flat=True)) == [18, 27]
+
+    movie.more_details = {"genres": [{"id": 18, "name": "Drama Renamed"}]}
+    set_movie_genres(movies=[movie])
+
+    assert list(movie.genres.values_list("name", flat=True)) == ["Drama Renamed"]
+    assert Genre.objects.count() == 2
+
+
+def test_get_watching_streaks_finds_the_longest_and_the_current_run(db):
+    profile = ProfileFactory()
+    days = [
+        date(2023, 12, 30),
+        date(2023, 12, 31),
+        date(2024, 1, 1),
+        date(2024, 1, 1),
+        date(2024, 2, 10),
+        date(2024, 2, 11),
+        date(2024, 2, 12),
+        date(2024, 3, 4),
+        date(2024, 3, 5),
+    ]
+    for watched_date in days:
+        ViewDetails.objects.create(profile=profile, watched_movie=WatchedMovieFactory(), watched_date=watched_date)
+
+    all_time = get_watching_streaks(profile_id=profile.id, today=date(2024, 3, 6))
+    assert all_time["longest"] == {"days": 3, "start_date": date(2023, 12, 30), "end_date": date(2024, 1, 1)}
+    assert all_time["current"] == {"days": 2, "start_date": date(2024, 3, 4), "end_date": date(2024, 3, 5)}
+
+    in_2024 = get_watching_streaks(profile_id=profile.id, year=2024, today=date(2024, 3, 7))
+    assert in_2024["longest"] == {"days": 3, "start_date": date(2024, 2, 10), "end_date": date(2024, 2, 12)}
+    assert in_2024["current"] == {"days": 0, "start_date": None, "end_date": None}
+
+
+def test_movie_summaries_follow_the_views_of_the_profile(db, user, api_rf):
+    profile = ProfileFactory(user=user)
+    movie = WatchedMovieFactory()
+    data = {"watched_movie": {"id": movie.id}, "profile": profile}
+
+    create_view_detail(**data, rating=6, watched_date=date(2024, 1, 1))
+    second = create_view_detail(**data, rating=8, watched_date=date(2024, 2, 1), is_favorite=True)
+    summary = ProfileMovieSummary.objects.get(profile=profile, movie=movie)
+    assert (summary.total_views, summary.avg_rating, summary.is_favorite) == (2, 7.0, True)
+    assert (summary.first_watched_date, summary.last_watched_date) == (date(2024, 1, 1), date(2024, 2, 1))
+
+    update_view_detail(view_detail=second, is_favorite=False, watched_date=date(2023, 12, 1))
+    summary.refresh_from_db()
+    assert (summary.is_favorite, summary.first_watched_date, summary.last_watched_date) == (
+        False,
+        date(2023, 12, 1),
+        date(2024, 1, 1),
+    )
+
+    request = api_rf.delete(FAKE)
+    request.user = user
+    WatchedMovieViewSet.as_view({"delete": "destroy"})(request, pk=movie.id)
+
+    assert not ProfileMovieSummary.objects.filter(profile=profile).exists()
+    assert not ViewDetails.objects.filter(profile=profile).exists()
+
+
+def test_list_watched_movies_reads_the_summaries_without_aggregating(db, user, api_rf, django_assert_max_num_queries):
+    profile = ProfileFactory(user=user)
+    older = WatchedMovieFactory()
+    newer = WatchedMovieFactory()
+    ViewDetailFactory(profile=profile, watched_movie=older, watched_date=date(2023, 1, 1), rating=4)
+    ViewDetailFactory(profile=profile, watched_movie=newer, watched_date=date(2024, 1, 1), rating=5)
+    ViewDetailFactory(profile=ProfileFactory(), watched_movie=older, watched_date=date(2025, 1, 1))
+
+    request = api_rf.get(FAKE)
+    request.user = user
+    with django_assert_max_num_queries(3) as queries:
+        response = WatchedMovieViewSet.as_view({"get": "list"})(request)
+
+    assert [movie["id"] for movie in response.data["results"]] == [newer.id, older.id]
+    assert [movie["total_views"] for movie in response.data["results"]] == [1, 1]
+    assert not any("GROUP BY" in query["sql"] for query in queries.captured_queries)
@@ -0,0 +1,103 @@
+import base64
+import json
+from datetime import date
+
+import pytest
+
+from watchedmovies.users.tests.factories import ProfileFactory
+
+from ..models import PlanToWatch, WatchedMovie
+from ..views import PlanToWatchViewSet, ViewDetailViewSet, WatchedMovieViewSet
+from .factories import ViewDetailFactory, WatchedMovieFactory
+
+FAKE = "/fake-url/"
+
+
+def get_pages(viewset, user, api_rf, params):
+    """Follow the next links of a cursor paginated list and return the pages."""
+    pages = []
+    request = api_rf.get(FAKE, params)
+
+    while request is not None:
+        request.user = user
+        response = viewset.as_view({"get": "list"})(request)
+        assert response.status_code == 200
+        pages.append(response.data)
+        request = api_rf.get(response.data["next"]) if response.data["next"] else None
+
+    return pages
+
+
+def test_watched_movies_cursor_pages_by_last_view_and_id(db, user, api_rf):
+    profile = ProfileFactory(user=user)
+    watched_dates = [date(2024, 1, 1), date(2024, 1, 1), None, date(2023, 5, 1), date(2024, 6, 1)]
+    movies = []
+    for watched_date in watched_dates:
+        movie = WatchedMovieFactory()
+        ViewDetailFactory(profile=profile, watched_movie=movie, watched_date=watched_date)
+        movies.append(movie)
+
+    pages = get_pages(WatchedMovieViewSet, user, api_rf, {"pagination": "cursor", "page_size": 2})
+
+    assert [len(page["results"]) for page in pages] == [2, 2, 1]
+    assert [movie["id"] for page in pages for movie in page["results"]] == [
+        movies[2].id,
+        movies[4].id,
+        movies[1].id,
+        movies[0].id,
+        movies[3].id,
+    ]
+    assert "count" not in pages[0]
+
+
+def test_watched_movies_cursor_follows_the_requested_ordering(db, user, api_rf):
+    profile = ProfileFactory(user=user)
+    for title in ["Casablanca", "Alien", "Brazil"]:
+        ViewDetailFactory(profile=profile, watched_movie=WatchedMovieFactory(title=title))
+
+    pages = get_pages(WatchedMovieViewSet, user, api_rf, {"pagination": "cursor", "ordering": "title", "page_size": 1})
+
+    titles = dict(WatchedMovie.objects.values_list("id", "title"))
+    assert [titles[page["results"][0]["id"]] for page in pages] == ["Alien", "Brazil", "Casablanca"]
+
+
+def test_view_details_and_plans_cursor_with_approximate_total(db, user, api_rf):
+    profile = ProfileFactory(user=user)
+    for day in range(1, 4):
+        ViewDetailFactory(profile=profile, watched_date=date(2024, 1, day))
+        PlanToWatch.objects.create(profile=profile, movie=WatchedMovieFactory())
+
+    views = get_pages(
+        ViewDetailViewSet, user, api_rf, {"pagination": "cursor", "page_size": 2, "total": "approximate"}
+    )
+    plans = get_pages(PlanToWatchViewSet, user, api_rf, {"pagination": "cursor", "page_size": 2})
+
+    assert [view["watched_date"] for page in views for view in page["results"]] == [
+        "2024-01-03",
+        "2024-01-02",
+        "2024-01-01",
+    ]
+    assert isinstance(views[0]["count"], int)
+    assert sum(len(page["results"]) for page in plans) == 3
+
+
+def test_invalid_cursor_is_not_found(db, user, api_rf):
+    ProfileFactory(user=user)
+
+    request = api_rf.get(FAKE, {"cursor": "not-a-cursor"})
+    request.user = user
+    response = PlanToWatchViewSet.as_view({"get": "list"})(request)
+
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize("key", [["2024-01-01", "1"], ["not-a-date", 1], [{"year": 2024}, 1], [1]])
+def test_cursor_with_a_key_of_the_wrong_type_is_not_found(db, user, api_rf, key):
+    ProfileFactory(user=user)
+    cursor = base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+    request = api_rf.get(FAKE, {"cursor": cursor})
+    request.user = user
+    response = WatchedMovieViewSet.as_view({"get": "list"})(request)
+
+    assert response.status_code == 404
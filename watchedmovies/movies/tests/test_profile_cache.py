@@ -0,0 +1,106 @@
+import threading
+from datetime import date
+from unittest.mock import patch
+
+from django.core.cache import cache
+
+from watchedmovies.movies.services import create_view_detail
+from watchedmovies.services import profile_cache
+from watchedmovies.users.tests.factories import ProfileFactory
+
+from ..models import PlanToWatch
+from ..views import PlanToWatchViewSet, WatchedMovieViewSet
+from .factories import ViewDetailFactory, WatchedMovieFactory
+
+FAKE = "/fake-url/"
+
+
+def get(user, api_rf, action, params=None):
+    request = api_rf.get(FAKE, params or {})
+    request.user = user
+    return WatchedMovieViewSet.as_view({"get": action})(request)
+
+
+def test_stats_are_cached_until_the_profile_logs_a_view(db, user, api_rf):
+    profile = ProfileFactory(user=user)
+    movie = WatchedMovieFactory()
+    ViewDetailFactory(profile=profile, watched_movie=movie, watched_date=date(2024, 1, 1))
+
+    assert get(user, api_rf, "stats").data["total_watched"] == 1
+    assert get(user, api_rf, "stats").data["total_watched"] == 1
+    assert profile_cache.get_stats("stats") == {"miss": 1, "hit": 1}
+
+    create_view_detail(watched_movie={"id": movie.id}, profile=profile, watched_date=date(2024, 1, 2))
+
+    assert get(user, api_rf, "stats").data["total_watched"] == 2
+    assert profile_cache.get_stats("stats") == {"miss": 2, "hit": 1}
+
+
+def test_cached_stats_follow_the_current_streak_into_the_next_day(db, user, api_rf):
+    profile = ProfileFactory(user=user)
+    ViewDetailFactory(profile=profile, watched_movie=WatchedMovieFactory(), watched_date=date(2024, 1, 1))
+
+    with patch("watchedmovies.movies.views.date", wraps=date) as mock_date:
+        mock_date.today.return_value = date(2024, 1, 2)
+        assert get(user, api_rf, "stats").data["current_streak"]["days"] == 1
+
+        mock_date.today.return_value = date(2024, 1, 3)
+        assert get(user, api_rf, "stats").data["current_streak"]["days"] == 0
+
+
+def test_watched_movies_are_cached_per_query(db, user, api_rf):
+    profile = ProfileFactory(user=user)
+    ViewDetailFactory(profile=profile, watched_movie=WatchedMovieFactory(), watched_date=date(2024, 1, 1))
+
+    assert get(user, api_rf, "list").data["count"] == 1
+    assert get(user, api_rf, "list", {"watched_date_year": 2023}).data["count"] == 0
+    assert get(user, api_rf, "list").data["count"] == 1
+    assert profile_cache.get_stats("watched_movies") == {"miss": 2, "hit": 1}
+
+
+def test_deleting_a_plan_invalidates_the_profile(db, user, api_rf):
+    profile = ProfileFactory(user=user)
+    plan = PlanToWatch.objects.create(profile=profile, movie=WatchedMovieFactory())
+    version = profile_cache.get_version(profile.id)
+
+    request = api_rf.delete(FAKE)
+    request.user = user
+    PlanToWatchViewSet.as_view({"delete": "destroy"})(request, pk=plan.id)
+
+    assert profile_cache.get_version(profile.id) > version
+
+
+def test_lost_version_never_goes_back(db):
+    profile = ProfileFactory()
+    profile_cache.bump_version(profile.id)
+    version = profile_cache.get_version(profile.id)
+
+    cache.delete(profile_cache.get_version_key(profile.id))
+
+    assert profile_cache.get_version(profile.id) > version
+
+
+def test_concurrent_misses_compute_the_payload_once(db):
+    started, release = threading.Event(), threading.Event()
+    calls, payloads = [], []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(1)
+        return {"value": 1}
+
+    def get():
+        payloads.append(profile_cache.get_or_compute(profile_id=1, endpoint="stats", params=[], compute=compute))
+
+    leader = threading.Thread(target=get)
+    leader.start()
+    started.wait(1)
+    follower = threading.Thread(target=get)
+    follower.start()
+    release.set()
+    leader.join()
+    follower.join()
+
+    assert payloads == [{"value": 1}, {"value": 1}]
+    assert calls == [1]
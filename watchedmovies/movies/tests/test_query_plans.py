@@ -0,0 +1,131 @@
+import json
+from datetime import date, timedelta
+
+import pytest
+from django.db import connection
+
+from watchedmovies.movies.services import STREAKS_SQL, rebuild_movie_summaries, rebuild_year_stats
+from watchedmovies.users.tests.factories import ProfileFactory
+
+from ..models import PlanToWatch, ProfileMovieSummary, ProfileYearStats, ViewDetails, WatchedMovie
+from ..views import WatchedMovieViewSet
+from .factories import WatchedMovieFactory
+
+# Indexes of the views led by the profile, on tables this small the planner may pick either for a profile.
+PROFILE_VIEW_INDEXES = {"viewdetails_profile_date_idx", "viewdetails_profile_movie_idx"}
+
+# Tables the hot queries must reach through an index.
+INDEXED_TABLES = {
+    ViewDetails._meta.db_table,
+    PlanToWatch._meta.db_table,
+    ProfileMovieSummary._meta.db_table,
+    ProfileYearStats._meta.db_table,
+    WatchedMovie._meta.db_table,
+}
+
+
+@pytest.fixture
+def seeded_profile(db):
+    """Seed a few profiles with views and plans, and make the planner avoid sequential scans it can avoid."""
+    movies = [WatchedMovieFactory() for _ in range(20)]
+    profiles = [ProfileFactory() for _ in range(5)]
+
+    views = []
+    for i, profile in enumerate(profiles):
+        for j, movie in enumerate(movies):
+            views.append(
+                ViewDetails(profile=profile, watched_movie=movie, watched_date=date(2024, 1, 1) + timedelta(j))
+            )
+        PlanToWatch.objects.bulk_create(PlanToWatch(profile=profile, movie=movie) for movie in movies[i::5])
+    ViewDetails.objects.bulk_create(views)
+
+    for profile in profiles:
+        rebuild_year_stats(profile_id=profile.id)
+        rebuild_movie_summaries(profile_id=profile.id)
+
+    with connection.cursor() as cursor:
+        for table in INDEXED_TABLES:
+            cursor.execute(f"ANALYZE {table}")
+        # The tables are small, without this the planner would rightly prefer to read them whole.
+        cursor.execute("SET LOCAL enable_seqscan = off")
+
+    return profiles[0]
+
+
+def get_sequential_scans(plan: dict) -> list[str]:
+    """Return the indexed tables read with a sequential scan anywhere in a JSON plan."""
+    scans = []
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in INDEXED_TABLES:
+        scans.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        scans += get_sequential_scans(child)
+    return scans
+
+
+def get_indexes(plan: dict) -> set[str]:
+    """Return the indexes read anywhere in a JSON plan."""
+    indexes = {plan["Index Name"]} if "Index Name" in plan else set()
+    for child in plan.get("Plans", []):
+        indexes |= get_indexes(child)
+    return indexes
+
+
+def explain(queryset) -> dict:
+    return json.loads(queryset.explain(format="json"))[0]["Plan"]
+
+
+def test_views_by_profile_and_date_use_an_index(seeded_profile):
+    queryset = ViewDetails.objects.filter(profile=seeded_profile, watched_date__year=2024).order_by("-watched_date")
+    plan = explain(queryset)
+
+    assert get_sequential_scans(plan) == []
+    assert get_indexes(plan) & PROFILE_VIEW_INDEXES
+
+
+def test_views_of_a_movie_by_profile_use_an_index(seeded_profile):
+    movie = WatchedMovie.objects.first()
+    queryset = ViewDetails.objects.filter(profile=seeded_profile, watched_movie=movie)
+
+    assert get_sequential_scans(explain(queryset)) == []
+
+
+def test_streaks_use_an_index(seeded_profile):
+    params = {"profile_id": seeded_profile.id, "start": date.min, "end": date.max, "since": date(2024, 3, 1)}
+
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN (FORMAT JSON) " + STREAKS_SQL.format(table=ViewDetails._meta.db_table), params)
+        plan = cursor.fetchone()[0]
+
+    plan = (json.loads(plan) if isinstance(plan, str) else plan)[0]["Plan"]
+    assert get_sequential_scans(plan) == []
+    assert get_indexes(plan) & PROFILE_VIEW_INDEXES
+
+
+def test_watched_movies_list_uses_an_index(seeded_profile, rf):
+    request = rf.get("/")
+    request.user = seeded_profile.user
+    view = WatchedMovieViewSet(request=request, format_kwarg=None, action="list")
+    queryset = view.get_queryset().order_by("-first_watched_date", "-id")[:20]
+
+    assert get_sequential_scans(explain(queryset)) == []
+
+
+def test_plans_to_watch_list_uses_an_index(seeded_profile):
+    queryset = PlanToWatch.objects.filter(profile=seeded_profile).order_by("-added_at")[:20]
+    plan = explain(queryset)
+
+    assert get_sequential_scans(plan) == []
+    assert "plantowatch_profile_added_idx" in get_indexes(plan)
+
+
+def test_year_stats_use_an_index(seeded_profile):
+    assert get_sequential_scans(explain(ProfileYearStats.objects.filter(profile=seeded_profile))) == []
+
+
+def test_duplicated_movies_lookup_uses_an_index(seeded_profile):
+    movie = WatchedMovie.objects.first()
+    queryset = WatchedMovie.objects.filter(original_title=movie.original_title, release_date=movie.release_date)
+    plan = explain(queryset)
+
+    assert get_sequential_scans(plan) == []
+    assert "watchedmovie_title_release_idx" in get_indexes(plan)
@@ -0,0 +1,369 @@
+import pickle
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import Mock, patch
+
+import pytest
+import requests
+
+from watchedmovies.services import tmdb_api, tmdb_cache, tmdb_circuit_breaker, tmdb_rate_limit, tmdb_session
+from watchedmovies.utils import single_flight
+
+
+class FakeTMDBHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    statuses: list = []
+
+    def do_GET(self):
+        status = self.statuses.pop(0) if self.statuses else 200
+        body = b'{"id": 1}'
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_tmdb(settings):
+    settings.TMDB_MAX_RETRIES = 2
+    settings.TMDB_RETRY_BACKOFF = 0
+    tmdb_session.reset()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeTMDBHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+    FakeTMDBHandler.statuses = []
+    tmdb_session.reset()
+
+
+def test_session_reuses_keep_alive_connection(fake_tmdb):
+    for _ in range(3):
+        response = tmdb_session.get(f"{fake_tmdb}/movie/1")
+        assert response.status_code == 200
+
+    stats = tmdb_session.get_stats()
+    assert stats["requests"] == 3
+    assert stats["handshakes"] == 1
+    assert stats["reused"] == 2
+
+
+def test_session_retries_server_errors(fake_tmdb):
+    FakeTMDBHandler.statuses = [503, 502]
+
+    response = tmdb_session.get(f"{fake_tmdb}/movie/1")
+
+    assert response.status_code == 200
+    assert response.json() == {"id": 1}
+
+
+def test_session_returns_last_error_when_retries_are_exhausted(fake_tmdb):
+    FakeTMDBHandler.statuses = [500, 500, 500]
+
+    response = tmdb_session.get(f"{fake_tmdb}/movie/1")
+
+    assert response.status_code == 500
+
+
+class FakeResponse:
+    def __init__(self, status_code, payload=None):
+        self.status_code = status_code
+        self.payload = payload
+
+    def json(self):
+        return self.payload
+
+
+@patch("watchedmovies.services.tmdb_api.make_request")
+def test_movie_details_are_served_from_cache(mock_request):
+    mock_request.return_value = FakeResponse(200, {"id": 550, "runtime": 139})
+
+    first = tmdb_api.get_movie_details(550)
+    second = tmdb_api.get_movie_details(550)
+
+    assert first == second == {"id": 550, "runtime": 139}
+    assert mock_request.call_count == 1
+    assert tmdb_cache.get_stats("movie_details")["lru_hit"] >= 1
+
+
+@patch("watchedmovies.services.tmdb_api.make_request")
+def test_movie_details_shared_tier_fills_local_tier(mock_request):
+    mock_request.return_value = FakeResponse(200, {"id": 550})
+    tmdb_api.get_movie_details(550)
+    tmdb_cache.clear()
+
+    assert tmdb_api.get_movie_details(550) == {"id": 550}
+    assert mock_request.call_count == 1
+    assert tmdb_cache.get_stats("movie_details")["shared_hit"] >= 1
+
+
+@patch("watchedmovies.services.tmdb_api.make_request")
+def test_movie_details_not_found_is_cached_negatively(mock_request):
+    mock_request.return_value = FakeResponse(404)
+
+    assert tmdb_api.get_movie_details(1) is None
+    assert tmdb_api.get_movie_details(1) is None
+    assert mock_request.call_count == 1
+
+
+@patch("watchedmovies.services.tmdb_api.make_request")
+def test_movie_details_server_errors_are_not_cached(mock_request):
+    mock_request.return_value = FakeResponse(500)
+
+    assert tmdb_api.get_movie_details(1) is None
+    assert tmdb_api.get_movie_details(1) is None
+    assert mock_request.call_count == 2
+
+
+@patch("watchedmovies.services.tmdb_api.make_request")
+def test_stale_movie_details_are_served_while_refreshing(mock_request, settings):
+    settings.TMDB_DETAILS_CACHE_TTL = 0
+    mock_request.return_value = FakeResponse(200, {"id": 550, "runtime": 139})
+    tmdb_api.get_movie_details(550)
+    mock_request.return_value = FakeResponse(200, {"id": 550, "runtime": 140})
+
+    stale = tmdb_api.get_movie_details(550)
+    tmdb_cache.refresh("movie:550", lambda: None, namespace="movie_details", ttl=0).result(timeout=5)
+
+    assert stale == {"id": 550, "runtime": 139}
+    assert tmdb_cache.get_entry("movie:550")[0]["value"] == {"id": 550, "runtime": 140}
+
+
+def test_concurrent_identical_searches_share_one_request():
+    release = threading.Event()
+    calls = []
+
+    def slow_request(url, params=None):
+        calls.append(url)
+        release.wait(timeout=5)
+        return FakeResponse(200, {"results": [{"id": 1}], "total_pages": 1, "total_results": 1})
+
+    with patch("watchedmovies.services.tmdb_api.make_request", side_effect=slow_request):
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            futures = [executor.submit(tmdb_api.search_movies, "matrix") for _ in range(5)]
+            while not calls:
+                time.sleep(0.01)
+            time.sleep(0.05)
+            release.set()
+            results = [future.result(timeout=5) for future in futures]
+
+    assert len(calls) == 1
+    assert all(result["results"] == [{"id": 1}] for result in results)
+
+
+def test_waiter_on_another_worker_reads_published_result():
+    with (
+        patch("watchedmovies.utils.single_flight.cache.add", return_value=False),
+        patch("watchedmovies.utils.single_flight.cache.get", return_value={"value": {"id": 7}}),
+    ):
+        fetch = Mock()
+        assert single_flight.do("movie:7", fetch) == {"id": 7}
+
+    fetch.assert_not_called()
+
+
+def test_not_found_marker_survives_the_shared_cache():
+    assert pickle.loads(pickle.dumps(tmdb_cache.NOT_FOUND)) is tmdb_cache.NOT_FOUND
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    fake_clock = FakeClock()
+    with patch("watchedmovies.services.tmdb_rate_limit.time", fake_clock):
+        yield fake_clock
+
+
+def test_token_bucket_waits_once_the_burst_is_spent(settings, clock):
+    settings.TMDB_RATE_LIMIT = 10
+    settings.TMDB_RATE_LIMIT_BURST = 2
+
+    for _ in range(3):
+        tmdb_rate_limit.acquire()
+
+    assert clock.sleeps == [pytest.approx(0.1)]
+
+
+def test_backfill_leaves_reserve_for_interactive_requests(settings, clock):
+    settings.TMDB_RATE_LIMIT = 1
+    settings.TMDB_RATE_LIMIT_BURST = 4
+    settings.TMDB_BACKFILL_RESERVE = 0.5
+    settings.TMDB_RATE_LIMIT_MAX_WAIT = 0
+
+    with tmdb_rate_limit.priority(tmdb_rate_limit.BACKFILL):
+        tmdb_rate_limit.acquire()
+        tmdb_rate_limit.acquire()
+        tmdb_rate_limit.acquire()
+    assert clock.sleeps == [pytest.approx(1)]
+
+    tmdb_rate_limit.acquire()
+    tmdb_rate_limit.acquire()
+    with pytest.raises(tmdb_rate_limit.TMDBRateLimited):
+        tmdb_rate_limit.acquire()
+
+
+@patch("watchedmovies.services.tmdb_session.get")
+def test_rate_limited_request_is_retried_after_retry_after(mock_get, clock):
+    throttled = FakeResponse(429)
+    throttled.headers = {"Retry-After": "2"}
+    mock_get.side_effect = [throttled, FakeResponse(200, {"id": 550})]
+
+    details = tmdb_api.get_movie_details(550)
+
+    assert details == {"id": 550}
+    assert mock_get.call_count == 2
+    assert clock.sleeps == [pytest.approx(2)]
+
+
+@patch("watchedmovies.services.tmdb_session.get")
+def test_circuit_opens_after_consecutive_failures(mock_get, settings):
+    settings.TMDB_BREAKER_FAILURES = 2
+    mock_get.side_effect = requests.ConnectionError
+
+    for _ in range(2):
+        with pytest.raises(requests.ConnectionError):
+            tmdb_api.make_request("https://tmdb.test/movie/550")
+    with pytest.raises(tmdb_circuit_breaker.CircuitOpen):
+        tmdb_api.make_request("https://tmdb.test/movie/550")
+
+    assert mock_get.call_count == 2
+    assert tmdb_circuit_breaker.get_state()["state"] == tmdb_circuit_breaker.OPEN
+    assert tmdb_circuit_breaker.get_state()["tmdb.breaker.rejected"] == 1
+
+
+@patch("watchedmovies.services.tmdb_session.get")
+def test_half_open_probe_closes_the_circuit(mock_get, settings):
+    settings.TMDB_BREAKER_FAILURES = 1
+    settings.TMDB_BREAKER_RESET_TIMEOUT = 0
+    mock_get.return_value = FakeResponse(503)
+    tmdb_api.make_request("https://tmdb.test/movie/550")
+    assert tmdb_circuit_breaker.breaker.state == tmdb_circuit_breaker.OPEN
+
+    mock_get.return_value = FakeResponse(200, {"id": 550})
+    assert tmdb_api.make_request("https://tmdb.test/movie/550").status_code == 200
+
+    assert tmdb_circuit_breaker.get_state()["state"] == tmdb_circuit_breaker.CLOSED
+    assert tmdb_circuit_breaker.get_state()["tmdb.breaker.probes"] == 1
+
+
+def test_half_open_circuit_lets_a_single_probe_through(settings):
+    settings.TMDB_BREAKER_FAILURES = 1
+    settings.TMDB_BREAKER_RESET_TIMEOUT = 0
+    breaker = tmdb_circuit_breaker.breaker
+    breaker.record_failure()
+
+    breaker.before_request()
+    with pytest.raises(tmdb_circuit_breaker.CircuitOpen):
+        breaker.before_request()
+
+    breaker.record_failure()
+    assert breaker.state == tmdb_circuit_breaker.OPEN
+
+
+@patch("watchedmovies.services.tmdb_session.get")
+def test_rate_limited_probe_lets_the_next_request_probe(mock_get, settings):
+    settings.TMDB_BREAKER_FAILURES = 1
+    settings.TMDB_BREAKER_RESET_TIMEOUT = 0
+    tmdb_circuit_breaker.breaker.record_failure()
+
+    with patch("watchedmovies.services.tmdb_rate_limit.acquire", side_effect=tmdb_rate_limit.TMDBRateLimited):
+        with pytest.raises(tmdb_rate_limit.TMDBRateLimited):
+            tmdb_api.make_request("https://tmdb.test/movie/550")
+
+    mock_get.return_value = FakeResponse(200, {"id": 550})
+    assert tmdb_api.make_request("https://tmdb.test/movie/550").status_code == 200
+    assert tmdb_circuit_breaker.breaker.state == tmdb_circuit_breaker.CLOSED
+
+
+@patch("watchedmovies.services.tmdb_session.get")
+def test_expired_movie_details_are_served_while_the_circuit_is_open(mock_get, settings):
+    settings.TMDB_DETAILS_CACHE_TTL = 0
+    settings.TMDB_DETAILS_STALE_TTL = 0
+    settings.TMDB_BREAKER_FAILURES = 1
+    mock_get.return_value = FakeResponse(200, {"id": 550, "runtime": 139})
+    tmdb_api.get_movie_details(550)
+
+    mock_get.return_value = FakeResponse(500)
+    assert tmdb_api.get_movie_details(550) == {"id": 550, "runtime": 139}
+    assert tmdb_api.get_movie_details(550) == {"id": 550, "runtime": 139}
+    assert tmdb_api.get_movie_details(551) is None
+
+    assert mock_get.call_count == 2
+    assert tmdb_cache.get_stats("movie_details")["last_good_hit"] == 2
+
+
+@patch("watchedmovies.services.tmdb_api.make_request")
+def test_popular_and_search_fall_back_to_last_good_payload(mock_request):
+    mock_request.return_value = FakeResponse(200, {"results": [{"id": 1}], "total_pages": 1, "total_results": 1})
+    tmdb_api.get_popular_movies()
+    tmdb_api.search_movies("matrix")
+
+    mock_request.side_effect = tmdb_circuit_breaker.CircuitOpen
+
+    assert tmdb_api.get_popular_movies()["results"] == [{"id": 1}]
+    assert tmdb_api.search_movies("matrix")["results"] == [{"id": 1}]
+    assert tmdb_api.search_movies("alien")["results"] == []
+
+
+@patch("watchedmovies.services.tmdb_api.make_request")
+def test_popular_movies_error_returns_empty_results(mock_request):
+    mock_request.return_value = FakeResponse(500)
+
+    assert tmdb_api.get_popular_movies() == {"results": []}
+
+
+def test_normalize_query_folds_case_accents_and_whitespace():
+    assert tmdb_api.normalize_query("  Amélie   POULAIN ") == "amelie poulain"
+    assert tmdb_api.normalize_query("Straße") == "strasse"
+
+
+@patch("watchedmovies.services.tmdb_api.make_request")
+def test_searches_with_the_same_normalized_query_share_the_cache(mock_request):
+    mock_request.return_value = FakeResponse(200, {"results": [{"id": 194}], "total_pages": 1, "total_results": 1})
+
+    first = tmdb_api.search_movies("Amélie & co")
+    second = tmdb_api.search_movies("  amelie  &  CO")
+
+    assert first == second
+    assert mock_request.call_count == 1
+    assert mock_request.call_args.kwargs["params"] == {"query": "amelie & co", "page": 1}
+    assert tmdb_cache.get_stats("search")["lru_hit"] == 1
+
+
+@patch("watchedmovies.services.tmdb_api.make_request")
+def test_first_search_page_prefetches_the_second(mock_request, settings):
+    settings.TMDB_SEARCH_PREFETCH = True
+    mock_request.side_effect = lambda url, params: FakeResponse(
+        200, {"results": [{"id": params["page"]}], "total_pages": 3, "total_results": 3}
+    )
+
+    tmdb_api.search_movies("alien")
+    while tmdb_cache._refreshing:
+        time.sleep(0.01)
+    second_page = tmdb_api.search_movies("Alien", page=2)
+
+    assert second_page["results"] == [{"id": 2}]
+    assert [call.kwargs["params"]["page"] for call in mock_request.call_args_list] == [1, 2]
+    assert tmdb_cache.get_stats("search")["prefetch"] == 1
@@ -0,0 +1,142 @@
+import asyncio
+from unittest.mock import patch
+
+import httpx
+import pytest
+from asgiref.sync import async_to_sync
+
+from watchedmovies.services import tmdb_api, tmdb_async, tmdb_cache, tmdb_circuit_breaker, tmdb_rate_limit
+
+
+def build_client(handler):
+    return httpx.AsyncClient(base_url=tmdb_api.get_base_url(), transport=httpx.MockTransport(handler))
+
+
+def test_get_movie_details_many_fetches_concurrently_and_caches():
+    requested = []
+
+    def handler(request):
+        movie_id = int(request.url.path.rsplit("/", 1)[-1])
+        requested.append(movie_id)
+        if movie_id == 404:
+            return httpx.Response(404)
+        return httpx.Response(200, json={"id": movie_id, "runtime": 100 + movie_id})
+
+    async def run():
+        async with build_client(handler) as client:
+            first = await tmdb_async.get_movie_details_many([1, 2, 404, 2], concurrency=2, client=client)
+            second = await tmdb_async.get_movie_details_many([1, 2, 404], client=client)
+        return first, second
+
+    first, second = async_to_sync(run)()
+
+    assert first == {1: {"id": 1, "runtime": 101}, 2: {"id": 2, "runtime": 102}, 404: None}
+    assert second == first
+    assert sorted(requested) == [1, 2, 404]
+
+
+def test_async_request_is_retried_on_server_errors(settings):
+    settings.TMDB_MAX_RETRIES = 1
+    settings.TMDB_RETRY_BACKOFF = 0
+    statuses = [503, 200]
+
+    def handler(request):
+        return httpx.Response(statuses.pop(0), json={"results": [{"id": 3}], "total_pages": 1, "total_results": 1})
+
+    async def run():
+        async with build_client(handler) as client:
+            return await tmdb_async.search_movies("star wars", client=client)
+
+    data = async_to_sync(run)()
+
+    assert data == {"results": [{"id": 3}], "total_pages": 1, "total_results": 1}
+    assert statuses == []
+
+
+def test_async_search_has_the_same_shape_as_the_sync_client_on_errors(settings):
+    settings.TMDB_MAX_RETRIES = 0
+
+    async def run():
+        async with build_client(lambda request: httpx.Response(500)) as client:
+            return await tmdb_async.search_movies("matrix", client=client)
+
+    assert async_to_sync(run)() == {"results": [], "total_pages": 1, "total_results": 0}
+
+
+def test_open_circuit_serves_last_good_details_without_requests(settings):
+    settings.TMDB_BREAKER_FAILURES = 1
+    tmdb_cache.set_entry("movie:1", tmdb_cache.make_entry({"id": 1}, ttl=-1))
+    requested = []
+
+    def handler(request):
+        requested.append(request.url.path)
+        return httpx.Response(502)
+
+    async def run():
+        async with build_client(handler) as client:
+            first = await tmdb_async.get_movie_details_many([1, 2], concurrency=1, client=client)
+            second = await tmdb_async.get_movie_details_many([1, 2], client=client)
+        return first, second
+
+    first, second = async_to_sync(run)()
+
+    assert first == second == {1: {"id": 1}, 2: None}
+    assert len(requested) == 1
+    assert tmdb_circuit_breaker.breaker.state == tmdb_circuit_breaker.OPEN
+
+
+def test_rate_limited_async_probe_lets_the_next_request_probe(settings):
+    settings.TMDB_BREAKER_FAILURES = 1
+    settings.TMDB_BREAKER_RESET_TIMEOUT = 0
+    tmdb_circuit_breaker.breaker.record_failure()
+
+    async def run():
+        async with build_client(lambda request: httpx.Response(200, json={"id": 1})) as client:
+            with patch(
+                "watchedmovies.services.tmdb_rate_limit.acquire_async", side_effect=tmdb_rate_limit.TMDBRateLimited
+            ):
+                with pytest.raises(tmdb_rate_limit.TMDBRateLimited):
+                    await tmdb_async.make_request(client, "/movie/1")
+            return await tmdb_async.make_request(client, "/movie/1")
+
+    assert async_to_sync(run)().status_code == 200
+    assert tmdb_circuit_breaker.breaker.state == tmdb_circuit_breaker.CLOSED
+
+
+def test_rate_limited_movie_does_not_fail_the_batch():
+    acquired = []
+
+    async def acquire_async():
+        acquired.append(1)
+        if len(acquired) == 2:
+            raise tmdb_rate_limit.TMDBRateLimited
+
+    def handler(request):
+        movie_id = int(request.url.path.rsplit("/", 1)[-1])
+        return httpx.Response(200, json={"id": movie_id})
+
+    async def run():
+        async with build_client(handler) as client:
+            return await tmdb_async.get_movie_details_many([1, 2, 3], concurrency=1, client=client, use_cache=False)
+
+    with patch("watchedmovies.services.tmdb_rate_limit.acquire_async", acquire_async):
+        details = async_to_sync(run)()
+
+    assert details == {1: {"id": 1}, 2: None, 3: {"id": 3}}
+
+
+def test_acquire_async_takes_a_slot_off_the_event_loop(settings):
+    settings.TMDB_RATE_LIMIT_BURST = 1
+    loops = []
+
+    def blocked_for():
+        try:
+            loops.append(asyncio.get_running_loop())
+        except RuntimeError:
+            loops.append(None)
+        return 0.0
+
+    with patch("watchedmovies.services.tmdb_rate_limit.blocked_for", blocked_for):
+        async_to_sync(tmdb_rate_limit.acquire_async)()
+
+    assert loops == [None]
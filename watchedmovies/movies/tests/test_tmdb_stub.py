@@ -0,0 +1,79 @@
+import threading
+from datetime import date
+from io import StringIO
+
+import pytest
+import requests
+from django.core.management import call_command
+
+from watchedmovies.services import tmdb_api, tmdb_session
+from watchedmovies.services import tmdb_stub as tmdb_stub_module
+from watchedmovies.services.tmdb_stub import TMDBStubServer, fixture_name
+
+from ..models import WatchedMovie
+from .factories import WatchedMovieFactory
+
+
+@pytest.fixture
+def tmdb_stub(settings):
+    server = TMDBStubServer(("127.0.0.1", 0), seed=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    settings.TMDB_BASE_URL = f"{server.url}/3"
+    settings.TMDB_SECURE_BASE_URL = f"{server.url}/t/p/"
+    yield server
+    server.shutdown()
+    server.server_close()
+    tmdb_session.reset()
+
+
+def test_fixture_name_ignores_language():
+    assert fixture_name("/movie/550", {"language": "en-US"}) == "movie/550.json"
+    assert fixture_name("/search/movie", {"query": "Fight Club", "page": "1"}) == (
+        "search/movie__page-1-query-fight-club.json"
+    )
+
+
+def test_stub_serves_recorded_fixtures(tmdb_stub):
+    assert tmdb_api.get_movie_details(550)["runtime"] == 139
+    assert tmdb_api.get_movie_details(0) is None
+    assert tmdb_api.search_movies("fight club")["results"][0]["id"] == 550
+    assert [movie["id"] for movie in tmdb_api.get_popular_movies()["results"]] == [603, 550]
+    assert tmdb_stub.get_stats()["fixture_hits"] == 4
+
+
+def test_stub_synthesizes_unknown_movies(tmdb_stub):
+    details = tmdb_api.get_movie_details(12345)
+
+    assert details["id"] == 12345
+    assert details["runtime"] == 80 + 12345 % 100
+    assert len(tmdb_api.search_movies("anything", page=2)["results"]) == 20
+
+
+def test_stub_serves_poster_images(tmdb_stub):
+    response = requests.get(f"{tmdb_stub.url}/t/p/w342/poster-1.jpg", timeout=5)
+
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == "image/jpeg"
+
+
+def test_stub_injects_errors(tmdb_stub):
+    tmdb_stub.error_rate = 1
+
+    assert tmdb_api.get_movie_details(550) is None
+    assert tmdb_stub.get_stats()["errors"] >= 1
+
+
+def test_refresh_changed_movies_against_stub(tmdb_stub, db, monkeypatch):
+    movie = WatchedMovieFactory()
+
+    def synthesize(path, query):
+        if path == "/movie/changes":
+            return 200, {"page": 1, "results": [{"id": movie.id}], "total_pages": 1}
+        return tmdb_stub_module.synthesize(path, query)
+
+    monkeypatch.setattr(tmdb_stub, "resolve", lambda path, query, authorization=None: synthesize(path, query))
+
+    call_command("refresh_changed_movies", "--end-date", date.today().isoformat(), stdout=StringIO())
+
+    assert WatchedMovie.objects.get(id=movie.id).runtime is not None
@@ -1,8 +1,10 @@
+import json
 from unittest.mock import patch
 
 from django.contrib.auth.models import AnonymousUser
 
 from watchedmovies.movies.models import PlanToWatch
+from watchedmovies.movies.services import build_popular_movies_snapshot, search_local_movies
 from watchedmovies.users.tests.factories import ProfileFactory
 
 from ..views import TMDBViewSet
@@ -10,6 +12,8 @@ from .factories import ViewDetailFactory, WatchedMovieFactory
 
 FAKE_URL = "/fake/"
 
+FAKE_POPULAR_MOVIES = {"results": [{"id": 550, "title": "Fight Club", "poster_path": None}]}
+
 FAKE_TMDB_DATA = {
     "id": 0,
     "title": "Fake Movie",
@@ -94,3 +98,159 @@ def test_movie_details_both_flags_true(mock_get, db, user, api_rf):
     assert response.status_code == 200
     assert response.data["is_watched"] is True
     assert response.data["is_plan_to_watch"] is True
+
+
+@patch("watchedmovies.movies.services.tmdb_api.get_popular_movies", return_value=FAKE_POPULAR_MOVIES)
+def test_popular_movies_are_served_from_the_snapshot(mock_get, db, api_rf):
+    build_popular_movies_snapshot(page=1)
+    view = TMDBViewSet.as_view({"get": "popular_movies"})
+
+    first = view(api_rf.get(FAKE_URL))
+    second = view(api_rf.get(FAKE_URL))
+
+    assert mock_get.call_count == 1
+    assert first.status_code == second.status_code == 200
+    assert first.content == second.content
+    assert json.loads(first.content)[0]["title"] == "Fight Club"
+    assert first["ETag"] == second["ETag"]
+
+
+@patch("watchedmovies.movies.services.tmdb_api.get_popular_movies", return_value=FAKE_POPULAR_MOVIES)
+def test_popular_movies_not_modified_when_etag_matches(mock_get, db, api_rf):
+    build_popular_movies_snapshot(page=1)
+    view = TMDBViewSet.as_view({"get": "popular_movies"})
+    etag = view(api_rf.get(FAKE_URL))["ETag"]
+
+    response = view(api_rf.get(FAKE_URL, HTTP_IF_NONE_MATCH=etag))
+
+    assert response.status_code == 304
+    assert response.content == b""
+
+
+@patch("watchedmovies.movies.services.tmdb_api.get_popular_movies")
+def test_popular_movies_empty_for_pages_not_refreshed(mock_get, db, api_rf):
+    response = TMDBViewSet.as_view({"get": "popular_movies"})(api_rf.get(FAKE_URL, {"page": 2}))
+
+    mock_get.assert_not_called()
+    assert response.status_code == 200
+    assert response.data == []
+
+
+def test_popular_movies_rejects_pages_out_of_range(db, api_rf):
+    response = TMDBViewSet.as_view({"get": "popular_movies"})(api_rf.get(FAKE_URL, {"page": 0}))
+
+    assert response.status_code == 400
+
+
+def test_popular_movies_rejects_pages_that_are_not_integers(db, api_rf):
+    response = TMDBViewSet.as_view({"get": "popular_movies"})(api_rf.get(FAKE_URL, {"page": "two"}))
+
+    assert response.status_code == 400
+    assert "page" in response.data
+
+
+def search(api_rf, query, **params):
+    return TMDBViewSet.as_view({"get": "search_movies"})(api_rf.get(FAKE_URL, params), query=query)
+
+
+def test_local_search_matches_word_prefixes_of_titles(db):
+    fight_club = WatchedMovieFactory(title="Fight Club", original_title="Fight Club")
+    WatchedMovieFactory(title="Amélie", original_title="Le Fabuleux Destin d'Amélie Poulain", overview="")
+    WatchedMovieFactory(title="Alien", original_title="Alien", overview="")
+
+    assert [movie["id"] for movie in search_local_movies(query="FIGHT cl", limit=5)] == [fight_club.id]
+    assert [movie["title"] for movie in search_local_movies(query="fabuleux destin", limit=5)] == ["Amélie"]
+    assert search_local_movies(query="&:*!", limit=5) == []
+
+
+@patch("watchedmovies.movies.services.tmdb_api.get_cached_search_movies", return_value=None)
+@patch("watchedmovies.movies.services.tmdb_api.search_movies")
+def test_search_answers_locally_when_there_are_enough_matches(mock_search, mock_cached, db, api_rf, settings):
+    settings.TMDB_LOCAL_SEARCH_MIN_RESULTS = 2
+    for sequel in ["", " 2", " 3"]:
+        WatchedMovieFactory(title=f"Toy Story{sequel}", original_title=f"Toy Story{sequel}")
+
+    response = search(api_rf, "toy story")
+
+    mock_search.assert_not_called()
+    assert response.status_code == 200
+    assert len(response.data["local"]) == 3
+    assert (response.data["results"], response.data["total_pages"], response.data["total_results"]) == ([], 1, 0)
+
+
+@patch("watchedmovies.movies.services.tmdb_api.get_cached_search_movies")
+def test_search_keeps_tmdb_results_and_totals_when_answered_locally(mock_cached, db, api_rf, settings):
+    settings.TMDB_LOCAL_SEARCH_MIN_RESULTS = 2
+    local = [WatchedMovieFactory(title=f"Toy Story {i}", original_title=f"Toy Story {i}") for i in range(3)]
+    remote = [{**FAKE_TMDB_DATA, "id": 1000 + i} for i in range(20)]
+    mock_cached.return_value = {"results": remote, "total_pages": 4, "total_results": 70}
+
+    response = search(api_rf, "toy story")
+
+    assert [result["id"] for result in response.data["results"]] == [movie["id"] for movie in remote]
+    assert {result["id"] for result in response.data["local"]} == {movie.id for movie in local}
+    assert (response.data["total_pages"], response.data["total_results"]) == (4, 70)
+
+
+@patch("watchedmovies.movies.services.tmdb_api.search_movies")
+def test_search_asks_tmdb_when_there_are_few_local_matches(mock_search, db, api_rf):
+    movie = WatchedMovieFactory(title="Alien", original_title="Alien")
+    mock_search.return_value = {
+        "results": [{**FAKE_TMDB_DATA, "id": movie.id, "title": "Alien"}, {**FAKE_TMDB_DATA, "id": 679}],
+        "total_pages": 1,
+        "total_results": 2,
+    }
+
+    response = search(api_rf, "alien")
+
+    assert [result["id"] for result in response.data["local"]] == [movie.id]
+    assert [result["id"] for result in response.data["results"]] == [movie.id, 679]
+    assert response.data["total_results"] == 2
+
+
+@patch("watchedmovies.movies.services.tmdb_api.search_movies")
+@patch("watchedmovies.movies.services.tmdb_api.get_cached_search_movies")
+def test_paging_through_a_search_lists_every_tmdb_result_once(mock_cached, mock_search, db, api_rf, settings):
+    settings.TMDB_LOCAL_SEARCH_MIN_RESULTS = 1
+    WatchedMovieFactory(title="Alien", original_title="Alien")
+    pages = {
+        page: {
+            "results": [{**FAKE_TMDB_DATA, "id": (page - 1) * 20 + i} for i in range(20)],
+            "total_pages": 2,
+            "total_results": 40,
+        }
+        for page in [1, 2]
+    }
+    mock_cached.side_effect = lambda query, page: pages[page]
+    mock_search.side_effect = lambda query, page: pages[page]
+
+    seen = []
+    for page in range(1, search(api_rf, "alien").data["total_pages"] + 1):
+        seen += [result["id"] for result in search(api_rf, "alien", page=page).data["results"]]
+
+    assert sorted(seen) == list(range(40))
+
+
+@patch("watchedmovies.movies.services.tmdb_api.get_cached_search_movies", return_value=None)
+def test_background_search_policy_does_not_wait_for_tmdb(mock_cached, db, api_rf, settings):
+    settings.TMDB_SEARCH_POLICY = "background"
+    movie = WatchedMovieFactory(title="Alien", original_title="Alien")
+
+    response = search(api_rf, "alien")
+
+    mock_cached.assert_called_once_with("alien", 1)
+    assert [result["id"] for result in response.data["local"]] == [movie.id]
+    assert response.data["results"] == []
+
+
+@patch("watchedmovies.movies.services.tmdb_api.search_movies")
+def test_remote_search_policy_and_next_pages_skip_the_local_index(mock_search, db, api_rf, settings):
+    mock_search.return_value = {"results": [FAKE_TMDB_DATA], "total_pages": 3, "total_results": 41}
+    WatchedMovieFactory(title="Alien", original_title="Alien")
+
+    next_page = search(api_rf, "alien", page=2)
+    settings.TMDB_SEARCH_POLICY = "remote"
+    first_page = search(api_rf, "alien")
+
+    assert next_page.data["results"][0]["id"] == first_page.data["results"][0]["id"] == 0
+    assert [call.args for call in mock_search.call_args_list] == [("alien", 2), ("alien", 1)]
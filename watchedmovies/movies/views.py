@@ -1,10 +1,14 @@
-from django.db.models import Avg, Count, Exists, Max, OuterRef, Q
+from datetime import date
+
+from django.conf import settings
+from django.db.models import F
 from django.http import HttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_spectacular.openapi import OpenApiTypes
 from drf_spectacular.utils import OpenApiParameter, extend_schema
-from rest_framework import filters, status
+from rest_framework import status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.mixins import DestroyModelMixin, ListModelMixin, RetrieveModelMixin, UpdateModelMixin
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
@@ -14,7 +18,7 @@ from rest_framework.viewsets import GenericViewSet
 from watchedmovies.movies.models import PlanToWatch, ViewDetails, WatchedMovie
 
 from ..pagination import CustomPagination
-from ..services import tmdb_api
+from ..services import profile_cache, tmdb_api
 from . import filters as custom_filters
 from . import serializers, services
 
@@ -25,11 +29,16 @@ class WatchedMovieViewSet(GenericViewSet, ListModelMixin, RetrieveModelMixin, De
     permission_classes = [IsAuthenticated]
     throttle_classes = [UserRateThrottle]
     pagination_class = CustomPagination
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter, DjangoFilterBackend]
+    filter_backends = [
+        custom_filters.TrigramSearchFilter,
+        custom_filters.SearchRankOrderingFilter,
+        DjangoFilterBackend,
+    ]
     filterset_class = custom_filters.WatchedMovieFilter
     search_fields = ["title", "original_title"]
     ordering_fields = ["first_watched_date", "title"]
     ordering = ["-first_watched_date"]
+    cursor_ordering = "-first_watched_date"
 
     def get_serializer_class(self):
         actions = {
@@ -42,29 +51,34 @@ class WatchedMovieViewSet(GenericViewSet, ListModelMixin, RetrieveModelMixin, De
         if getattr(self, "swagger_fake_view", False):
             return WatchedMovie.objects.none()
         profile = self.request.user.profile
-        return WatchedMovie.objects.filter(view_details__profile=profile).annotate(
-            first_watched_date=Max("view_details__watched_date"),
-            total_views=Count("view_details", filter=Q(view_details__profile=profile)),
-            avg_rating=Avg("view_details__rating", filter=Q(view_details__profile=profile)),
-            is_favorite=Exists(
-                ViewDetails.objects.filter(
-                    watched_movie=OuterRef("pk"),
-                    profile=profile,
-                    is_favorite=True,
-                )
-            ),
+        # Read from the summaries of the profile, the join is filtered on the profile so each movie appears once.
+        return WatchedMovie.objects.filter(summaries__profile=profile).annotate(
+            # Named after the ordering parameter of the API, it is the date of the last view.
+            first_watched_date=F("summaries__last_watched_date"),
+            total_views=F("summaries__total_views"),
+            avg_rating=F("summaries__avg_rating"),
+            is_favorite=F("summaries__is_favorite"),
         )
 
     def list(self, request, *args, **kwargs):
+        data = profile_cache.get_or_compute(
+            profile_id=request.user.profile.id,
+            endpoint="watched_movies",
+            params=request.query_params.lists(),
+            compute=lambda: self.get_list_data(request),
+        )
+        return Response(data)
+
+    def get_list_data(self, request):
         queryset = self.filter_queryset(self.get_queryset())
         profile = request.user.profile
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = self.get_serializer(page, many=True, context={"profile": profile})
-            return self.get_paginated_response(serializer.data)
+            return self.get_paginated_response(serializer.data).data
 
         serializer = self.get_serializer(queryset, many=True, context={"profile": profile})
-        return Response(serializer.data)
+        return serializer.data
 
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -91,7 +105,12 @@ class WatchedMovieViewSet(GenericViewSet, ListModelMixin, RetrieveModelMixin, De
     def years(self, request, *args, **kwargs):
         """Get years from watched movies"""
         profile = request.user.profile
-        years = services.get_watched_register_years(profile=profile)
+        years = profile_cache.get_or_compute(
+            profile_id=profile.id,
+            endpoint="years",
+            params=[],
+            compute=lambda: services.get_watched_register_years(profile=profile),
+        )
         return Response(years, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=["GET"])
@@ -108,7 +127,15 @@ class WatchedMovieViewSet(GenericViewSet, ListModelMixin, RetrieveModelMixin, De
     def stats(self, request, *args, **kwargs):
         """Get JSON statistics for the current user's watched movies."""
         year = request.query_params.get("year")
-        data = services.get_stats(profile=request.user.profile, year=year)
+        profile = request.user.profile
+        today = date.today()
+        data = profile_cache.get_or_compute(
+            profile_id=profile.id,
+            endpoint="stats",
+            # The current streak depends on the day, a payload cached yesterday is not served today.
+            params=[("year", year), ("today", today.isoformat())],
+            compute=lambda: services.get_stats(profile=profile, year=year, today=today),
+        )
         return Response(data, status=status.HTTP_200_OK)
 
 
@@ -120,6 +147,7 @@ class ViewDetailViewSet(GenericViewSet, ListModelMixin, RetrieveModelMixin, Upda
     serializer_class = serializers.ListViewDetailSerializer
     pagination_class = CustomPagination
     filterset_class = custom_filters.ViewDetailFilter
+    cursor_ordering = "-watched_date"
 
     def get_serializer_class(self):
         actions = {
@@ -143,10 +171,14 @@ class ViewDetailViewSet(GenericViewSet, ListModelMixin, RetrieveModelMixin, Upda
         view_detail = services.create_view_detail(**serializer.validated_data, profile=request.user.profile)
         return Response(serializers.ListViewDetailSerializer(view_detail).data, status=status.HTTP_201_CREATED)
 
+    def perform_update(self, serializer):
+        """Update a ViewDetail"""
+        serializer.instance = services.update_view_detail(view_detail=serializer.instance, **serializer.validated_data)
+
     def destroy(self, request, *args, **kwargs):
         """Delete a ViewDetail"""
         view = self.get_object()
-        view.delete()
+        services.delete_view_detail(view_detail=view)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -160,6 +192,18 @@ class TMDBViewSet(GenericViewSet):
     def get_queryset(self):
         pass
 
+    def get_page(self, request) -> int:
+        """Return the page asked for in the query string, a 400 unless it is a positive integer."""
+        try:
+            page = int(request.query_params.get("page", 1))
+        except ValueError:
+            raise ValidationError({"page": "Page must be an integer."})
+
+        if page < 1:
+            raise ValidationError({"page": "Page must be a positive integer."})
+
+        return page
+
     @extend_schema(parameters=[OpenApiParameter("movie_id", OpenApiTypes.INT, OpenApiParameter.PATH)])
     @action(detail=False, methods=["GET"], url_path="movie-details/(?P<movie_id>[^/.]+)")
     def movie_details(self, request, movie_id: int = None, *args, **kwargs):
@@ -180,25 +224,40 @@ class TMDBViewSet(GenericViewSet):
 
         return Response(data, status=status.HTTP_200_OK)
 
+    @extend_schema(
+        parameters=[OpenApiParameter("page", OpenApiTypes.INT, OpenApiParameter.QUERY)],
+        responses=serializers.ListTMDBMovieSerializer(many=True),
+    )
     @action(detail=False, methods=["GET"])
     def popular_movies(self, request, *args, **kwargs):
-        """Get popular movies"""
-        popular_movies = tmdb_api.get_popular_movies()
-        serialized = serializers.ListTMDBMovieSerializer(data=popular_movies["results"], many=True)
-        serialized.is_valid(raise_exception=True)
-        return Response(serialized.data, status=status.HTTP_200_OK)
+        """Get popular movies, served from the snapshot kept by the refresh_popular_movies command"""
+        page = self.get_page(request)
+        snapshot = services.get_popular_movies_snapshot(page=page)
+
+        if snapshot is None:
+            return Response([], status=status.HTTP_200_OK)
+
+        headers = {"ETag": snapshot["etag"], "Cache-Control": f"public, max-age={settings.TMDB_POPULAR_MAX_AGE}"}
+
+        if request.headers.get("If-None-Match") == snapshot["etag"]:
+            return HttpResponse(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        return HttpResponse(snapshot["body"], content_type="application/json", headers=headers)
 
     @extend_schema(parameters=[OpenApiParameter("query", OpenApiTypes.STR, OpenApiParameter.PATH)])
     @action(detail=False, methods=["GET"], url_path="search-movies/(?P<query>[^/.]+)")
     def search_movies(self, request, query: str = None, *args, **kwargs):
-        """Search movies"""
-        page = int(request.query_params.get("page", 1))
-        data = tmdb_api.search_movies(query, page)
+        """Search movies, the movies logged by users that match are listed apart under local on the first page"""
+        page = self.get_page(request)
+        data = services.search_movies(query=query, page=page)
         serialized = serializers.ListTMDBMovieSerializer(data=data["results"], many=True)
         serialized.is_valid(raise_exception=True)
+        local = serializers.ListTMDBMovieSerializer(data=data["local"], many=True)
+        local.is_valid(raise_exception=True)
         return Response(
             {
                 "results": serialized.data,
+                "local": local.data,
                 "total_pages": data["total_pages"],
                 "total_results": data["total_results"],
                 "page": page,
@@ -214,6 +273,7 @@ class PlanToWatchViewSet(GenericViewSet, ListModelMixin, DestroyModelMixin):
     throttle_classes = [UserRateThrottle]
     serializer_class = serializers.ListPlanToWatchSerializer
     pagination_class = CustomPagination
+    cursor_ordering = "-added_at"
 
     def get_serializer_class(self):
         actions = {
@@ -237,6 +297,9 @@ class PlanToWatchViewSet(GenericViewSet, ListModelMixin, DestroyModelMixin):
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
+    def perform_destroy(self, instance):
+        services.delete_plan_to_watch(plan=instance)
+
     def create(self, request, *args, **kwargs):
         serializer = serializers.CreatePlanToWatchSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -1,4 +1,118 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
 from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(pagination.BasePagination):
+    """
+    Cursor pagination on a stable key, the ordering field of the view followed by the ID. The next page is read
+    with a WHERE on the key of the last row instead of an OFFSET, and no COUNT(*) is run unless an approximate
+    total, estimated by the query planner, is asked for with `total=approximate`.
+    Rows whose ordering field is null come first in descending order and last in ascending order, like in
+    PostgreSQL.
+    """
+
+    cursor_query_param = "cursor"
+    total_query_param = "total"
+    invalid_cursor_message = "Invalid cursor"
+
+    def __init__(self, page_size: int):
+        self.page_size = page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        field = self.get_ordering(request, view)
+        self.field = field.lstrip("-")
+        descending = field.startswith("-")
+        self.total = self.get_approximate_total(queryset) if request.query_params.get(self.total_query_param) else None
+
+        queryset = queryset.order_by(field, "-id" if descending else "id")
+
+        cursor = self.decode_cursor(request, queryset)
+        if cursor is not None:
+            queryset = queryset.filter(self.get_after_filter(*cursor, descending=descending))
+
+        rows = list(queryset[: self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[: self.page_size]
+        return self.page
+
+    def get_ordering(self, request, view) -> str:
+        """Return the ordering field asked for through the OrderingFilter of the view, or its cursor ordering."""
+        for backend in getattr(view, "filter_backends", []):
+            if issubclass(backend, OrderingFilter):
+                ordering = backend().get_ordering(request, view.get_queryset(), view)
+                if ordering:
+                    return ordering[0]
+
+        return view.cursor_ordering
+
+    def get_after_filter(self, value, pk, *, descending: bool) -> Q:
+        """Return the rows that come after the key (value, pk)."""
+        field = self.field
+        following = "lt" if descending else "gt"
+
+        if value is None:
+            nulls = Q(**{f"{field}__isnull": True, f"id__{following}": pk})
+            return nulls | Q(**{f"{field}__isnull": False}) if descending else nulls
+
+        after = Q(**{f"{field}__{following}": value}) | Q(**{field: value, f"id__{following}": pk})
+        return after if descending else after | Q(**{f"{field}__isnull": True})
+
+    def get_approximate_total(self, queryset) -> int:
+        """Return the number of rows estimated by the query planner, which does not read them."""
+        plan = json.loads(queryset.explain(format="json"))
+        return plan[0]["Plan"]["Plan Rows"]
+
+    def decode_cursor(self, request, queryset) -> tuple | None:
+        """Return the key (value, pk) of the cursor, with the value parsed by the ordering field of the queryset."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            if type(pk) is not int:
+                raise ValueError("The cursor ID is not an integer.")
+            if value is not None:
+                value = self.get_ordering_field(queryset).to_python(value)
+        except (binascii.Error, TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        return value, pk
+
+    def get_ordering_field(self, queryset):
+        """Return the model field, or the output field of the annotation, the queryset is ordered by."""
+        if self.field in queryset.query.annotations:
+            return queryset.query.annotations[self.field].output_field
+        return queryset.model._meta.get_field(self.field)
+
+    def encode_cursor(self, row) -> str:
+        value = getattr(row, self.field)
+        if hasattr(value, "isoformat"):
+            value = value.isoformat()
+        return base64.urlsafe_b64encode(json.dumps([value, row.pk]).encode()).decode()
+
+    def get_next_link(self) -> str | None:
+        if not self.has_next:
+            return None
+
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        response = {"next": self.get_next_link(), "results": data}
+        if self.total is not None:
+            response["count"] = self.total
+        return Response(response)
 
 
 class CustomPagination(pagination.PageNumberPagination):
@@ -8,9 +122,29 @@ class CustomPagination(pagination.PageNumberPagination):
     *- search = text for search
     *- page = required page
     *- page_size = size page
+    *- pagination = cursor, paginación por cursor (KeysetPagination) en lugar de por número de página
+    *- cursor = cursor de la página siguiente, también selecciona la paginación por cursor
+    *- total = approximate, total estimado en la paginación por cursor
     """
 
     page_size = 20
     page_size_query_param = "page_size"
     max_page_size = 100
     page_query_param = "page"
+    mode_query_param = "pagination"
+    keyset = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if request.query_params.get(self.mode_query_param) == "cursor" or KeysetPagination.cursor_query_param in (
+            request.query_params
+        ):
+            self.keyset = KeysetPagination(self.get_page_size(request))
+            return self.keyset.paginate_queryset(queryset, request, view)
+
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+
+        return super().get_paginated_response(data)
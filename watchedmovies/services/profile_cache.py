@@ -0,0 +1,77 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from watchedmovies.utils import metrics, single_flight
+
+KEY_PREFIX = "profile:v1:"
+
+
+def get_version_key(profile_id: int) -> str:
+    return f"{KEY_PREFIX}{profile_id}:version"
+
+
+def get_version(profile_id: int) -> int:
+    """
+    Return the data version of a profile. A lost version restarts from the clock, never from a number that
+    was already used, so payloads cached under an older version cannot be served again.
+    """
+    key = get_version_key(profile_id)
+    version = cache.get(key)
+
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key, 0)
+
+    return version
+
+
+def bump_version(profile_id: int) -> None:
+    """
+    Invalidate every payload cached for a profile. The version is bumped at once, and again when the current
+    transaction commits, so a payload computed meanwhile from the data before the commit is not kept either.
+    """
+
+    def bump():
+        try:
+            cache.incr(get_version_key(profile_id))
+        except ValueError:
+            cache.set(get_version_key(profile_id), time.time_ns(), timeout=None)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def get_key(profile_id: int, endpoint: str, params) -> str:
+    digest = hashlib.sha1(repr(sorted(params)).encode()).hexdigest()
+    return f"{KEY_PREFIX}{profile_id}:{get_version(profile_id)}:{endpoint}:{digest}"
+
+
+def get_or_compute(*, profile_id: int, endpoint: str, params, compute):
+    """
+    Return the payload of an endpoint for a profile and the given parameters, an iterable of key-value pairs,
+    computing and caching it on a miss. Concurrent misses on the same payload are computed only once.
+    """
+    key = get_key(profile_id, endpoint, params)
+    value = cache.get(key)
+
+    if value is not None:
+        metrics.incr(f"profile.cache.{endpoint}.hit")
+        return value
+
+    def fill():
+        metrics.incr(f"profile.cache.{endpoint}.miss")
+        value = compute()
+        cache.set(key, value, timeout=settings.PROFILE_CACHE_TTL)
+        return value
+
+    return single_flight.do(key, fill, timeout=settings.PROFILE_CACHE_SINGLE_FLIGHT_TIMEOUT, name="profile_cache")
+
+
+def get_stats(endpoint: str) -> dict:
+    """Return the hit and miss counters of the given endpoint."""
+    prefix = f"profile.cache.{endpoint}."
+    return {name.removeprefix(prefix): value for name, value in metrics.snapshot(prefix).items()}
@@ -1,55 +1,221 @@
-import json
+import hashlib
+import unicodedata
 
 import requests
+from django.conf import settings
 
 from config.settings.base import env
+from watchedmovies.utils import single_flight
+
+from . import tmdb_cache, tmdb_circuit_breaker, tmdb_rate_limit, tmdb_session
 
-BASE_URL = "https://api.themoviedb.org/3"
 API_KEY = env("TMDB_API_KEY")
 
+EMPTY_SEARCH_RESULTS = {"results": [], "total_pages": 1, "total_results": 0}
+
+
+class TMDBUnavailable(requests.RequestException):
+    """Raised by callers that cannot go without data TMDB could not give, so that they are retried later."""
+
 
-def make_request(url):
-    """Make a request to the TMDB API, adding the Authorization header."""
-    headers = {
+def get_base_url() -> str:
+    """Return the root URL of the TMDB API, a local stand-in can be used instead through TMDB_BASE_URL."""
+    return settings.TMDB_BASE_URL.rstrip("/")
+
+
+def get_headers() -> dict:
+    """Return the headers sent with every request to the TMDB API."""
+    return {
         "accept": "application/json",
         "Authorization": f"Bearer {API_KEY}",
     }
-    return requests.get(url, headers=headers)
+
+
+def make_request(url, params=None):
+    """
+    Make a request to the TMDB API through the pooled session, adding the Authorization header.
+    Every request waits for a slot of the shared rate limiter, and a 429 blocks all workers for the
+    Retry-After period before the request is retried.
+    Server errors and connection failures are counted by the circuit breaker, which raises CircuitOpen
+    without sending anything while TMDB is considered down.
+    """
+    headers = get_headers()
+    breaker = tmdb_circuit_breaker.breaker
+    probe = breaker.before_request()
+
+    try:
+        for attempt in range(settings.TMDB_RATE_LIMIT_RETRIES + 1):
+            tmdb_rate_limit.acquire()
+            response = tmdb_session.get(url, headers=headers, params=params)
+
+            if response.status_code != 429 or attempt == settings.TMDB_RATE_LIMIT_RETRIES:
+                break
+
+            tmdb_rate_limit.block(tmdb_rate_limit.retry_after(response))
+    except tmdb_rate_limit.TMDBRateLimited:
+        raise
+    except requests.RequestException:
+        breaker.record_failure()
+        raise
+    else:
+        if response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
+    finally:
+        # A probe that was rate limited or interrupted recorded nothing, the next request probes instead.
+        if probe:
+            breaker.release_probe()
 
 
 def get_movie_details(movie_id) -> None | dict:
-    """Get the details of a movie by its ID."""
-    url = f"{BASE_URL}/movie/{movie_id}?language=en-US"
+    """Get the details of a movie by its ID, served from the two-tier cache when possible."""
+    return tmdb_cache.get_or_fetch(
+        f"movie:{movie_id}",
+        lambda: coalesce(f"movie:{movie_id}", lambda: fetch_movie_details(movie_id)),
+        namespace="movie_details",
+        ttl=settings.TMDB_DETAILS_CACHE_TTL,
+        stale_ttl=settings.TMDB_DETAILS_STALE_TTL,
+        negative_ttl=settings.TMDB_NEGATIVE_CACHE_TTL,
+    )
+
+
+def is_movie_not_found(movie_id) -> bool:
+    """
+    Tell whether a movie whose details came back empty is missing from TMDB, rather than TMDB being
+    unreachable. Only a 404 is negatively cached, for TMDB_NEGATIVE_CACHE_TTL seconds.
+    """
+    return tmdb_cache.is_not_found(f"movie:{movie_id}")
+
+
+def coalesce(key: str, fn):
+    """Share a single in-flight TMDB request between concurrent callers asking for the same key."""
+    return single_flight.do(f"tmdb:{key}", fn, timeout=settings.TMDB_SINGLE_FLIGHT_TIMEOUT, name="tmdb")
+
+
+def fetch_movie_details(movie_id):
+    """Fetch the details of a movie from the TMDB API, bypassing the cache."""
+    url = f"{get_base_url()}/movie/{movie_id}?language=en-US"
     response = make_request(url)
 
+    if response.status_code == 404:
+        return tmdb_cache.NOT_FOUND
+
     if response.status_code != 200:
         return None
 
     return response.json()
 
 
-def get_popular_movies():
-    """Get a list of popular movies"""
-    url = f"{BASE_URL}/movie/popular?language=en-US&page=1"
-    response = make_request(url)
+def get_popular_movies(page=1):
+    """Get a page of popular movies, the last known good page is served while TMDB is down."""
+    popular_movies = tmdb_cache.get_or_fetch(
+        f"popular:{page}",
+        lambda: coalesce(f"popular:{page}", lambda: fetch_popular_movies(page)),
+        namespace="popular_movies",
+        ttl=0,
+    )
+    return popular_movies or {"results": []}
+
+
+def fetch_popular_movies(page=1):
+    """Fetch a page of popular movies from the TMDB API."""
+    url = f"{get_base_url()}/movie/popular"
+    response = make_request(url, params={"language": "en-US", "page": page})
 
     if response.status_code != 200:
-        return json.dumps([])
+        return None
 
     return response.json()
 
 
+def normalize_query(query) -> str:
+    """Fold case, accents and whitespace so that queries typed differently share their cached results."""
+    decomposed = unicodedata.normalize("NFKD", str(query))
+    folded = "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+    return " ".join(folded.split())
+
+
 def search_movies(query, page=1):
-    """Search movies by a query"""
-    url = f"{BASE_URL}/search/movie?query={query}&page={page}"
-    response = make_request(url)
+    """
+    Search movies by a query.
+    Results are cached for a short time under the normalized query and page, and the last known good results
+    are served while TMDB is down. Requesting the first page prefetches the second one in the background.
+    """
+    normalized = normalize_query(query)
+
+    if not normalized:
+        return {**EMPTY_SEARCH_RESULTS, "results": []}
+
+    results = tmdb_cache.get_or_fetch(
+        get_search_key(normalized, page),
+        lambda: coalesce(get_search_key(normalized, page), lambda: fetch_search_movies(normalized, page)),
+        **get_search_cache_options(),
+    )
+
+    if not results:
+        return {**EMPTY_SEARCH_RESULTS, "results": []}
+
+    if page == 1 and results["total_pages"] > 1 and settings.TMDB_SEARCH_PREFETCH:
+        tmdb_cache.prefetch(
+            get_search_key(normalized, 2),
+            lambda: fetch_search_movies(normalized, 2),
+            **get_search_cache_options(),
+        )
+
+    return results
+
+
+def get_cached_search_movies(query, page=1) -> dict | None:
+    """Return the cached results of a search without waiting for TMDB, fetching them in the background for later."""
+    normalized = normalize_query(query)
+
+    if not normalized:
+        return None
+
+    key = get_search_key(normalized, page)
+    tmdb_cache.prefetch(key, lambda: fetch_search_movies(normalized, page), **get_search_cache_options())
+    entry, tier = tmdb_cache.get_entry(key)
+
+    return entry["value"] if entry is not None else None
+
+
+def get_search_key(normalized_query: str, page) -> str:
+    return f"search:{page}:{hashlib.sha1(normalized_query.encode()).hexdigest()}"
+
+
+def get_search_cache_options() -> dict:
+    return {"namespace": "search", "ttl": settings.TMDB_SEARCH_CACHE_TTL, "stale_ttl": settings.TMDB_SEARCH_STALE_TTL}
+
+
+def fetch_search_movies(query, page=1):
+    """Fetch a page of search results from the TMDB API."""
+    url = f"{get_base_url()}/search/movie"
+    response = make_request(url, params={"query": query, "page": page})
 
     if response.status_code != 200:
-        return {"results": [], "total_pages": 1, "total_results": 0}
+        return None
+
+    return parse_search_results(response.json())
+
 
-    data = response.json()
+def parse_search_results(data: dict) -> dict:
+    """Keep the fields of a search response that are sent to the client."""
     return {
         "results": data["results"],
         "total_pages": data["total_pages"],
         "total_results": data["total_results"],
     }
+
+
+def get_movie_changes(start_date, end_date, page=1) -> dict:
+    """Get a page of the IDs of the movies changed on TMDB between two dates, at most 14 days apart."""
+    url = f"{get_base_url()}/movie/changes"
+    params = {"start_date": start_date.isoformat(), "end_date": end_date.isoformat(), "page": page}
+    response = make_request(url, params=params)
+
+    if response.status_code != 200:
+        response.raise_for_status()
+
+    return response.json()
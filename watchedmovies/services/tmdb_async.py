@@ -0,0 +1,181 @@
+import asyncio
+
+import httpx
+from asgiref.sync import async_to_sync
+from django.conf import settings
+
+from . import tmdb_api, tmdb_cache, tmdb_circuit_breaker, tmdb_rate_limit
+from .tmdb_session import RETRY_STATUSES
+
+
+def build_client(concurrency: int = None) -> httpx.AsyncClient:
+    """Build an async client whose keep-alive pool holds as many connections as concurrent requests."""
+    concurrency = concurrency or settings.TMDB_ASYNC_CONCURRENCY
+    return httpx.AsyncClient(
+        base_url=tmdb_api.get_base_url(),
+        headers=tmdb_api.get_headers(),
+        limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        timeout=httpx.Timeout(settings.TMDB_READ_TIMEOUT, connect=settings.TMDB_CONNECT_TIMEOUT),
+    )
+
+
+async def make_request(client: httpx.AsyncClient, path: str, params: dict = None) -> httpx.Response:
+    """
+    Async counterpart of tmdb_api.make_request: wait for a slot of the shared rate limiter, honor
+    Retry-After on a 429 and retry with backoff on 5xx responses and transport errors. The outcome is
+    recorded by the shared circuit breaker, which raises CircuitOpen while TMDB is considered down.
+    """
+    breaker = tmdb_circuit_breaker.breaker
+    probe = breaker.before_request()
+    try:
+        return await _send(client, path, params, breaker)
+    finally:
+        # A probe that was rate limited or cancelled recorded nothing, the next request probes instead.
+        if probe:
+            breaker.release_probe()
+
+
+async def _send(client: httpx.AsyncClient, path: str, params: dict, breaker) -> httpx.Response:
+    """Send a request with the retries of make_request, recording its outcome in the circuit breaker."""
+    errors_left = settings.TMDB_MAX_RETRIES
+    throttles_left = settings.TMDB_RATE_LIMIT_RETRIES
+    attempt = 0
+
+    while True:
+        await tmdb_rate_limit.acquire_async()
+        try:
+            response = await client.get(path, params=params)
+        except httpx.TransportError:
+            if not errors_left:
+                breaker.record_failure()
+                raise
+            errors_left -= 1
+        else:
+            if response.status_code == 429 and throttles_left:
+                throttles_left -= 1
+                await asyncio.to_thread(tmdb_rate_limit.block, tmdb_rate_limit.retry_after(response))
+                continue
+
+            if response.status_code not in RETRY_STATUSES or not errors_left:
+                if response.status_code >= 500:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                return response
+            errors_left -= 1
+
+        await asyncio.sleep(settings.TMDB_RETRY_BACKOFF * 2**attempt)
+        attempt += 1
+
+
+async def fetch_movie_details(client: httpx.AsyncClient, movie_id):
+    """Fetch the details of a movie from the TMDB API, bypassing the cache."""
+    response = await make_request(client, f"/movie/{movie_id}", params={"language": "en-US"})
+
+    if response.status_code == 404:
+        return tmdb_cache.NOT_FOUND
+
+    if response.status_code != 200:
+        return None
+
+    return response.json()
+
+
+async def get_movie_details(movie_id, *, client: httpx.AsyncClient = None) -> None | dict:
+    """Get the details of a movie by its ID."""
+    details = await get_movie_details_many([movie_id], client=client)
+    return details[movie_id]
+
+
+async def get_movie_details_many(
+    ids, *, concurrency: int = None, client: httpx.AsyncClient = None, use_cache: bool = True
+) -> dict:
+    """
+    Get the details of many movies, mapping each ID to its details or None.
+    Cached movies are answered from the two-tier cache and the rest are fetched concurrently, with at
+    most `concurrency` requests in flight, and cached for the next callers. A movie that cannot be
+    fetched, because of an error or an open circuit, gets its last known good details. Without use_cache
+    every movie is fetched, its cache entry replaced, and nothing stale is ever returned.
+    """
+    ids = list(dict.fromkeys(ids))
+    details = {}
+    missing = []
+
+    for movie_id in ids:
+        entry = tmdb_cache.get_fresh(f"movie:{movie_id}", namespace="movie_details") if use_cache else None
+        if entry is not None:
+            details[movie_id] = entry["value"]
+        else:
+            missing.append(movie_id)
+
+    if not missing:
+        return details
+
+    semaphore = asyncio.Semaphore(concurrency or settings.TMDB_ASYNC_CONCURRENCY)
+
+    async def fetch(client, movie_id):
+        try:
+            async with semaphore:
+                value = await fetch_movie_details(client, movie_id)
+        except tmdb_rate_limit.TMDBRateLimited:
+            # Only this movie went without a request slot, the others of the batch are kept.
+            value = None
+        except (tmdb_circuit_breaker.CircuitOpen, httpx.TransportError):
+            if not use_cache:
+                raise
+            value = None
+
+        if value is None and use_cache:
+            details[movie_id] = tmdb_cache.get_last_good(f"movie:{movie_id}", namespace="movie_details")
+            return
+
+        details[movie_id] = tmdb_cache.store(
+            f"movie:{movie_id}",
+            value,
+            ttl=settings.TMDB_DETAILS_CACHE_TTL,
+            stale_ttl=settings.TMDB_DETAILS_STALE_TTL,
+            negative_ttl=settings.TMDB_NEGATIVE_CACHE_TTL,
+        )
+
+    if client is not None:
+        await asyncio.gather(*(fetch(client, movie_id) for movie_id in missing))
+    else:
+        async with build_client(concurrency) as client:
+            await asyncio.gather(*(fetch(client, movie_id) for movie_id in missing))
+
+    return {movie_id: details[movie_id] for movie_id in ids}
+
+
+async def get_popular_movies(page: int = 1, *, client: httpx.AsyncClient = None):
+    """Get a page of popular movies"""
+    if client is None:
+        async with build_client() as client:
+            return await get_popular_movies(page, client=client)
+
+    response = await make_request(client, "/movie/popular", params={"language": "en-US", "page": page})
+
+    if response.status_code != 200:
+        return {"results": []}
+
+    return response.json()
+
+
+async def search_movies(query, page=1, *, client: httpx.AsyncClient = None) -> dict:
+    """Search movies by a query"""
+    if client is None:
+        async with build_client() as client:
+            return await search_movies(query, page, client=client)
+
+    response = await make_request(
+        client, "/search/movie", params={"query": tmdb_api.normalize_query(query), "page": page}
+    )
+
+    if response.status_code != 200:
+        return {**tmdb_api.EMPTY_SEARCH_RESULTS, "results": []}
+
+    return tmdb_api.parse_search_results(response.json())
+
+
+def fetch_movie_details_many(ids, *, concurrency: int = None, use_cache: bool = True) -> dict:
+    """Synchronous entry point of get_movie_details_many for management commands and jobs."""
+    return async_to_sync(get_movie_details_many)(ids, concurrency=concurrency, use_cache=use_cache)
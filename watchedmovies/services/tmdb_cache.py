@@ -0,0 +1,225 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+
+from watchedmovies.utils import metrics
+
+KEY_PREFIX = "tmdb:v1:"
+
+
+class NotFound:
+    """Marker for a resource that does not exist on TMDB, it pickles to the module-level singleton."""
+
+    def __reduce__(self):
+        return "NOT_FOUND"
+
+    def __repr__(self):
+        return "NOT_FOUND"
+
+
+# Returned by a fetch function when the resource does not exist on TMDB, the miss is cached negatively.
+NOT_FOUND = NotFound()
+
+
+class LRUCache:
+    """Bounded in-process cache, the least recently used entry is evicted when it is full."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: dict) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+local_cache = LRUCache(max_size=settings.TMDB_CACHE_LRU_SIZE)
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="tmdb-cache-refresh")
+_refreshing: dict[str, Future] = {}
+_refreshing_lock = threading.Lock()
+
+
+def make_entry(value, *, ttl: int, stale_ttl: int = 0) -> dict:
+    """Wrap a value with the moments until which it is fresh and until which it may still be served stale."""
+    now = time.time()
+    return {"value": value, "fresh_until": now + ttl, "stale_until": now + ttl + stale_ttl}
+
+
+def get_entry(key: str) -> tuple[dict | None, str]:
+    """Look an entry up in the in-process LRU first and then in the shared cache, promoting shared hits."""
+    entry = local_cache.get(KEY_PREFIX + key)
+    if entry is not None:
+        return entry, "lru"
+
+    entry = cache.get(KEY_PREFIX + key)
+    if entry is not None:
+        local_cache.set(KEY_PREFIX + key, entry)
+        return entry, "shared"
+
+    return None, "miss"
+
+
+def set_entry(key: str, entry: dict) -> None:
+    """
+    Store an entry in both tiers. The shared copy outlives its stale window by TMDB_LAST_GOOD_TTL so it
+    can still be served as the last known good payload while TMDB is down.
+    """
+    timeout = max(int(entry["stale_until"] - time.time()), 0) + settings.TMDB_LAST_GOOD_TTL
+    local_cache.set(KEY_PREFIX + key, entry)
+    cache.set(KEY_PREFIX + key, entry, timeout=timeout)
+
+
+def delete(key: str) -> None:
+    """Remove an entry from both tiers."""
+    local_cache.delete(KEY_PREFIX + key)
+    cache.delete(KEY_PREFIX + key)
+
+
+def store(key: str, value, *, ttl: int, stale_ttl: int = 0, negative_ttl: int = 0):
+    """Cache the result of a fetch function and return the value to hand to the caller."""
+    if value is NOT_FOUND:
+        if negative_ttl:
+            set_entry(key, make_entry(None, ttl=negative_ttl))
+        return None
+
+    if value is not None:
+        set_entry(key, make_entry(value, ttl=ttl, stale_ttl=stale_ttl))
+
+    return value
+
+
+def refresh(key: str, fetch, *, namespace: str, **ttls) -> Future:
+    """Refetch a stale entry in the background, at most one refresh per key runs at a time."""
+    with _refreshing_lock:
+        future = _refreshing.get(key)
+        if future is not None:
+            return future
+
+        def run():
+            try:
+                return store(key, fetch(), **ttls)
+            finally:
+                with _refreshing_lock:
+                    _refreshing.pop(key, None)
+
+        metrics.incr(f"tmdb.cache.{namespace}.refresh")
+        future = _executor.submit(run)
+        _refreshing[key] = future
+        return future
+
+
+def prefetch(key: str, fetch, *, namespace: str, **ttls) -> Future | None:
+    """Fetch a payload likely to be asked for next in the background, unless it is already fresh."""
+    entry, tier = get_entry(key)
+
+    if entry is not None and time.time() < entry["fresh_until"]:
+        return None
+
+    metrics.incr(f"tmdb.cache.{namespace}.prefetch")
+    return refresh(key, fetch, namespace=namespace, **ttls)
+
+
+def get_or_fetch(key: str, fetch, *, namespace: str, ttl: int, stale_ttl: int = 0, negative_ttl: int = 0):
+    """
+    Read-through lookup of a TMDB payload.
+    Fresh entries are served as they are, stale entries are served while they are refreshed in the
+    background, and on a miss the fetch function is called and its result cached. The fetch function
+    returns the payload, NOT_FOUND for a missing resource or None for a transient error that is not cached.
+    When the fetch fails, or the circuit to TMDB is open, the last known good payload is served whatever
+    its age, and None is returned when there is none.
+    Cached payloads are shared between callers and must not be mutated.
+    """
+    ttls = {"ttl": ttl, "stale_ttl": stale_ttl, "negative_ttl": negative_ttl}
+    entry, tier = get_entry(key)
+    now = time.time()
+
+    if entry is not None and now < entry["fresh_until"]:
+        event = "negative_hit" if entry["value"] is None else f"{tier}_hit"
+        metrics.incr(f"tmdb.cache.{namespace}.{event}")
+        return entry["value"]
+
+    if entry is not None and now < entry["stale_until"]:
+        metrics.incr(f"tmdb.cache.{namespace}.stale_hit")
+        refresh(key, fetch, namespace=namespace, **ttls)
+        return entry["value"]
+
+    metrics.incr(f"tmdb.cache.{namespace}.miss")
+    try:
+        value = fetch()
+    except requests.RequestException:
+        value = None
+
+    if value is None:
+        return get_last_good(key, namespace=namespace)
+
+    return store(key, value, **ttls)
+
+
+def get_last_good(key: str, *, namespace: str):
+    """Return the cached payload of the key whatever its age, used when TMDB cannot be reached."""
+    entry, tier = get_entry(key)
+
+    if entry is None or entry["value"] is None:
+        metrics.incr(f"tmdb.cache.{namespace}.unavailable")
+        return None
+
+    metrics.incr(f"tmdb.cache.{namespace}.last_good_hit")
+    return entry["value"]
+
+
+def get_fresh(key: str, *, namespace: str) -> dict | None:
+    """Return the entry of the key if it is still fresh, without fetching anything on a miss."""
+    entry, tier = get_entry(key)
+
+    if entry is not None and time.time() < entry["fresh_until"]:
+        event = "negative_hit" if entry["value"] is None else f"{tier}_hit"
+        metrics.incr(f"tmdb.cache.{namespace}.{event}")
+        return entry
+
+    metrics.incr(f"tmdb.cache.{namespace}.miss")
+    return None
+
+
+def is_not_found(key: str) -> bool:
+    """Tell whether TMDB answered the last request for the key with a 404 that is still negatively cached."""
+    entry, tier = get_entry(key)
+    return entry is not None and entry["value"] is None and time.time() < entry["fresh_until"]
+
+
+def get_stats(namespace: str) -> dict:
+    """Return the hit and miss counters of the given namespace."""
+    prefix = f"tmdb.cache.{namespace}."
+    return {name.removeprefix(prefix): value for name, value in metrics.snapshot(prefix).items()}
+
+
+def clear() -> None:
+    """Empty the in-process tier, the shared tier expires on its own."""
+    local_cache.clear()
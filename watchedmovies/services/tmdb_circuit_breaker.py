@@ -0,0 +1,96 @@
+import threading
+import time
+
+import requests
+from django.conf import settings
+
+from watchedmovies.utils import metrics
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpen(requests.RequestException):
+    """Raised instead of sending a request while TMDB is considered down."""
+
+
+class CircuitBreaker:
+    """
+    Stop sending requests to TMDB after too many consecutive failures.
+    Once open, requests fail fast until the reset timeout passes, then a single probe request is let
+    through: its success closes the circuit and its failure opens it again.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+            self._set_state(CLOSED)
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        metrics.set_value(f"{self.name}.state", STATE_VALUES[state])
+
+    def before_request(self) -> bool:
+        """Raise CircuitOpen unless the request may be sent, and return whether it is the probe."""
+        with self._lock:
+            if self.state == CLOSED:
+                return False
+
+            if self.state == OPEN and time.monotonic() - self.opened_at >= settings.TMDB_BREAKER_RESET_TIMEOUT:
+                self._set_state(HALF_OPEN)
+
+            if self.state == HALF_OPEN and not self.probing:
+                self.probing = True
+                metrics.incr(f"{self.name}.probes")
+                return True
+
+        metrics.incr(f"{self.name}.rejected")
+        raise CircuitOpen(f"{self.name} is open, TMDB is not reachable.")
+
+    def release_probe(self) -> None:
+        """Let another request probe when the probe ended without an outcome, e.g. it was never sent."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.probing = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != CLOSED:
+                metrics.incr(f"{self.name}.closed")
+            self.failures = 0
+            self.probing = False
+            self._set_state(CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self.probing = False
+            if self.state == HALF_OPEN or self.failures >= settings.TMDB_BREAKER_FAILURES:
+                if self.state != OPEN:
+                    metrics.incr(f"{self.name}.opened")
+                self.opened_at = time.monotonic()
+                self._set_state(OPEN)
+
+
+breaker = CircuitBreaker("tmdb.breaker")
+
+
+def get_state() -> dict:
+    """Return the state of the TMDB circuit and its counters."""
+    return {"state": breaker.state, "failures": breaker.failures, **metrics.snapshot("tmdb.breaker.")}
+
+
+def reset() -> None:
+    """Close the circuit and forget its counters."""
+    metrics.reset("tmdb.breaker.")
+    breaker.reset()
@@ -0,0 +1,206 @@
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+
+from watchedmovies.utils import metrics
+
+INTERACTIVE = "interactive"
+BACKFILL = "backfill"
+
+BUCKET_KEY = "tmdb:rate-limit:bucket"
+BLOCKED_UNTIL_KEY = "tmdb:rate-limit:blocked-until"
+# Shortest sleep between two attempts to take a token, so rounding errors cannot spin the loop.
+MIN_WAIT = 0.001
+
+# Refill the bucket and take a token when more than `reserve` tokens are left, otherwise return how long to wait.
+TAKE_TOKEN_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local reserve = tonumber(ARGV[3])
+local clock = redis.call("TIME")
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call("HMGET", KEYS[1], "tokens", "ts")
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 + reserve - 1e-9 then
+    tokens = tokens - 1
+else
+    wait = (1 + reserve - tokens) / rate
+end
+redis.call("HSET", KEYS[1], "tokens", tokens, "ts", now)
+redis.call("EXPIRE", KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+_priority: ContextVar[str] = ContextVar("tmdb_priority", default=INTERACTIVE)
+
+
+class TMDBRateLimited(requests.RequestException):
+    """Raised when no request slot frees up within the maximum wait of the caller's priority."""
+
+
+class LocalTokenBucket:
+    """Token bucket of a single process, used when the cache backend is not Redis."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tokens = None
+        self._ts = None
+
+    def take(self, *, rate: float, capacity: float, reserve: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            tokens = capacity if self._tokens is None else self._tokens
+            elapsed = max(0.0, now - self._ts) if self._ts is not None else 0.0
+            tokens = min(capacity, tokens + elapsed * rate)
+            wait = 0.0
+            if tokens >= 1 + reserve - 1e-9:
+                tokens -= 1
+            else:
+                wait = (1 + reserve - tokens) / rate
+            self._tokens, self._ts = tokens, now
+            return wait
+
+    def reset(self) -> None:
+        with self._lock:
+            self._tokens = None
+            self._ts = None
+
+
+class RedisTokenBucket:
+    """Token bucket shared by every worker, refilled and decremented atomically by a Lua script."""
+
+    def __init__(self, connection):
+        self.script = connection.register_script(TAKE_TOKEN_SCRIPT)
+
+    def take(self, *, rate: float, capacity: float, reserve: float) -> float:
+        return float(self.script(keys=[BUCKET_KEY], args=[rate, capacity, reserve]))
+
+    def reset(self) -> None:
+        self.script.registered_client.delete(BUCKET_KEY)
+
+
+_bucket = None
+_bucket_lock = threading.Lock()
+
+
+def get_bucket():
+    """Return the Redis bucket when the default cache is django_redis, the in-process one otherwise."""
+    global _bucket
+
+    if _bucket is None:
+        with _bucket_lock:
+            if _bucket is None:
+                try:
+                    from django_redis import get_redis_connection
+
+                    _bucket = RedisTokenBucket(get_redis_connection("default"))
+                except (ImportError, NotImplementedError):
+                    _bucket = LocalTokenBucket()
+
+    return _bucket
+
+
+@contextmanager
+def priority(name: str):
+    """Run the TMDB requests made inside the block with the given priority."""
+    token = _priority.set(name)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> str:
+    return _priority.get()
+
+
+def blocked_for() -> float:
+    """Return how many seconds are left of a Retry-After sent by TMDB to any worker."""
+    blocked_until = cache.get(BLOCKED_UNTIL_KEY)
+    return max(blocked_until - time.time(), 0.0) if blocked_until else 0.0
+
+
+def block(seconds: float) -> None:
+    """Stop every worker from sending requests for the given number of seconds."""
+    metrics.incr("tmdb.rate_limit.throttled")
+    cache.set(BLOCKED_UNTIL_KEY, time.time() + seconds, timeout=int(seconds) + 1)
+
+
+def waits(priority_name: str = None):
+    """
+    Yield how long to sleep before trying again to take a slot of the shared token bucket, and stop once
+    one is taken. Backfill requests leave part of the bucket to interactive ones, so bursts of background
+    work cannot starve live traffic. Raise TMDBRateLimited if the wait exceeds the priority's maximum.
+    """
+    priority_name = priority_name or current_priority()
+    rate = settings.TMDB_RATE_LIMIT
+    capacity = settings.TMDB_RATE_LIMIT_BURST
+    reserve = capacity * settings.TMDB_BACKFILL_RESERVE if priority_name == BACKFILL else 0
+    max_wait = settings.TMDB_RATE_LIMIT_MAX_WAIT if priority_name == INTERACTIVE else None
+    waited = 0.0
+
+    while True:
+        wait = blocked_for() or get_bucket().take(rate=rate, capacity=capacity, reserve=reserve)
+        if wait <= 0:
+            metrics.incr(f"tmdb.rate_limit.{priority_name}.acquired")
+            return
+
+        if max_wait is not None and waited + wait > max_wait:
+            metrics.incr(f"tmdb.rate_limit.{priority_name}.rejected")
+            raise TMDBRateLimited(f"No TMDB request slot available within {max_wait} seconds.")
+
+        wait = max(wait, MIN_WAIT)
+        metrics.incr(f"tmdb.rate_limit.{priority_name}.waited")
+        yield wait
+        waited += wait
+
+
+def acquire(priority_name: str = None) -> None:
+    """Block until a slot of the shared token bucket is taken."""
+    for wait in waits(priority_name):
+        time.sleep(wait)
+
+
+async def acquire_async(priority_name: str = None) -> None:
+    """
+    Wait without blocking the event loop until a slot of the shared token bucket is taken. The bucket lives
+    in the shared cache, so each attempt to take a slot runs in a thread.
+    """
+    attempts = waits(priority_name or current_priority())
+
+    while (wait := await asyncio.to_thread(next, attempts, None)) is not None:
+        await asyncio.sleep(wait)
+
+
+def retry_after(response: requests.Response, default: float = 1.0) -> float:
+    """Return the number of seconds asked by the Retry-After header of a 429 response."""
+    value = response.headers.get("Retry-After")
+
+    if not value:
+        return default
+
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return default
+
+
+def reset() -> None:
+    """Refill the bucket and lift any Retry-After block."""
+    get_bucket().reset()
+    cache.delete(BLOCKED_UNTIL_KEY)
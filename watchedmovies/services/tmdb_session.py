@@ -0,0 +1,98 @@
+import threading
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from watchedmovies.utils import metrics
+
+RETRY_STATUSES = (500, 502, 503, 504)
+
+_lock = threading.Lock()
+_local = threading.local()
+_adapter = None
+
+
+def build_adapter() -> HTTPAdapter:
+    """Build an HTTP adapter with a bounded keep-alive pool and retries with backoff on 5xx and resets."""
+    retry = Retry(
+        total=settings.TMDB_MAX_RETRIES,
+        connect=settings.TMDB_MAX_RETRIES,
+        read=settings.TMDB_MAX_RETRIES,
+        status=settings.TMDB_MAX_RETRIES,
+        backoff_factor=settings.TMDB_RETRY_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(["GET"]),
+        raise_on_status=False,
+    )
+    return HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=settings.TMDB_POOL_SIZE,
+        pool_block=False,
+        max_retries=retry,
+    )
+
+
+def get_adapter() -> HTTPAdapter:
+    """Return the process-wide adapter, the connection pool is shared by every thread."""
+    global _adapter
+
+    if _adapter is None:
+        with _lock:
+            if _adapter is None:
+                _adapter = build_adapter()
+
+    return _adapter
+
+
+def get_session() -> requests.Session:
+    """Return the session of the current thread, mounted on the shared pooled adapter."""
+    adapter = get_adapter()
+    session = getattr(_local, "session", None)
+
+    if session is None or _local.adapter is not adapter:
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _local.session = session
+        _local.adapter = adapter
+
+    return session
+
+
+def get_timeout() -> tuple[float, float]:
+    """Return the (connect, read) timeout used for every TMDB request."""
+    return settings.TMDB_CONNECT_TIMEOUT, settings.TMDB_READ_TIMEOUT
+
+
+def get(url: str, *, headers: dict = None, params: dict = None) -> requests.Response:
+    """Send a GET request through the pooled session."""
+    metrics.incr("tmdb.http.requests")
+    return get_session().get(url, headers=headers, params=params, timeout=get_timeout())
+
+
+def get_stats() -> dict:
+    """Return the number of requests sent, TCP/TLS handshakes made and connections reused by the pool."""
+    pool_manager = get_adapter().poolmanager
+    pools = [pool_manager.pools[key] for key in pool_manager.pools.keys()]
+    requests_sent = sum(pool.num_requests for pool in pools)
+    handshakes = sum(pool.num_connections for pool in pools)
+
+    return {
+        "requests": metrics.snapshot("tmdb.http.requests").get("tmdb.http.requests", 0),
+        "pool_requests": requests_sent,
+        "handshakes": handshakes,
+        "reused": max(requests_sent - handshakes, 0),
+    }
+
+
+def reset() -> None:
+    """Close every pooled connection and drop the sessions, the next request starts a fresh pool."""
+    global _adapter
+
+    with _lock:
+        if _adapter is not None:
+            _adapter.close()
+        _adapter = None
+        metrics.reset("tmdb.http.")
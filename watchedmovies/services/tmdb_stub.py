@@ -0,0 +1,242 @@
+import io
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+from PIL import Image
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures" / "tmdb"
+
+# Query parameters that do not change the answer of the stand-in.
+IGNORED_PARAMS = {"api_key", "language"}
+
+# Width of the poster and backdrop sizes served by the image CDN, "original" is served at w500.
+IMAGE_WIDTHS = {"original": 500}
+
+NOT_FOUND = {"success": False, "status_code": 34, "status_message": "The resource you requested could not be found."}
+
+GENRES = [
+    {"id": 28, "name": "Action"},
+    {"id": 35, "name": "Comedy"},
+    {"id": 18, "name": "Drama"},
+    {"id": 27, "name": "Horror"},
+    {"id": 878, "name": "Science Fiction"},
+]
+
+
+def fixture_name(path: str, query: dict) -> str:
+    """Return the file, relative to the fixtures directory, holding the answer to a request."""
+    params = "-".join(f"{key}-{value}" for key, value in sorted(query.items()) if key not in IGNORED_PARAMS)
+    suffix = "__" + re.sub(r"[^a-z0-9]+", "-", params.lower()).strip("-") if params else ""
+    return path.strip("/") + suffix + ".json"
+
+
+def synthetic_movie(movie_id: int) -> dict:
+    """Return a deterministic movie in the shape of the list endpoints of TMDB."""
+    genre = GENRES[movie_id % len(GENRES)]
+    return {
+        "adult": False,
+        "backdrop_path": f"/backdrop-{movie_id}.jpg",
+        "genre_ids": [genre["id"]],
+        "id": movie_id,
+        "original_language": "en",
+        "original_title": f"Movie {movie_id}",
+        "overview": f"Overview of movie {movie_id}.",
+        "popularity": round(1000 / (1 + movie_id % 97), 3),
+        "poster_path": f"/poster-{movie_id}.jpg",
+        "release_date": f"{1980 + movie_id % 45}-{1 + movie_id % 12:02d}-{1 + movie_id % 28:02d}",
+        "title": f"Movie {movie_id}",
+        "video": False,
+        "vote_average": round(5 + (movie_id % 50) / 10, 1),
+        "vote_count": 100 + movie_id % 5000,
+    }
+
+
+def synthetic_movie_details(movie_id: int) -> dict:
+    """Return deterministic movie details in the shape of /movie/{id}."""
+    movie = synthetic_movie(movie_id)
+    movie.pop("genre_ids")
+    return {
+        **movie,
+        "genres": [GENRES[movie_id % len(GENRES)]],
+        "runtime": 80 + movie_id % 100,
+        "status": "Released",
+        "tagline": "",
+    }
+
+
+def synthetic_page(ids: list, page: int, total_pages: int) -> dict:
+    return {
+        "page": page,
+        "results": [synthetic_movie(movie_id) for movie_id in ids],
+        "total_pages": total_pages,
+        "total_results": total_pages * len(ids),
+    }
+
+
+def synthesize(path: str, query: dict) -> tuple[int, dict]:
+    """Answer a request without a fixture with deterministic data, so any ID or query can be load tested."""
+    page = int(query.get("page", 1))
+
+    if path == "/movie/changes":
+        return 200, {"page": 1, "results": [], "total_pages": 1, "total_results": 0}
+
+    if path == "/movie/popular":
+        return 200, synthetic_page([(page - 1) * 20 + i + 1 for i in range(20)], page, 500)
+
+    if path == "/search/movie":
+        seed = zlib.crc32(query.get("query", "").strip().lower().encode()) % 100_000
+        return 200, synthetic_page([seed * 100 + (page - 1) * 20 + i + 1 for i in range(20)], page, 3)
+
+    match = re.fullmatch(r"/movie/(\d+)", path)
+    if match:
+        return 200, synthetic_movie_details(int(match.group(1)))
+
+    return 404, NOT_FOUND
+
+
+class TMDBStubHandler(BaseHTTPRequestHandler):
+    """Answer TMDB API and image CDN requests from fixtures, recordings or synthetic data."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        path = re.sub(r"^/3(?=/)", "", url.path)
+        query = dict(parse_qsl(url.query))
+
+        if path == "/__stats__":
+            return self.send_json(200, self.server.get_stats())
+
+        self.server.count("requests")
+        time.sleep(self.server.get_delay())
+
+        if self.server.roll(self.server.throttle_rate):
+            self.server.count("throttled")
+            return self.send_json(429, {"status_code": 25, "status_message": "Rate limited."}, {"Retry-After": "1"})
+
+        if self.server.roll(self.server.error_rate):
+            self.server.count("errors")
+            return self.send_json(500, {"status_code": 11, "status_message": "Internal error."})
+
+        match = re.fullmatch(r"/t/p/(\w+)/[^/]+\.\w+", path)
+        if match:
+            return self.send_body(200, self.server.get_image(match.group(1)), "image/jpeg")
+
+        status, body = self.server.resolve(path, query, self.headers.get("Authorization"))
+        return self.send_json(status, body)
+
+    def send_json(self, status: int, body: dict, headers: dict = None):
+        self.send_body(status, json.dumps(body).encode(), "application/json", headers)
+
+    def send_body(self, status: int, body: bytes, content_type: str, headers: dict = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class TMDBStubServer(ThreadingHTTPServer):
+    """
+    Local stand-in for the TMDB API and its image CDN.
+    Requests are answered from recorded fixtures when one exists, recorded from `record_from` when it is
+    set, and otherwise synthesized. Latency, server errors and 429s can be injected, and a seed makes the
+    injected failures reproducible.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        *,
+        fixtures_dir: Path = FIXTURES_DIR,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        record_from: str = None,
+        seed: int = None,
+        verbose: bool = False,
+    ):
+        super().__init__(address, TMDBStubHandler)
+        self.fixtures_dir = Path(fixtures_dir)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.record_from = record_from.rstrip("/") if record_from else None
+        self.verbose = verbose
+        self.random = random.Random(seed)
+        self.images: dict[str, bytes] = {}
+        self.stats: dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, name: str) -> None:
+        with self.lock:
+            self.stats[name] = self.stats.get(name, 0) + 1
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return dict(self.stats)
+
+    def roll(self, rate: float) -> bool:
+        with self.lock:
+            return self.random.random() < rate
+
+    def get_delay(self) -> float:
+        with self.lock:
+            return self.latency + self.random.uniform(0, self.jitter)
+
+    def get_image(self, size: str) -> bytes:
+        """Return a JPEG with the proportions of a poster at the requested size."""
+        with self.lock:
+            if size not in self.images:
+                width = IMAGE_WIDTHS.get(size) or int(size.lstrip("wh") or 342)
+                image = Image.new("RGB", (width, width * 3 // 2), (zlib.crc32(size.encode()) % 256, 64, 128))
+                buffer = io.BytesIO()
+                image.save(buffer, "JPEG")
+                self.images[size] = buffer.getvalue()
+            return self.images[size]
+
+    def resolve(self, path: str, query: dict, authorization: str = None) -> tuple[int, dict]:
+        fixture = self.fixtures_dir / fixture_name(path, query)
+
+        if fixture.exists():
+            self.count("fixture_hits")
+            recording = json.loads(fixture.read_text())
+            return recording["status"], recording["body"]
+
+        if self.record_from:
+            self.count("recorded")
+            response = requests.get(
+                f"{self.record_from}{path}",
+                params=query,
+                headers={"accept": "application/json", "Authorization": authorization or ""},
+                timeout=10,
+            )
+            fixture.parent.mkdir(parents=True, exist_ok=True)
+            fixture.write_text(json.dumps({"status": response.status_code, "body": response.json()}, indent=2))
+            return response.status_code, response.json()
+
+        self.count("synthesized")
+        return synthesize(path, query)
@@ -0,0 +1,16 @@
+from watchedmovies.jobs.services import job
+
+from .models import User
+from .services import build_email
+from .utils.sendmail import send_email
+
+
+@job("users.send_email")
+def send_email_job(*, user_id: int, kind: str) -> None:
+    """Send an email outside of the request that asked for it, nothing is sent to a user deleted since."""
+    user = User.objects.filter(pk=user_id).first()
+
+    if user is None:
+        return
+
+    send_email(to=user.email, **build_email(user=user, kind=kind))
@@ -1,8 +1,8 @@
 from config.settings.base import env
+from watchedmovies.jobs.services import enqueue
 
 from .models import Profile, User
 from .utils.generate_verification_token import generate_verification_token, get_user_by_uid
-from .utils.sendmail import send_email
 
 
 def user_create(*, email: str, profile: dict = {}, password: str) -> User:
@@ -16,16 +16,7 @@ def user_create(*, email: str, profile: dict = {}, password: str) -> User:
     profile.full_clean()  # Validate profile data
     profile.save()
 
-    frontend_url = env("FRONTEND_URL", default="localhost")
-    uid, token = generate_verification_token(user)
-    verification_url = f"{frontend_url}#/verify/{uid}/{token}/"
-
-    send_email(
-        subject="Verify your email address",
-        template="email_verification.html",
-        context={"url": verification_url},
-        to=user.email,
-    )
+    enqueue(name="users.send_email", payload={"user_id": user.pk, "kind": "verification"})
     return user
 
 
@@ -36,14 +27,7 @@ def send_greeting_email(*, uid: str) -> User:
     if user.is_active:
         return user
 
-    frontend_url = env("FRONTEND_URL", default="localhost")
-    home_url = f"{frontend_url}#/"
-    send_email(
-        subject="Welcome to WatchedMovies",
-        template="successful_registration.html",
-        context={"email": user.email, "url": home_url},
-        to=user.email,
-    )
+    enqueue(name="users.send_email", payload={"user_id": user.pk, "kind": "greeting"})
     return user
 
 
@@ -74,14 +58,36 @@ def user_update(*, user: User, name: str = None, profile: dict = None) -> User:
 def send_password_reset_email(*, email: str) -> None:
     """Send a reset password email to the user with the given email."""
     user = User.objects.get(email=email)
+    enqueue(name="users.send_email", payload={"user_id": user.pk, "kind": "password_reset"})
+
 
+def build_email(*, user: User, kind: str) -> dict:
+    """
+    Build the subject, template and context of an email of the given kind for the user. Tokens are made here,
+    when the email is sent, so they are never stored with the job that sends it.
+    """
     frontend_url = env("FRONTEND_URL", default="localhost")
+
+    if kind == "greeting":
+        return {
+            "subject": "Welcome to WatchedMovies",
+            "template": "successful_registration.html",
+            "context": {"email": user.email, "url": f"{frontend_url}#/"},
+        }
+
     uid, token = generate_verification_token(user)
-    reset_password_url = f"{frontend_url}#/resetPassword/{uid}/{token}/"
-
-    send_email(
-        subject="Reset your password",
-        template="reset_password.html",
-        context={"url": reset_password_url},
-        to=user.email,
-    )
+
+    if kind == "verification":
+        return {
+            "subject": "Verify your email address",
+            "template": "email_verification.html",
+            "context": {"url": f"{frontend_url}#/verify/{uid}/{token}/"},
+        }
+    if kind == "password_reset":
+        return {
+            "subject": "Reset your password",
+            "template": "reset_password.html",
+            "context": {"url": f"{frontend_url}#/resetPassword/{uid}/{token}/"},
+        }
+
+    raise ValueError(f"Unknown email kind {kind}.")
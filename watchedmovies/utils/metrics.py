@@ -0,0 +1,30 @@
+import threading
+from collections import Counter
+
+_lock = threading.Lock()
+_counters: Counter = Counter()
+
+
+def incr(name: str, value: int = 1) -> None:
+    """Increment the in-process counter with the given name."""
+    with _lock:
+        _counters[name] += value
+
+
+def snapshot(prefix: str = "") -> dict:
+    """Return a copy of the counters whose name starts with the given prefix."""
+    with _lock:
+        return {name: value for name, value in _counters.items() if name.startswith(prefix)}
+
+
+def reset(prefix: str = "") -> None:
+    """Reset the counters whose name starts with the given prefix."""
+    with _lock:
+        for name in [name for name in _counters if name.startswith(prefix)]:
+            del _counters[name]
+
+
+def set_value(name: str, value: int) -> None:
+    """Set the in-process gauge with the given name."""
+    with _lock:
+        _counters[name] = value
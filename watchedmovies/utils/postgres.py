@@ -0,0 +1,11 @@
+import functools
+
+from django.db import connection
+
+
+@functools.cache
+def has_extension(name: str) -> bool:
+    """Return whether a PostgreSQL extension is installed in the database, checked once per process."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = %s", [name])
+        return cursor.fetchone() is not None
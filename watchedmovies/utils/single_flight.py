@@ -0,0 +1,92 @@
+import hashlib
+import threading
+import time
+
+from django.core.cache import cache
+
+from watchedmovies.utils import metrics
+
+LOCK_PREFIX = "single-flight:lock:"
+RESULT_PREFIX = "single-flight:result:"
+# How long the result of a flight is published for callers waiting on other workers.
+RESULT_TTL = 5
+POLL_INTERVAL = 0.05
+
+
+class Call:
+    """An in-flight call that other threads of the process wait on."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_lock = threading.Lock()
+_calls: dict[str, Call] = {}
+
+
+def do(key: str, fn, *, timeout: float = 10, name: str = "default"):
+    """
+    Run fn once for every concurrent caller with the same key and share its result.
+    Threads of this process wait on the leader's call, while workers in other processes wait on a short
+    lock in the shared cache and read the result the leader publishes there. A caller that waits longer
+    than the timeout runs fn itself.
+    """
+    with _lock:
+        call = _calls.get(key)
+        leader = call is None
+        if leader:
+            call = _calls[key] = Call()
+
+    if not leader:
+        metrics.incr(f"single_flight.{name}.follower")
+        if not call.event.wait(timeout):
+            return fn()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    try:
+        call.result = _do_shared(key, fn, timeout=timeout, name=name)
+        return call.result
+    except Exception as error:
+        call.error = error
+        raise
+    finally:
+        with _lock:
+            _calls.pop(key, None)
+        call.event.set()
+
+
+def _do_shared(key: str, fn, *, timeout: float, name: str):
+    """Run fn holding the cross-worker lock, or wait for the worker holding it to publish the result."""
+    digest = hashlib.sha1(key.encode()).hexdigest()
+    lock_key = LOCK_PREFIX + digest
+    result_key = RESULT_PREFIX + digest
+
+    if cache.add(lock_key, 1, timeout=int(timeout) or 1):
+        metrics.incr(f"single_flight.{name}.leader")
+        try:
+            result = fn()
+            cache.set(result_key, {"value": result}, timeout=RESULT_TTL)
+            return result
+        finally:
+            cache.delete(lock_key)
+
+    metrics.incr(f"single_flight.{name}.remote_follower")
+    deadline = time.monotonic() + timeout
+
+    while time.monotonic() < deadline:
+        published = cache.get(result_key)
+        if published is not None:
+            return published["value"]
+        if cache.get(lock_key) is None:
+            break
+        time.sleep(POLL_INTERVAL)
+
+    published = cache.get(result_key)
+    if published is not None:
+        return published["value"]
+
+    return fn()